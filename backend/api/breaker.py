@@ -0,0 +1,176 @@
+"""Circuit breaker and AIMD concurrency limit for an upstream API.
+
+``CircuitBreaker`` stops calling an upstream that keeps failing:
+
+* closed – calls go through; ``failure_threshold`` consecutive failures
+  open the circuit;
+* open – calls are refused straight away (the caller answers locally) for
+  ``reset_timeout`` seconds;
+* half-open – a single probe call is let through; success closes the
+  circuit, failure opens it for another ``reset_timeout``.
+
+``AimdLimiter`` caps concurrent calls with a limit that adapts like TCP's
+congestion window: each success raises it by ``1 / limit`` (about +1 per
+window of calls), and each failure halves it. Calls that started before
+the last decrease don't decrease it again, so one burst of failures halves
+the limit once rather than collapsing it to the minimum. A call over the
+limit is refused instead of queued, so a slow upstream can't build a
+backlog of waiting requests.
+
+``CallGuard`` combines the two: ``admit()`` before the call, ``done()``
+after it with ``True`` (success), ``False`` (failure) or ``None``
+(abandoned, e.g. a cancelled hedge: it neither helps nor hurts).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._probing = False
+        self.opens += 1
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; in half-open, reserves the single probe."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED or (state == HALF_OPEN and not self._probing):
+                self._probing = state == HALF_OPEN
+                return True
+            self.short_circuits += 1
+            return False
+
+    def record(self, ok: Optional[bool]) -> None:
+        with self._lock:
+            state = self._current_state()
+            if ok is None:
+                self._probing = False  # an abandoned probe frees the slot
+            elif ok:
+                self.successes += 1
+                self._failures = 0
+                if state == HALF_OPEN:
+                    self._state = CLOSED
+                    self._probing = False
+            else:
+                self.failures += 1
+                self._failures += 1
+                if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+                    self._open()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "short_circuits": self.short_circuits,
+            "opens": self.opens,
+        }
+
+
+class AimdLimiter:
+    def __init__(
+        self,
+        initial: float = 8,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        backoff: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.limit = float(initial)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.backoff = backoff
+        self.clock = clock
+        self.in_flight = 0
+        self.rejected = 0
+        self.decreases = 0
+        self._last_decrease = float("-inf")
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> Optional[float]:
+        """Start time of the admitted call, or ``None`` if the limit is reached."""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                return None
+            self.in_flight += 1
+            return self.clock()
+
+    def release(self, started: float, ok: Optional[bool]) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            elif ok is not None and started > self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = self.clock()
+                self.decreases += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "decreases": self.decreases,
+        }
+
+
+class CallGuard:
+    def __init__(self, breaker: CircuitBreaker, limiter: AimdLimiter) -> None:
+        self.breaker = breaker
+        self.limiter = limiter
+
+    def admit(self) -> Optional[float]:
+        """A permit for one call (pass it to ``done``), or ``None`` to answer locally."""
+        if not self.breaker.allow():
+            return None
+        permit = self.limiter.try_acquire()
+        if permit is None:
+            self.breaker.record(None)
+        return permit
+
+    def done(self, permit: float, ok: Optional[bool]) -> None:
+        self.limiter.release(permit, ok)
+        self.breaker.record(ok)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"breaker": self.breaker.stats(), "limiter": self.limiter.stats()}
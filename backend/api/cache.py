@@ -0,0 +1,249 @@
+"""Response cache for meal plans.
+
+Identical goals are very common ("lose 5 kg", 3 meals), so finished plans are
+cached under a normalised goal key. Two interchangeable backends exist:
+
+* ``MemoryCache`` – per-process LRU with TTL and a byte budget;
+* ``SqliteCache`` – a WAL-mode SQLite file shared by every uvicorn worker on
+  the host, with the same TTL and an entry cap evicted by last access.
+
+Values are stored as JSON text so both backends behave identically and the
+byte budget is simply the encoded size. ``ResponseCache`` wraps a backend and
+keeps hit/miss counters for the metrics endpoint.
+
+Configuration (environment):
+
+    RECOMMENDER_CACHE              memory (default) | sqlite | off
+    RECOMMENDER_CACHE_PATH         SQLite file (default: backend/.cache/recommender.sqlite3)
+    RECOMMENDER_CACHE_TTL          seconds, default 3600
+    RECOMMENDER_CACHE_MAX_ENTRIES  default 2048
+    RECOMMENDER_CACHE_MAX_BYTES    memory backend only, default 32 MiB
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent / ".cache" / "recommender.sqlite3"
+
+
+def normalize_goal(goal: str) -> str:
+    """Case/whitespace/punctuation-insensitive form of a goal, e.g. "Lose 5kg!" → "lose 5 kg".
+
+    Letters are matched in any script. A goal with no letters or digits at
+    all (e.g. only emoji) keeps its stripped raw text, so it never shares a
+    key with another such goal.
+    """
+    words = " ".join(re.findall(r"[^\W\d_]+|\d+", goal.casefold()))
+    return words or goal.strip()
+
+
+def cache_key(goal: str, num_meals: int, **extra: Any) -> str:
+    """Stable key for a request; ``extra`` carries any other inputs that change the plan."""
+    payload = {"goal": normalize_goal(goal), "n": num_meals}
+    payload.update({k: v for k, v in extra.items() if v not in (None, [], {}, "")})
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+class MemoryCache:
+    """Thread-safe in-process LRU bounded by entry count and encoded bytes."""
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 2048, max_bytes: int = 32 << 20) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= now:
+                self._drop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.time() + self.ttl, value)
+            self.bytes += size
+            while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def _drop(self, key: str) -> None:
+        _, value = self._data.pop(key)
+        self.bytes -= len(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "entries": len(self), "bytes": self.bytes, "evictions": self.evictions}
+
+
+class SqliteCache:
+    """SQLite-backed cache shared across processes on one host."""
+
+    def __init__(self, path: Path = _DEFAULT_PATH, ttl: float = 3600.0, max_entries: int = 2048) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plan_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS plan_cache_accessed ON plan_cache(accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, expires FROM plan_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM plan_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE plan_cache SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+        except sqlite3.Error:
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO plan_cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            cur = conn.execute(
+                "DELETE FROM plan_cache WHERE key IN ("
+                " SELECT key FROM plan_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.evictions += max(cur.rowcount, 0)
+        except sqlite3.Error:
+            pass
+
+    def clear(self) -> None:
+        try:
+            self._conn().execute("DELETE FROM plan_cache")
+        except sqlite3.Error:
+            pass
+
+    def __len__(self) -> int:
+        try:
+            return int(self._conn().execute("SELECT COUNT(*) FROM plan_cache").fetchone()[0])
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "entries": len(self), "path": str(self.path), "evictions": self.evictions}
+
+
+# ---------------------------------------------------------------------------
+# Front-end with metrics
+# ---------------------------------------------------------------------------
+class ResponseCache:
+    """JSON-encoding wrapper around a backend that counts hits and misses."""
+
+    def __init__(self, backend) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.backend.get(key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(key, json.dumps(value, separators=(",", ":")))
+
+    def get_or_compute(self, key: str, compute: Callable[[], Tuple[Any, bool]]) -> Any:
+        """Return the cached value or ``compute()``'s; only store it when ``compute`` says so."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        value, cacheable = compute()
+        if cacheable:
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    kind = os.getenv("RECOMMENDER_CACHE", "memory").strip().lower()
+    if kind in ("off", "none", "0", "false"):
+        return None
+    ttl = float(os.getenv("RECOMMENDER_CACHE_TTL", "3600"))
+    max_entries = int(os.getenv("RECOMMENDER_CACHE_MAX_ENTRIES", "2048"))
+    if kind == "sqlite":
+        path = Path(os.getenv("RECOMMENDER_CACHE_PATH", str(_DEFAULT_PATH)))
+        try:
+            return ResponseCache(SqliteCache(path, ttl=ttl, max_entries=max_entries))
+        except (OSError, sqlite3.Error):
+            pass  # fall through to the in-process cache
+    max_bytes = int(os.getenv("RECOMMENDER_CACHE_MAX_BYTES", str(32 << 20)))
+    return ResponseCache(MemoryCache(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes))
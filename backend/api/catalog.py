@@ -0,0 +1,495 @@
+"""Columnar, array-backed recipe catalog.
+
+Instead of one Python object per recipe, the catalog keeps parallel columns:
+
+* recipe ids, names, descriptions and scalar attributes indexed by *row*,
+  with descriptions packed into a single UTF-8 ``StringHeap``;
+* ingredient and tag names interned once into vocabularies, so edges are
+  small integers rather than repeated strings;
+* recipe→ingredient and recipe→tag edges stored CSR-style as an
+  ``offsets`` array (``len(catalog) + 1``) plus a flat ``indices`` array;
+* a prebuilt ``recipe_id → row`` dict for O(1) lookups;
+* a ``(recipes × nutrients)`` matrix computed once at build time
+  (see ``api.nutrition``).
+
+``Recipe`` objects are only materialised on demand for the handful of rows a
+request actually returns.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import tempfile
+from array import array
+from dataclasses import dataclass
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from api.nutrition import NUTRIENTS, NUTRIENT_INDEX, build_nutrition_matrix, nutrient_row
+
+
+@dataclass
+class Recipe:
+    id: int
+    name: str
+    description: str
+    ingredients: List[str]
+    tags: List[str]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _lookup(keys: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Vectorised ``keys.index(q)`` for every ``q`` in ``query``; -1 when absent."""
+    if len(keys) == 0 or len(query) == 0:
+        return np.full(len(query), -1, dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    pos = np.clip(np.searchsorted(sorted_keys, query), 0, len(keys) - 1)
+    return np.where(sorted_keys[pos] == query, order[pos], -1)
+
+
+def _build_csr(
+    rows: np.ndarray, cols: np.ndarray, n_rows: int, weights: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Group ``cols`` by ``rows`` into (offsets, indices, weights), keeping input order per row."""
+    order = np.argsort(rows, kind="stable")
+    indices = cols[order].astype(np.int32, copy=False)
+    offsets = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=offsets[1:])
+    return offsets, indices, weights[order]
+
+
+class StringHeap(Sequence):
+    """Read-only ``Sequence[str]`` over UTF-8 bytes packed in one buffer.
+
+    Long text (recipe descriptions) is kept as raw bytes plus per-row
+    ``starts``/``ends`` instead of one ``str`` object per row, and decoded only
+    when a row is read. ``heap`` may be a memory-mapped array, in which case
+    untouched rows never leave the page cache.
+    """
+
+    def __init__(self, heap: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> None:
+        self.heap = heap
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    def from_strings(cls, values: Iterable[str]) -> "StringHeap":
+        encoded = [v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets[:-1], offsets[1:])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.heap.nbytes + self.starts.nbytes + self.ends.nbytes)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.heap[int(self.starts[index]):int(self.ends[index])].tobytes().decode("utf-8", "replace")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def prefix(self, index: int, limit: int) -> str:
+        """First ``limit`` characters of row ``index``, touching at most ``4 * limit`` bytes."""
+        start, end = int(self.starts[index]), int(self.ends[index])
+        stop = min(end, start + 4 * limit)
+        # A cut inside a multi-byte character is dropped rather than replaced.
+        raw = self.heap[start:stop].tobytes().decode("utf-8", "replace" if stop == end else "ignore")
+        return raw[:limit]
+
+
+class _HeapWriter:
+    """Append-only byte heap, in memory or spilled to an unlinked temporary file.
+
+    A spilled heap is memory-mapped by ``freeze``, so its bytes live in the
+    page cache rather than the Python heap and never need a growing buffer.
+    """
+
+    def __init__(self, spill: bool = False) -> None:
+        self._file = tempfile.TemporaryFile() if spill else None
+        self._buf = bytearray()
+        self.size = 0
+
+    def append(self, data: bytes) -> int:
+        start = self.size
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            try:
+                self._buf += data
+            except BufferError:  # exported to an already built catalog
+                self._buf = bytearray(self._buf) + data
+        self.size += len(data)
+        return start
+
+    def freeze(self) -> np.ndarray:
+        if self._file is None:
+            return np.frombuffer(self._buf, dtype=np.uint8)
+        self._file.flush()
+        if self.size == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(self._file, dtype=np.uint8, mode="r", shape=(self.size,))
+
+
+# ---------------------------------------------------------------------------
+# Catalog
+# ---------------------------------------------------------------------------
+class Catalog:
+    """Immutable columnar view of every recipe the recommender can pick from."""
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        names: List[str],
+        descriptions: Sequence,
+        min_prep_time: np.ndarray,
+        green_score: np.ndarray,
+        ingredient_ids: np.ndarray,
+        ingredient_names: List[str],
+        tag_ids: np.ndarray,
+        tag_names: List[str],
+        ingredient_nutrients: np.ndarray,
+        ing_offsets: np.ndarray,
+        ing_indices: np.ndarray,
+        ing_amounts: np.ndarray,
+        tag_offsets: np.ndarray,
+        tag_indices: np.ndarray,
+        nutrition: Optional[np.ndarray] = None,
+    ) -> None:
+        self.ids = ids
+        self.names = names
+        self.descriptions = descriptions
+        self.min_prep_time = min_prep_time
+        self.green_score = green_score
+        self.ingredient_ids = ingredient_ids
+        self.ingredient_names = ingredient_names
+        self.tag_ids = tag_ids
+        self.tag_names = tag_names
+        self.ingredient_nutrients = ingredient_nutrients
+        self.ing_offsets = ing_offsets
+        self.ing_indices = ing_indices
+        self.ing_amounts = ing_amounts
+        self.tag_offsets = tag_offsets
+        self.tag_indices = tag_indices
+        self.row_of: Dict[int, int] = {int(rid): row for row, rid in enumerate(ids.tolist())}
+        if nutrition is None:
+            nutrition = build_nutrition_matrix(ing_offsets, ing_indices, ing_amounts, ingredient_nutrients)
+        self.nutrition = nutrition
+        # Where the rows came from ("supabase" or "csv"), for snapshots built
+        # from CSVs a digest of those files, and, for Supabase, the per-table
+        # high-water marks used by incremental syncs.
+        self.source = ""
+        self.source_digest = ""
+        self.watermarks: Dict[str, object] = {}
+        # Edges whose recipe, ingredient or tag row had not arrived yet, as
+        # flat arrays keyed like the builder's ("ing_recipes", "ing_targets",
+        # "ing_amounts", "tag_recipes", "tag_targets").
+        self.pending_edges: Dict[str, np.ndarray] = {}
+        self._fingerprint: Optional[str] = None
+        self._id_orders: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # Derived indexes, attached by ``api.recommender`` when the catalog is loaded.
+        self.text_index = None
+        self.vector_index = None
+        self.fallback_ranker = None
+        self.filter_index = None
+        self.similarity_index = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash; equal catalogs (in any process) share a fingerprint."""
+        if self._fingerprint is None:
+            h = hashlib.blake2b(digest_size=16)
+            for arr in (self.ids, self.ing_offsets, self.ing_indices, self.ing_amounts,
+                        self.tag_offsets, self.tag_indices, self.nutrition):
+                h.update(np.ascontiguousarray(arr).tobytes())
+            for column in (self.names, self.ingredient_names, self.tag_names, self.descriptions):
+                h.update("\x1f".join(column).encode("utf-8", "replace"))
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def id_order(self, kind: str) -> Tuple[np.ndarray, np.ndarray]:
+        """``(sorted ids, column of each)`` for ``"tag"`` or ``"ingredient"`` ids, computed once."""
+        cached = self._id_orders.get(kind)
+        if cached is None:
+            ids = np.asarray(self.tag_ids if kind == "tag" else self.ingredient_ids)
+            order = np.argsort(ids, kind="stable")
+            cached = self._id_orders[kind] = (ids[order], order)
+        return cached
+
+    def __iter__(self) -> Iterator[Recipe]:
+        for row in range(len(self)):
+            yield self.recipe(row)
+
+    # -- row accessors -----------------------------------------------------
+    def row(self, recipe_id: int) -> Optional[int]:
+        return self.row_of.get(int(recipe_id))
+
+    def ingredient_rows(self, row: int) -> np.ndarray:
+        return self.ing_indices[self.ing_offsets[row]:self.ing_offsets[row + 1]]
+
+    def tag_rows(self, row: int) -> np.ndarray:
+        return self.tag_indices[self.tag_offsets[row]:self.tag_offsets[row + 1]]
+
+    def ingredients(self, row: int, limit: Optional[int] = None) -> List[str]:
+        idx = self.ingredient_rows(row)[:limit]
+        return [self.ingredient_names[i] for i in idx.tolist()]
+
+    def tags(self, row: int, limit: Optional[int] = None) -> List[str]:
+        idx = self.tag_rows(row)[:limit]
+        return [self.tag_names[i] for i in idx.tolist()]
+
+    def description(self, row: int, limit: Optional[int] = None) -> str:
+        """The row's description, or only its first ``limit`` characters."""
+        if limit is not None and isinstance(self.descriptions, StringHeap):
+            return self.descriptions.prefix(row, limit)
+        text = self.descriptions[row]
+        return text if limit is None else text[:limit]
+
+    def nutrient(self, row: int, name: str) -> float:
+        return float(self.nutrition[row, NUTRIENT_INDEX[name]])
+
+    def nutrients(self, row: int) -> Dict[str, float]:
+        return dict(zip(NUTRIENTS, self.nutrition[row].tolist()))
+
+    def recipe(self, row: int) -> Recipe:
+        return Recipe(
+            id=int(self.ids[row]),
+            name=self.names[row],
+            description=self.descriptions[row],
+            ingredients=self.ingredients(row),
+            tags=self.tags(row),
+        )
+
+    def rows_for(self, recipe_ids: np.ndarray) -> np.ndarray:
+        """Vectorised ``row`` for many ids; -1 where an id is not in this catalog."""
+        return _lookup(self.ids, np.asarray(recipe_ids, dtype=np.int64))
+
+    def get(self, recipe_id: int) -> Optional[Recipe]:
+        row = self.row(recipe_id)
+        return None if row is None else self.recipe(row)
+
+
+# ---------------------------------------------------------------------------
+# Builder
+# ---------------------------------------------------------------------------
+class CatalogBuilder:
+    """Accumulates raw table rows (Supabase or CSV) and compiles a ``Catalog``.
+
+    Rows may arrive in any order; edges pointing at unknown recipes,
+    ingredients or tags are left out of the CSR arrays when ``build`` is
+    called and kept on the catalog as ``pending_edges``. ``from_catalog``
+    re-queues them, so an edge synced before its recipe or ingredient row
+    is linked once that row arrives. Recipe,
+    ingredient and tag rows are upserts: a repeated id replaces the earlier
+    row, which is how incremental syncs patch a catalog seeded with
+    ``from_catalog``.
+    """
+
+    def __init__(self, spill_descriptions: bool = False) -> None:
+        self._row_index: Dict[int, int] = {}
+        self._ids: List[int] = []
+        self._names: List[str] = []
+        # Descriptions are the bulk of the text: keep them as one UTF-8 heap,
+        # optionally spilled to disk so large loads don't hold them in memory.
+        self._desc_heap = _HeapWriter(spill_descriptions)
+        self._desc_starts = array("q")
+        self._desc_ends = array("q")
+        self._prep: List[float] = []
+        self._green: List[float] = []
+        self._ing_index: Dict[int, int] = {}
+        self._ing_names: List[str] = []
+        self._ing_nutrients = array("d")
+        self._tag_index: Dict[int, int] = {}
+        self._tag_names: List[str] = []
+        # Edges are kept as flat int64 arrays, not tuples, so 1M+ edges stay cheap.
+        self._ing_edge_recipes = array("q")
+        self._ing_edge_targets = array("q")
+        self._ing_edge_amounts = array("d")
+        self._tag_edge_recipes = array("q")
+        self._tag_edge_targets = array("q")
+
+    @classmethod
+    def from_catalog(cls, catalog: Catalog, spill_descriptions: bool = False) -> "CatalogBuilder":
+        """Seed a builder with every row of ``catalog`` so changes can be layered on top."""
+        b = cls(spill_descriptions)
+        b._ids = catalog.ids.tolist()
+        b._row_index = dict(catalog.row_of)
+        b._names = list(catalog.names)
+        descriptions = catalog.descriptions
+        if not isinstance(descriptions, StringHeap):
+            descriptions = StringHeap.from_strings(descriptions)
+        for chunk in range(0, len(descriptions.heap), 1 << 20):
+            b._desc_heap.append(descriptions.heap[chunk:chunk + (1 << 20)].tobytes())
+        b._desc_starts = array("q", np.asarray(descriptions.starts, dtype=np.int64).tobytes())
+        b._desc_ends = array("q", np.asarray(descriptions.ends, dtype=np.int64).tobytes())
+        b._prep = catalog.min_prep_time.tolist()
+        b._green = catalog.green_score.tolist()
+        b._ing_index = {int(iid): i for i, iid in enumerate(catalog.ingredient_ids.tolist())}
+        b._ing_names = list(catalog.ingredient_names)
+        b._ing_nutrients = array("d", catalog.ingredient_nutrients.astype(np.float64).ravel().tobytes())
+        b._tag_index = {int(tid): i for i, tid in enumerate(catalog.tag_ids.tolist())}
+        b._tag_names = list(catalog.tag_names)
+        n = len(catalog)
+        ing_rows = np.repeat(np.arange(n), np.diff(catalog.ing_offsets))
+        tag_rows = np.repeat(np.arange(n), np.diff(catalog.tag_offsets))
+        b._ing_edge_recipes = array("q", catalog.ids[ing_rows].tobytes())
+        b._ing_edge_targets = array("q", catalog.ingredient_ids[catalog.ing_indices].tobytes())
+        b._ing_edge_amounts = array("d", catalog.ing_amounts.astype(np.float64).tobytes())
+        b._tag_edge_recipes = array("q", catalog.ids[tag_rows].tobytes())
+        b._tag_edge_targets = array("q", catalog.tag_ids[catalog.tag_indices].tobytes())
+        pending = catalog.pending_edges
+        if pending:
+            b._ing_edge_recipes.extend(pending["ing_recipes"].tolist())
+            b._ing_edge_targets.extend(pending["ing_targets"].tolist())
+            b._ing_edge_amounts.extend(pending["ing_amounts"].tolist())
+            b._tag_edge_recipes.extend(pending["tag_recipes"].tolist())
+            b._tag_edge_targets.extend(pending["tag_targets"].tolist())
+        return b
+
+    def add_recipe(self, row: dict) -> None:
+        rid = int(row["id"])
+        values = (
+            row.get("name") or f"Recipe {rid}",
+            row.get("description", "") or "",
+            _to_float(row.get("min_prep_time")),
+            _to_float(row.get("green_score")),
+        )
+        start = self._desc_heap.append(values[1].encode("utf-8"))
+        at = self._row_index.get(rid)
+        if at is None:
+            self._row_index[rid] = len(self._ids)
+            self._ids.append(rid)
+            self._names.append(values[0])
+            self._desc_starts.append(start)
+            self._desc_ends.append(self._desc_heap.size)
+            self._prep.append(values[2])
+            self._green.append(values[3])
+        else:
+            # The replaced description stays in the heap unreferenced; upserts are rare.
+            self._names[at], self._prep[at], self._green[at] = values[0], values[2], values[3]
+            self._desc_starts[at] = start
+            self._desc_ends[at] = self._desc_heap.size
+
+    def add_ingredient(self, row: dict) -> None:
+        iid = int(row["id"])
+        at = self._ing_index.get(iid)
+        if at is None:
+            self._ing_index[iid] = len(self._ing_names)
+            self._ing_names.append(row.get("name") or "")
+            self._ing_nutrients.extend(nutrient_row(row))
+        else:
+            self._ing_names[at] = row.get("name") or ""
+            width = len(NUTRIENTS)
+            self._ing_nutrients[at * width:(at + 1) * width] = array("d", nutrient_row(row))
+
+    def add_tag(self, row: dict) -> None:
+        tid = int(row["id"])
+        at = self._tag_index.get(tid)
+        if at is None:
+            self._tag_index[tid] = len(self._tag_names)
+            self._tag_names.append(row.get("name") or "")
+        else:
+            self._tag_names[at] = row.get("name") or ""
+
+    def add_ingredient_edge(self, row: dict) -> None:
+        self._ing_edge_recipes.append(int(row["recipe_id"]))
+        self._ing_edge_targets.append(int(row["ingredient_id"]))
+        amount = _to_float(row.get("relative_unit_100"))
+        self._ing_edge_amounts.append(0.0 if amount != amount else amount)
+
+    def add_tag_edge(self, row: dict) -> None:
+        self._tag_edge_recipes.append(int(row["recipe_id"]))
+        self._tag_edge_targets.append(int(row["tag_id"]))
+
+    def add_ingredient_edges(self, edges: Iterable[Tuple[int, int, float]]) -> None:
+        """Bulk ``add_ingredient_edge`` for parsed ``(recipe_id, ingredient_id, amount)`` tuples."""
+        recipes, targets = self._ing_edge_recipes.append, self._ing_edge_targets.append
+        amounts = self._ing_edge_amounts.append
+        for rid, iid, amount in edges:
+            recipes(rid)
+            targets(iid)
+            amounts(0.0 if amount != amount else amount)
+
+    def add_tag_edges(self, edges: Iterable[Tuple[int, int]]) -> None:
+        """Bulk ``add_tag_edge`` for parsed ``(recipe_id, tag_id)`` tuples."""
+        recipes, targets = self._tag_edge_recipes.append, self._tag_edge_targets.append
+        for rid, tid in edges:
+            recipes(rid)
+            targets(tid)
+
+    def _edges(
+        self,
+        ids: np.ndarray,
+        recipes: array,
+        targets: array,
+        vocab: Dict[int, int],
+        weights: Optional[array] = None,
+    ):
+        rows = _lookup(ids, np.frombuffer(recipes, dtype=np.int64))
+        vocab_ids = np.fromiter(vocab.keys(), dtype=np.int64, count=len(vocab))
+        cols = _lookup(vocab_ids, np.frombuffer(targets, dtype=np.int64))
+        w = np.frombuffer(weights, dtype=np.float64) if weights is not None else np.ones(len(rows))
+        keep = (rows >= 0) & (cols >= 0)
+        return _build_csr(rows[keep], cols[keep], len(ids), w[keep]), ~keep
+
+    def build(self) -> Catalog:
+        ids = np.asarray(self._ids, dtype=np.int64)
+        (ing_offsets, ing_indices, ing_amounts), ing_pending = self._edges(
+            ids, self._ing_edge_recipes, self._ing_edge_targets, self._ing_index,
+            self._ing_edge_amounts,
+        )
+        (tag_offsets, tag_indices, _), tag_pending = self._edges(
+            ids, self._tag_edge_recipes, self._tag_edge_targets, self._tag_index
+        )
+        ingredient_nutrients = np.frombuffer(self._ing_nutrients, dtype=np.float64).reshape(
+            -1, len(NUTRIENTS)
+        )
+        catalog = Catalog(
+            ids=ids,
+            names=self._names,
+            descriptions=StringHeap(
+                self._desc_heap.freeze(),
+                np.frombuffer(self._desc_starts, dtype=np.int64).copy(),
+                np.frombuffer(self._desc_ends, dtype=np.int64).copy(),
+            ),
+            min_prep_time=np.asarray(self._prep, dtype=np.float32),
+            green_score=np.asarray(self._green, dtype=np.float32),
+            ingredient_ids=np.fromiter(self._ing_index.keys(), dtype=np.int64, count=len(self._ing_index)),
+            ingredient_names=self._ing_names,
+            tag_ids=np.fromiter(self._tag_index.keys(), dtype=np.int64, count=len(self._tag_index)),
+            tag_names=self._tag_names,
+            ingredient_nutrients=ingredient_nutrients.astype(np.float32),
+            ing_offsets=ing_offsets,
+            ing_indices=ing_indices,
+            ing_amounts=ing_amounts.astype(np.float32),
+            tag_offsets=tag_offsets,
+            tag_indices=tag_indices,
+        )
+        pending = {
+            "ing_recipes": np.frombuffer(self._ing_edge_recipes, dtype=np.int64)[ing_pending],
+            "ing_targets": np.frombuffer(self._ing_edge_targets, dtype=np.int64)[ing_pending],
+            "ing_amounts": np.frombuffer(self._ing_edge_amounts, dtype=np.float64)[ing_pending],
+            "tag_recipes": np.frombuffer(self._tag_edge_recipes, dtype=np.int64)[tag_pending],
+            "tag_targets": np.frombuffer(self._tag_edge_targets, dtype=np.int64)[tag_pending],
+        }
+        if ing_pending.any() or tag_pending.any():
+            catalog.pending_edges = pending
+        return catalog
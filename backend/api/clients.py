@@ -0,0 +1,140 @@
+"""Process-wide registry of long-lived API clients.
+
+Building a ``genai.Client`` or Supabase client per call repeats DNS, TLS and
+connection-pool setup on every request. The registry builds each client once
+per process and hands the same instance (and its keep-alive HTTP pool) to
+every caller. Health is handled lazily:
+
+* callers report transport failures with ``invalidate``; the old client is
+  closed (releasing its HTTP pool) and the next ``get`` rebuilds it.
+  Timeouts are not transport failures: ``asyncio.wait_for`` raising
+  ``TimeoutError`` only means the call was slow, and the pool is fine;
+* a factory that fails (or returns ``None``, e.g. missing keys) is not
+  retried until ``retry_after`` seconds have passed;
+* clients older than ``max_age`` are rebuilt on their next ``get``, so
+  rotated credentials and stale pools eventually heal without a restart.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+try:  # both SDKs talk HTTP through httpx
+    import httpx
+except Exception:  # pragma: no cover
+    httpx = None
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """True for transport-level failures that warrant rebuilding the client.
+
+    The builtin ``TimeoutError`` (what ``asyncio.wait_for`` raises) is not one.
+    """
+    if isinstance(exc, ConnectionError):
+        return True
+    if httpx is not None and isinstance(exc, httpx.TransportError):
+        return True
+    return False
+
+
+def _close(client: Any) -> None:
+    """Best-effort ``close()`` of an evicted client so its connection pool is released."""
+    close = getattr(client, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+
+@dataclass
+class _Slot:
+    factory: Callable[[], Any]
+    max_age: Optional[float]
+    retry_after: float
+    client: Any = None
+    created_at: float = 0.0
+    failed_at: Optional[float] = None
+    builds: int = 0
+    invalidations: int = 0
+
+
+class ClientRegistry:
+    def __init__(self) -> None:
+        self._slots: Dict[str, _Slot] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        max_age: Optional[float] = None,
+        retry_after: float = 30.0,
+    ) -> None:
+        with self._lock:
+            self._slots[name] = _Slot(factory=factory, max_age=max_age, retry_after=retry_after)
+
+    def get(self, name: str) -> Any:
+        """The shared client for ``name``, building it if needed; ``None`` if unavailable."""
+        slot = self._slots[name]
+        now = time.monotonic()
+        client = slot.client
+        if client is not None and (slot.max_age is None or now - slot.created_at < slot.max_age):
+            return client
+        with self._lock:
+            if slot.client is not None and (slot.max_age is None or now - slot.created_at < slot.max_age):
+                return slot.client
+            if slot.client is None and slot.failed_at is not None and now - slot.failed_at < slot.retry_after:
+                return None
+            expired, slot.client = slot.client, None
+            try:
+                client = slot.factory()
+            except Exception:
+                client = None
+            slot.builds += 1
+            if client is None:
+                slot.failed_at = now
+            else:
+                slot.client = client
+                slot.created_at = now
+                slot.failed_at = None
+        if expired is not None:
+            _close(expired)
+        return client
+
+    def invalidate(self, name: str) -> None:
+        """Close and drop the cached client so the next ``get`` rebuilds it."""
+        with self._lock:
+            slot = self._slots.get(name)
+            if slot is None or slot.client is None:
+                return
+            client, slot.client = slot.client, None
+            slot.invalidations += 1
+        _close(client)
+
+    def report(self, name: str, exc: BaseException) -> None:
+        """Invalidate ``name`` when ``exc`` is a transport failure; ignore API-level errors."""
+        if is_connection_error(exc):
+            self.invalidate(name)
+
+    def reset(self) -> None:
+        with self._lock:
+            clients = [slot.client for slot in self._slots.values() if slot.client is not None]
+            for slot in self._slots.values():
+                slot.client = None
+                slot.failed_at = None
+        for client in clients:
+            _close(client)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "ready": slot.client is not None,
+                "builds": slot.builds,
+                "invalidations": slot.invalidations,
+            }
+            for name, slot in self._slots.items()
+        }
@@ -0,0 +1,139 @@
+"""Dense recipe vectors from a local hashed n-gram embedder.
+
+The embedder needs no model download and no network: word tokens and
+character trigrams are hashed (signed feature hashing) into a fixed number
+of dimensions and L2-normalised, so a dot product is a cosine similarity.
+
+Recipe vectors are built offline and shipped as a plain ``.npy`` matrix next
+to the CSV snapshots. At runtime the matrix is opened with ``mmap_mode="r"``
+so every uvicorn worker maps the same file pages instead of holding a copy.
+Queries are a brute-force matrix-vector product, which at 256 float32
+dimensions is ~1 ms per 100k recipes.
+
+Build the shipped index with::
+
+    python -m api.embeddings
+"""
+
+from __future__ import annotations
+
+import zlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from api.catalog import Catalog
+from api.retrieval import tokenize
+
+EMBEDDING_DIM = 256
+
+_dataset_dir = Path(__file__).resolve().parent.parent / "dataset"
+VECTORS_PATH = _dataset_dir / "recipe-vectors.npy"
+VECTOR_IDS_PATH = _dataset_dir / "recipe-vector-ids.npy"
+
+
+class HashingEmbedder:
+    """Signed feature hashing of word unigrams and character trigrams."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, trigram_weight: float = 0.5) -> None:
+        self.dim = dim
+        self.trigram_weight = trigram_weight
+
+    def _add(self, vec: np.ndarray, feature: str, weight: float) -> None:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vec[h % self.dim] += weight if (h >> 31) & 1 else -weight
+
+    def embed_weighted(self, parts: List[Tuple[str, float]]) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for text, weight in parts:
+            for tok in tokenize(text):
+                self._add(vec, "w:" + tok, weight)
+                padded = f"<{tok}>"
+                for i in range(len(padded) - 2):
+                    self._add(vec, "c:" + padded[i:i + 3], weight * self.trigram_weight)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_weighted([(text, 1.0)])
+
+    def embed_recipe(self, catalog: Catalog, row: int) -> np.ndarray:
+        return self.embed_weighted(
+            [
+                (catalog.names[row], 3.0),
+                (" ".join(catalog.tags(row)), 2.0),
+                (" ".join(catalog.ingredients(row)), 1.0),
+                (catalog.description(row, 400), 0.25),
+            ]
+        )
+
+
+class VectorIndex:
+    """Row-aligned unit vectors for every recipe in a catalog."""
+
+    def __init__(self, vectors: np.ndarray, embedder: HashingEmbedder) -> None:
+        self.vectors = vectors
+        self.embedder = embedder
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def query_vector(self, text: str) -> np.ndarray:
+        return self.embedder.embed(text)
+
+    def cosine(self, query: np.ndarray, rows=None) -> np.ndarray:
+        """Cosine similarity of ``query`` to ``rows`` (all rows when omitted)."""
+        vectors = self.vectors if rows is None else self.vectors[np.asarray(rows, dtype=np.int64)]
+        return vectors @ query
+
+
+def build_vectors(catalog: Catalog, embedder: Optional[HashingEmbedder] = None) -> np.ndarray:
+    embedder = embedder or HashingEmbedder()
+    out = np.zeros((len(catalog), embedder.dim), dtype=np.float32)
+    for row in range(len(catalog)):
+        out[row] = embedder.embed_recipe(catalog, row)
+    return out
+
+
+def patch_vector_index(catalog: Catalog, previous: VectorIndex, old_rows: np.ndarray) -> VectorIndex:
+    """Copy unchanged rows from ``previous`` and embed only rows where ``old_rows`` is -1."""
+    embedder = previous.embedder
+    out = np.zeros((len(catalog), embedder.dim), dtype=np.float32)
+    reuse = old_rows >= 0
+    out[reuse] = previous.vectors[old_rows[reuse]]
+    for row in np.flatnonzero(~reuse).tolist():
+        out[row] = embedder.embed_recipe(catalog, row)
+    return VectorIndex(out, embedder)
+
+
+def save_vectors(
+    catalog: Catalog, vectors: np.ndarray, path: Path = VECTORS_PATH, ids_path: Path = VECTOR_IDS_PATH
+) -> None:
+    np.save(path, vectors.astype(np.float32, copy=False))
+    np.save(ids_path, catalog.ids)
+
+
+def load_vector_index(
+    catalog: Catalog, path: Path = VECTORS_PATH, ids_path: Path = VECTOR_IDS_PATH
+) -> VectorIndex:
+    """Memory-map the shipped vectors when they match ``catalog``; otherwise build in memory."""
+    embedder = HashingEmbedder()
+    try:
+        ids = np.load(ids_path)
+        vectors = np.load(path, mmap_mode="r")
+        if vectors.shape == (len(catalog), embedder.dim) and np.array_equal(ids, catalog.ids):
+            return VectorIndex(vectors, embedder)
+    except (OSError, ValueError):
+        pass
+    return VectorIndex(build_vectors(catalog, embedder), embedder)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    from api.recommender import _load_recipes_from_csv, _load_recipes_from_supabase
+
+    catalog = _load_recipes_from_supabase()
+    if catalog is None:
+        catalog = _load_recipes_from_csv()
+    save_vectors(catalog, build_vectors(catalog))
+    print(f"Wrote {len(catalog)} recipe vectors to {VECTORS_PATH}")
@@ -0,0 +1,96 @@
+"""Paginated, concurrent reads of Supabase tables.
+
+A bare ``select().execute()`` returns at most PostgREST's ``max-rows`` (1000
+by default) and silently truncates anything larger. ``iter_pages`` walks a
+table in primary-key order with ``range()`` (an offset/limit Range request)
+until a short page comes back.
+
+``fetch_tables`` runs one such walk per table on a thread pool and hands every
+page to a single consumer in the calling thread as soon as it arrives, so:
+
+* a cold load takes as long as the slowest table, not the sum of all of them;
+* rows stream into the consumer (e.g. a ``CatalogBuilder``) page by page and
+  whole tables are never held as intermediate lists;
+* the consumer needs no locking, because only the calling thread touches it.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PAGE_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class TableQuery:
+    table: str
+    columns: str = "*"
+    gt: Optional[Tuple[str, Any]] = None  # (column, value) lower bound, exclusive
+    order: str = "id"
+
+
+def iter_pages(client, query: TableQuery, page_size: int = PAGE_SIZE) -> Iterator[List[dict]]:
+    """Yield ``query``'s rows page by page until the table is exhausted."""
+    start = 0
+    while True:
+        builder = client.table(query.table).select(query.columns)
+        if query.gt is not None:
+            builder = builder.gt(*query.gt)
+        rows = builder.order(query.order).range(start, start + page_size - 1).execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def fetch_tables(
+    client,
+    queries: Dict[str, TableQuery],
+    on_page: Callable[[str, List[dict]], None],
+    page_size: int = PAGE_SIZE,
+    max_workers: Optional[int] = None,
+) -> Dict[str, int]:
+    """Fetch every query concurrently, calling ``on_page(name, rows)`` per page.
+
+    Returns the row count per query name. The first error raised by any
+    fetch (or by ``on_page``) stops the remaining fetches after their
+    current page and is re-raised here.
+    """
+    pages: "queue.Queue[Tuple[str, Optional[List[dict]], Optional[BaseException]]]" = queue.Queue()
+    stop = threading.Event()
+
+    def walk(name: str, query: TableQuery) -> None:
+        try:
+            for rows in iter_pages(client, query, page_size):
+                if stop.is_set():
+                    break
+                pages.put((name, rows, None))
+        except BaseException as exc:
+            pages.put((name, None, exc))
+            return
+        pages.put((name, None, None))
+
+    counts = dict.fromkeys(queries, 0)
+    workers = max_workers or max(len(queries), 1)
+    with ThreadPoolExecutor(workers, thread_name_prefix="supabase-fetch") as pool:
+        for name, query in queries.items():
+            pool.submit(walk, name, query)
+        pending = len(queries)
+        try:
+            while pending:
+                name, rows, exc = pages.get()
+                if exc is not None:
+                    raise exc
+                if rows is None:
+                    pending -= 1
+                    continue
+                counts[name] += len(rows)
+                on_page(name, rows)
+        finally:
+            stop.set()
+    return counts
@@ -0,0 +1,209 @@
+"""Hard recipe filters backed by inverted indexes.
+
+``RecipeFilter`` holds the include/exclude constraints a request can carry
+("vegetarian, no nuts, under 30 minutes"). ``FilterIndex`` is built once per
+catalog and answers them without scanning recipe strings:
+
+* tags – one packed bitset per tag (shared with the fallback ranker);
+* ingredients – a word → ingredient-ids postings map over the ingredient
+  vocabulary, and an ingredient → recipe-rows posting list (the transpose of
+  the catalog's CSR edges). A filter term matches the ingredients whose name
+  contains all of its words, with plurals folded, and only those ingredients
+  are turned into a bitset. Includes compare words whole ("nut" matches
+  "Mixed Nuts" but not "Nutmeg"); excludes match a term word anywhere inside
+  a name's words ("nut" also drops "Hazelnuts", "Peanut Butter" and
+  "Nutmeg"), so "no nuts" errs on the side of removing too much;
+* ``min_prep_time`` / ``green_score`` – rows sorted by value plus cumulative
+  bitsets for common thresholds, so "at most 30 minutes" is one lookup and
+  any other threshold is a binary search.
+
+Every constraint becomes a packed bitset over catalog rows; the filter is
+their bitwise AND (minus the exclusions), unpacked once into a 0/1 mask that
+retrieval and ranking intersect their candidates with.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from api.catalog import Catalog
+from api.ranking import tag_bitsets
+
+PREP_TIME_BUCKETS = (10, 15, 20, 30, 45, 60, 90, 120)
+GREEN_SCORE_BUCKETS = (20, 40, 50, 60, 70, 80, 90)
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def _singular(word: str) -> str:
+    """Simple plural folding: berries → berry, tomatoes → tomato, nuts → nut."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("oes", "shes", "ches", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def ingredient_words(text: str) -> List[str]:
+    """Lower-cased, singular words of an ingredient name or filter term."""
+    return [_singular(w) for w in _WORD_RE.findall(text.casefold())]
+
+
+@dataclass
+class RecipeFilter:
+    include_tags: List[str] = field(default_factory=list)
+    exclude_tags: List[str] = field(default_factory=list)
+    include_ingredients: List[str] = field(default_factory=list)
+    exclude_ingredients: List[str] = field(default_factory=list)
+    max_prep_time: Optional[float] = None
+    min_green_score: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        for name in ("include_tags", "exclude_tags", "include_ingredients", "exclude_ingredients"):
+            values = {v.strip().lower() for v in getattr(self, name) or () if v and v.strip()}
+            setattr(self, name, sorted(values))
+
+    def is_empty(self) -> bool:
+        return not (
+            self.include_tags or self.exclude_tags or self.include_ingredients
+            or self.exclude_ingredients or self.max_prep_time is not None
+            or self.min_green_score is not None
+        )
+
+    def key(self) -> Dict[str, object]:
+        """Normalised, JSON-friendly form for cache keys."""
+        return {k: v for k, v in asdict(self).items() if v not in (None, [])}
+
+
+class _RangeIndex:
+    """Rows sorted by a numeric column with precomputed threshold bitsets."""
+
+    def __init__(self, values: np.ndarray, thresholds: Sequence[float], n: int) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        known = np.flatnonzero(~np.isnan(values))  # missing values never satisfy a bound
+        self.order = known[np.argsort(values[known], kind="stable")]
+        self.sorted = values[self.order]
+        self.n = n
+        self.at_most_bits = {float(t): self._pack(self.order[:self._right(t)]) for t in thresholds}
+        self.at_least_bits = {float(t): self._pack(self.order[self._left(t):]) for t in thresholds}
+
+    def _left(self, t: float) -> int:
+        return int(np.searchsorted(self.sorted, t, side="left"))
+
+    def _right(self, t: float) -> int:
+        return int(np.searchsorted(self.sorted, t, side="right"))
+
+    def _pack(self, rows: np.ndarray) -> np.ndarray:
+        members = np.zeros(self.n, dtype=bool)
+        members[rows] = True
+        return np.packbits(members)
+
+    def at_most(self, t: float) -> np.ndarray:
+        bits = self.at_most_bits.get(float(t))
+        return bits if bits is not None else self._pack(self.order[:self._right(t)])
+
+    def at_least(self, t: float) -> np.ndarray:
+        bits = self.at_least_bits.get(float(t))
+        return bits if bits is not None else self._pack(self.order[self._left(t):])
+
+
+class FilterIndex:
+    """Per-catalog inverted indexes answering ``RecipeFilter`` queries."""
+
+    def __init__(self, catalog: Catalog, tag_bits: Optional[np.ndarray] = None) -> None:
+        self.n = len(catalog)
+        self.tag_of = {name.lower(): i for i, name in enumerate(catalog.tag_names)}
+        self.tag_bits = tag_bits if tag_bits is not None else tag_bitsets(catalog)
+        vocab = len(catalog.ingredient_names)
+        words: Dict[str, List[int]] = {}
+        for i, name in enumerate(catalog.ingredient_names):
+            for word in dict.fromkeys(ingredient_words(name)):
+                words.setdefault(word, []).append(i)
+        self.word_postings = {word: np.asarray(ids, dtype=np.int64) for word, ids in words.items()}
+        # Transpose the recipe → ingredient CSR into ingredient → rows postings.
+        edge_rows = np.repeat(np.arange(self.n, dtype=np.int64), np.diff(catalog.ing_offsets))
+        order = np.argsort(catalog.ing_indices, kind="stable")
+        self.posting_rows = edge_rows[order]
+        self.posting_offsets = np.zeros(vocab + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(catalog.ing_indices, minlength=vocab),
+            out=self.posting_offsets[1:],
+        )
+        self.prep_time = _RangeIndex(catalog.min_prep_time, PREP_TIME_BUCKETS, self.n)
+        self.green_score = _RangeIndex(catalog.green_score, GREEN_SCORE_BUCKETS, self.n)
+        self._all = np.packbits(np.ones(self.n, dtype=bool))
+        self._none = np.zeros_like(self._all)
+
+    # -- per-constraint bitsets ---------------------------------------------
+    def _tag(self, name: str) -> np.ndarray:
+        i = self.tag_of.get(name)
+        return self.tag_bits[i] if i is not None else self._none
+
+    def ingredient_ids(self, term: str, partial: bool = False) -> List[int]:
+        """Vocabulary ids whose name has every word of ``term`` ("nuts" → Mixed Nuts, Nut Butter…).
+
+        With ``partial``, a word of ``term`` also matches inside a longer
+        word ("nut" → Hazelnuts, Peanut Butter, Nutmeg).
+        """
+        postings = []
+        for word in dict.fromkeys(ingredient_words(term)):
+            if partial:
+                hits = [ids for name, ids in self.word_postings.items() if word in name]
+                ids = np.unique(np.concatenate(hits)) if hits else None
+            else:
+                ids = self.word_postings.get(word)
+            if ids is None:
+                return []
+            postings.append(ids)
+        if not postings:
+            return []
+        ids = postings[0]
+        for p in postings[1:]:
+            ids = np.intersect1d(ids, p, assume_unique=True)
+        return ids.tolist()
+
+    def _ingredient(self, term: str, partial: bool = False) -> np.ndarray:
+        ids = self.ingredient_ids(term, partial)
+        if not ids:
+            return self._none
+        members = np.zeros(self.n, dtype=bool)
+        for i in ids:
+            members[self.posting_rows[self.posting_offsets[i]:self.posting_offsets[i + 1]]] = True
+        return np.packbits(members)
+
+    @staticmethod
+    def _any(bitsets: Iterable[np.ndarray], empty: np.ndarray) -> np.ndarray:
+        out = empty.copy()
+        for bits in bitsets:
+            out |= bits
+        return out
+
+    # -- queries --------------------------------------------------------------
+    def bits(self, f: RecipeFilter) -> np.ndarray:
+        """Packed bitset of rows satisfying every constraint of ``f``."""
+        keep = self._all.copy()
+        for name in f.include_tags:
+            keep &= self._tag(name)
+        for term in f.include_ingredients:
+            keep &= self._ingredient(term)
+        if f.max_prep_time is not None:
+            keep &= self.prep_time.at_most(f.max_prep_time)
+        if f.min_green_score is not None:
+            keep &= self.green_score.at_least(f.min_green_score)
+        drop = self._any(
+            [self._tag(name) for name in f.exclude_tags]
+            + [self._ingredient(term, partial=True) for term in f.exclude_ingredients],
+            self._none,
+        )
+        return keep & ~drop
+
+    def mask(self, f: Optional[RecipeFilter]) -> Optional[np.ndarray]:
+        """0/1 ``uint8`` mask of allowed rows, or ``None`` when ``f`` filters nothing."""
+        if f is None or f.is_empty():
+            return None
+        return np.unpackbits(self.bits(f), count=self.n)
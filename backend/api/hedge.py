@@ -0,0 +1,196 @@
+"""Latency-budgeted, hedged LLM calls with a local answer computed alongside.
+
+``Hedger.run`` (threads, for the sync SDK) and ``Hedger.run_async`` (tasks,
+for the asyncio SDK) give the same guarantee: an answer within ``budget``
+seconds, whatever the model does.
+
+* The call starts immediately. The local answer (for example the
+  deterministic fallback plan) is computed in parallel, so it is ready when
+  it is needed.
+* If the call is still pending after ``hedge_delay()`` seconds, a second,
+  identical call is fired. The delay is the observed p95 latency of
+  successful calls, so about one request in twenty sends a hedge.
+* The first call that returns a non-``None`` result wins and the other is
+  abandoned. If neither returns a result before the budget expires, or both
+  fail, the local answer is returned.
+
+Calls are expected to catch their own errors and return ``None`` instead.
+An abandoned sync call cannot be interrupted: it finishes in its worker
+thread and its result is dropped. Abandoned async calls are cancelled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+PRIMARY, HEDGE, LOCAL = "primary", "hedge", "local"
+
+
+class LatencyWindow:
+    """The last ``size`` latencies, for quantile estimates."""
+
+    def __init__(self, size: int = 256, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The ``q`` quantile, or ``None`` until ``min_samples`` have been seen."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(math.ceil(q * len(samples))) - 1)]
+
+
+class Hedger:
+    def __init__(
+        self,
+        budget: float,
+        hedge: bool = True,
+        default_hedge_delay: float = 3.0,
+        hedge_quantile: float = 0.95,
+        window: Optional[LatencyWindow] = None,
+        max_workers: int = 16,
+    ) -> None:
+        self.budget = budget
+        self.hedge = hedge
+        self.default_hedge_delay = default_hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.window = window if window is not None else LatencyWindow()
+        self.wins: Dict[str, int] = dict.fromkeys((PRIMARY, HEDGE, LOCAL), 0)
+        self.hedges = 0
+        self.budget_exceeded = 0
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="llm-call")
+
+    def hedge_delay(self) -> float:
+        observed = self.window.quantile(self.hedge_quantile)
+        return self.default_hedge_delay if observed is None else observed
+
+    def _hedge_at(self, start: float, budget: float, hedge: bool) -> float:
+        if not (self.hedge and hedge):
+            return math.inf
+        delay = self.hedge_delay()
+        return start + delay if delay < budget else math.inf
+
+    def _timed(self, call: Callable[[], Optional[T]]) -> Optional[T]:
+        start = time.monotonic()
+        result = call()
+        if result is not None:
+            self.window.observe(time.monotonic() - start)
+        return result
+
+    async def _timed_async(self, call: Callable[[], Awaitable[Optional[T]]]) -> Optional[T]:
+        start = time.monotonic()
+        result = await call()
+        if result is not None:
+            self.window.observe(time.monotonic() - start)
+        return result
+
+    def _finish(self, source: str, timed_out: bool = False) -> None:
+        self.wins[source] += 1
+        self.budget_exceeded += int(timed_out)
+
+    def run(
+        self,
+        call: Callable[[], Optional[T]],
+        local: Callable[[], T],
+        budget: Optional[float] = None,
+        hedge: bool = True,
+    ) -> Tuple[T, str]:
+        """Return ``(result, source)``; ``source`` is ``"primary"``, ``"hedge"`` or ``"local"``."""
+        budget = self.budget if budget is None else budget
+        start = time.monotonic()
+        deadline = start + budget
+        hedge_at = self._hedge_at(start, budget, hedge)
+        pending = {self._pool.submit(self._timed, call): PRIMARY}
+        fallback = local()
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            done, _ = wait(pending, timeout=min(deadline, hedge_at) - now, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception:
+                    result = None
+                if result is not None:
+                    for other in pending:
+                        other.cancel()
+                    self._finish(source)
+                    return result, source
+            if pending and time.monotonic() >= hedge_at:
+                pending[self._pool.submit(self._timed, call)] = HEDGE
+                self.hedges += 1
+                hedge_at = math.inf
+        self._finish(LOCAL, timed_out=bool(pending))
+        return fallback, LOCAL
+
+    async def run_async(
+        self,
+        call: Callable[[], Awaitable[Optional[T]]],
+        local: Callable[[], T],
+        budget: Optional[float] = None,
+        hedge: bool = True,
+    ) -> Tuple[T, str]:
+        """``run`` on the event loop; abandoned calls are cancelled."""
+        budget = self.budget if budget is None else budget
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        deadline = start + budget
+        hedge_at = self._hedge_at(start, budget, hedge)
+        pending: Dict[asyncio.Future, str] = {asyncio.ensure_future(self._timed_async(call)): PRIMARY}
+        fallback = loop.run_in_executor(None, local)  # not behind stuck sync calls
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                done, _ = await asyncio.wait(
+                    pending, timeout=min(deadline, hedge_at) - now, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    source = pending.pop(task)
+                    result = None if task.cancelled() or task.exception() else task.result()
+                    if result is not None:
+                        self._finish(source)
+                        return result, source
+                if pending and time.monotonic() >= hedge_at:
+                    pending[asyncio.ensure_future(self._timed_async(call))] = HEDGE
+                    self.hedges += 1
+                    hedge_at = math.inf
+            self._finish(LOCAL, timed_out=bool(pending))
+            return await fallback, LOCAL
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.window.quantile(0.95)
+        return {
+            "budget_s": self.budget,
+            "hedging": self.hedge,
+            "hedge_delay_s": round(self.hedge_delay(), 3),
+            "p95_s": None if p95 is None else round(p95, 3),
+            "samples": len(self.window),
+            "wins": dict(self.wins),
+            "hedges": self.hedges,
+            "budget_exceeded": self.budget_exceeded,
+        }
@@ -1,18 +1,47 @@
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import date
 from pathlib import Path
+from typing import Literal
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
-from api.recommender import create_meal_plan
+from api.filters import RecipeFilter
+from api.planner import NO_REPEAT_DAYS
+from api.recommender import (
+    BATCH_CONCURRENCY,
+    PlanRequest,
+    create_meal_plan_async,
+    create_meal_plans,
+    create_multi_day_plan,
+    recommender_metrics,
+    similar_recipes,
+    start_background_refresh,
+    stop_background_refresh,
+    stream_meal_plan,
+    trigger_catalog_refresh,
+)
+from api.similarity import NEIGHBORS
 
 _here = Path(__file__).resolve()
 load_dotenv(_here.parent.parent / ".env")
 load_dotenv(_here.parents[2] / ".env")
 load_dotenv()
 
-app = FastAPI(title="EpiCourier Meal Recommender", version="0.2.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_background_refresh()
+    yield
+    stop_background_refresh()
+
+
+app = FastAPI(title="EpiCourier Meal Recommender", version="0.2.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,11 +52,87 @@ app.add_middleware(
 )
 
 
-class RecommendRequest(BaseModel):
+class FilterFields(BaseModel):
+    """Recipe filters shared by the single-list and multi-day requests."""
+
+    include_tags: list[str] = Field(
+        default_factory=list, alias="includeTags", description="Every meal must have all of these tags."
+    )
+    exclude_tags: list[str] = Field(
+        default_factory=list, alias="excludeTags", description="No meal may have any of these tags."
+    )
+    include_ingredients: list[str] = Field(
+        default_factory=list,
+        alias="includeIngredients",
+        description="Every meal must contain an ingredient matching each of these.",
+    )
+    exclude_ingredients: list[str] = Field(
+        default_factory=list,
+        alias="excludeIngredients",
+        description="No meal may contain an ingredient with these words, even inside longer words (\"nut\" also excludes hazelnuts, peanut butter and nutmeg).",
+    )
+    max_prep_time: float | None = Field(
+        default=None, alias="maxPrepTime", ge=0, description="Maximum preparation time in minutes."
+    )
+    min_green_score: float | None = Field(
+        default=None, alias="minGreenScore", ge=0, le=100, description="Minimum green score."
+    )
+
+    model_config = {"populate_by_name": True}
+
+    def filters(self) -> RecipeFilter | None:
+        f = RecipeFilter(
+            include_tags=self.include_tags,
+            exclude_tags=self.exclude_tags,
+            include_ingredients=self.include_ingredients,
+            exclude_ingredients=self.exclude_ingredients,
+            max_prep_time=self.max_prep_time,
+            min_green_score=self.min_green_score,
+        )
+        return None if f.is_empty() else f
+
+
+class RecommendRequest(FilterFields):
     goal: str = Field(..., description="User's nutrition or fitness objective.")
     num_meals: int = Field(..., alias="numMeals", ge=1, le=10, description="How many meals to include.")
+    user_id: int | None = Field(
+        default=None, alias="userId", description="Personalise with this user's favourites, reviews and calendar."
+    )
 
-    model_config = {"populate_by_name": True}
+
+class PlannerRequest(FilterFields):
+    goal: str = Field(..., description="User's nutrition or fitness objective.")
+    user_id: int | None = Field(
+        default=None, alias="userId", description="Personalise with this user's favourites, reviews and calendar."
+    )
+    days: int = Field(7, ge=1, le=28, description="How many days to plan.")
+    meal_types: list[Literal["breakfast", "lunch", "dinner", "snack"]] = Field(
+        default_factory=lambda: ["breakfast", "lunch", "dinner"],
+        alias="mealTypes",
+        min_length=1,
+        max_length=4,
+        description="Calendar meal types to fill each day, in order.",
+    )
+    daily_calories: float | None = Field(
+        default=None, alias="dailyCalories", gt=0, description="Calories to aim at per day (default: from the goal)."
+    )
+    daily_protein: float | None = Field(
+        default=None, alias="dailyProtein", gt=0, description="Minimum protein grams per day (default: from the goal)."
+    )
+    no_repeat_days: int = Field(
+        default=NO_REPEAT_DAYS, alias="noRepeatDays", ge=0, le=14,
+        description="A recipe is not planned again within this many days.",
+    )
+    start_date: date | None = Field(
+        default=None, alias="startDate", description="Date of day 1; each day then carries its date."
+    )
+
+
+class BatchRecommendRequest(BaseModel):
+    requests: list[RecommendRequest] = Field(..., min_length=1, max_length=5000)
+    concurrency: int | None = Field(
+        default=None, ge=1, le=64, description="Maximum concurrent Gemini calls for this batch."
+    )
 
 
 class RecommendResponse(BaseModel):
@@ -40,11 +145,120 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics():
+    return recommender_metrics()
+
+
+@app.post("/catalog/refresh", status_code=202)
+def catalog_refresh(x_refresh_token: str | None = Header(default=None)):
+    """Change signal (e.g. a Supabase webhook): reload the catalog in the background."""
+    token = os.getenv("CATALOG_REFRESH_TOKEN")
+    if token and x_refresh_token != token:
+        raise HTTPException(status_code=401, detail="Invalid refresh token.")
+    trigger_catalog_refresh()
+    return {"status": "scheduled"}
+
+
 @app.post("/recommender", response_model=RecommendResponse)
-def recommend_meals(req: RecommendRequest):
+async def recommend_meals(req: RecommendRequest):
     goal = req.goal.strip()
     if not goal:
         raise HTTPException(status_code=400, detail="Goal cannot be empty.")
 
-    meals, expanded = create_meal_plan(goal, req.num_meals)
+    meals, expanded = await create_meal_plan_async(goal, req.num_meals, filters=req.filters(), user_id=req.user_id)
     return {"recipes": meals, "goal_expanded": expanded}
+
+
+@app.post("/recommender/stream")
+async def recommend_meals_stream(req: RecommendRequest, accept: str | None = Header(default=None)):
+    """``/recommender`` streamed one meal at a time as Gemini picks them.
+
+    Emits a ``meal`` event per recipe and a final ``done`` event with
+    ``{"goal_expanded": "..."}``. Sent as Server-Sent Events when the client
+    accepts ``text/event-stream``, otherwise as NDJSON lines of
+    ``{"event": ..., "data": ...}``.
+    """
+    goal = req.goal.strip()
+    if not goal:
+        raise HTTPException(status_code=400, detail="Goal cannot be empty.")
+    sse = "text/event-stream" in (accept or "")
+    events = stream_meal_plan(goal, req.num_meals, filters=req.filters(), user_id=req.user_id)
+
+    async def body():
+        async for event, data in events:
+            if sse:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            else:
+                yield json.dumps({"event": event, "data": data}) + "\n"
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/recommender/batch")
+async def recommend_meals_batch(req: BatchRecommendRequest):
+    """Plan many goals in one call, streamed as NDJSON lines in completion order.
+
+    Each line is ``{"index": i, "recipes": [...], "goal_expanded": "..."}``,
+    or ``{"index": i, "error": "..."}`` for an invalid item; ``index`` is the
+    position in ``requests``.
+    """
+    plans: list[PlanRequest] = []
+    positions: list[int] = []
+    invalid: list[int] = []
+    for i, item in enumerate(req.requests):
+        goal = item.goal.strip()
+        if not goal:
+            invalid.append(i)
+            continue
+        positions.append(i)
+        plans.append(PlanRequest(goal, item.num_meals, item.filters(), item.user_id))
+    concurrency = req.concurrency or BATCH_CONCURRENCY
+
+    async def lines():
+        for i in invalid:
+            yield json.dumps({"index": i, "error": "Goal cannot be empty."}) + "\n"
+        async for j, meals, expanded in create_meal_plans(plans, concurrency=concurrency):
+            yield json.dumps({"index": positions[j], "recipes": meals, "goal_expanded": expanded}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/planner")
+def plan_days(req: PlannerRequest):
+    """Plan ``days`` × ``mealTypes`` slots, e.g. a week of breakfasts, lunches and dinners.
+
+    Planned locally (no Gemini call) to keep daily targets, avoid repeats
+    within ``noRepeatDays`` and reuse ingredients across the week. Returns
+    ``{"goal_expanded", "days": [{"day", "date"?, "meals", "totals"}], "shopping_list"}``.
+    """
+    goal = req.goal.strip()
+    if not goal:
+        raise HTTPException(status_code=400, detail="Goal cannot be empty.")
+    if len(set(req.meal_types)) != len(req.meal_types):
+        raise HTTPException(status_code=400, detail="mealTypes must not repeat.")
+    return create_multi_day_plan(
+        goal,
+        req.days,
+        req.meal_types,
+        filters=req.filters(),
+        daily_calories=req.daily_calories,
+        daily_protein_g=req.daily_protein,
+        no_repeat_days=req.no_repeat_days,
+        start_date=req.start_date,
+        user_id=req.user_id,
+    )
+
+
+@app.get("/recipes/{recipe_id}/similar")
+def recipe_similar(recipe_id: int, limit: int = Query(default=NEIGHBORS, ge=1, le=NEIGHBORS)):
+    """Recipes most like ``recipe_id`` (shared ingredients, similar nutrition), best first.
+
+    Served from a neighbour table precomputed with the catalog, for
+    "more like this" and substitution suggestions.
+    """
+    similar = similar_recipes(recipe_id, limit)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Recipe not found.")
+    return {"recipe_id": recipe_id, "similar": similar}
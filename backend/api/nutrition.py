@@ -0,0 +1,72 @@
+"""Per-recipe nutrition computed from ingredient nutrients.
+
+A recipe's nutrients are the sum over its ingredients of
+``ingredient_nutrients * relative_unit_100 / 100`` — the same rule the web
+app uses in ``getRecipeDetail``. Written as a matrix product this is
+
+    nutrition (recipes × nutrients) = A (recipes × ingredients) · N (ingredients × nutrients)
+
+where ``A`` is the sparse recipe→ingredient amount matrix already held CSR
+style by the catalog. The product is computed once at catalog load with one
+``np.bincount`` per nutrient column, so every later lookup is a row read.
+"""
+
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
+
+# Column order matches ingredients-supabase.csv and the Ingredient table.
+NUTRIENTS = (
+    "calories_kcal",
+    "protein_g",
+    "carbs_g",
+    "sugars_g",
+    "agg_fats_g",
+    "cholesterol_mg",
+    "agg_minerals_mg",
+    "vit_a_microg",
+    "agg_vit_b_mg",
+    "vit_c_mg",
+    "vit_d_microg",
+    "vit_e_mg",
+    "vit_k_microg",
+)
+NUTRIENT_INDEX: Dict[str, int] = {name: i for i, name in enumerate(NUTRIENTS)}
+# Adult daily reference amounts per NUTRIENTS column (FDA daily values; the
+# aggregate columns sum their members'), so nutrients compare as % of a day.
+DAILY_VALUES = np.array(
+    [2000, 50, 275, 50, 78, 300, 9000, 900, 30, 90, 20, 15, 120], dtype=np.float32
+)
+
+
+def nutrient_row(row: dict) -> list[float]:
+    """Extract the nutrient columns of one Ingredient row; missing values count as 0."""
+    values = []
+    for name in NUTRIENTS:
+        try:
+            values.append(float(row.get(name) or 0.0))
+        except (TypeError, ValueError):
+            values.append(0.0)
+    return values
+
+
+def build_nutrition_matrix(
+    offsets: np.ndarray,
+    indices: np.ndarray,
+    amounts: np.ndarray,
+    ingredient_nutrients: np.ndarray,
+) -> np.ndarray:
+    """Sparse (CSR) × dense product giving a ``(n_recipes, len(NUTRIENTS))`` float32 matrix."""
+    n_recipes = len(offsets) - 1
+    out = np.zeros((n_recipes, len(NUTRIENTS)), dtype=np.float32)
+    if len(indices) == 0:
+        return out
+    edge_rows = np.repeat(np.arange(n_recipes), np.diff(offsets))
+    scale = amounts / 100.0
+    # One column at a time keeps the temporary at one value per edge, not 13.
+    for j in range(len(NUTRIENTS)):
+        contrib = ingredient_nutrients[indices, j] * scale
+        out[:, j] = np.bincount(edge_rows, weights=contrib, minlength=n_recipes)
+    return out
@@ -0,0 +1,255 @@
+"""Multi-day meal planning: days × meal-type slots filled from the catalog.
+
+A week plan is a set problem across slots, not ``num_meals`` picks in a
+row. The objective is
+
+    Σ slot relevance − Σ per-day target penalty − reuse_weight · new ingredients
+        − Σ repeat_weight · no_repeat_days / gap
+
+where relevance is the ranker's score for the slot's meal type (min-max
+scaled per meal type), the per-day penalty is ``selection.target_penalty``
+on the day's calorie/protein totals, and a recipe's new ingredients are
+those not already on the plan's shopping list, as a fraction of an average
+recipe's. A recipe may not come back within ``no_repeat_days`` of its last
+use unless its meal type runs out of recipes. Past that window, a recipe
+served again ``gap`` days later costs ``repeat_weight · no_repeat_days / gap``.
+Without that cost a repeat brings no new ingredients and would be free, and
+plans settle into a ``no_repeat_days`` cycle.
+
+It is solved in two steps:
+
+1. Beam search, slot by slot in calendar order. Every beam state is
+   extended with the ``branch`` best allowed candidates of the slot's meal
+   type, and the ``beam`` best partial plans survive. Day penalties are
+   charged when a day is complete.
+2. Local swaps. Each slot in turn takes the pool recipe that most improves
+   the full objective, until a pass changes nothing. This repairs greedy
+   choices that only look bad once later days exist.
+
+Candidate pools come from ``FallbackRanker.candidates`` once per meal type,
+so a 7-day, 3-slot plan costs a few milliseconds with no I/O.
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from api.catalog import Catalog
+from api.nutrition import NUTRIENT_INDEX
+from api.personalization import UserProfile, personalize
+from api.ranking import GoalIntent
+from api.selection import NutritionTarget, target_penalty
+
+# The Calendar table's meal_type values.
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack")
+PLAN_BEAM = 8
+PLAN_BRANCH = 12
+PLAN_POOL = 60  # ranked candidates per meal type
+PLAN_SWAP_PASSES = 3
+NO_REPEAT_DAYS = 3
+REUSE_WEIGHT = 0.3
+REPEAT_WEIGHT = 0.6
+_REPEAT_PENALTY = 1.0  # charged when a meal type has too few recipes for the window
+
+# (prefer, penalize) tags per meal type, lower-cased catalog tag names.
+_MEAL_TYPE_TAGS = {
+    "breakfast": ({"breakfast", "brunch"}, {"mainmeal", "alcoholic", "datenight", "curry", "stew"}),
+    "lunch": ({"mainmeal", "pasta", "pie", "savory", "pulse"}, {"desert", "cake", "pudding", "alcoholic"}),
+    "dinner": ({"mainmeal", "curry", "stew", "casserole", "datenight"}, {"breakfast", "desert", "cake", "pudding"}),
+    "snack": ({"snack", "treat", "bun", "baking"}, {"mainmeal", "casserole", "stew"}),
+}
+
+
+@dataclass
+class PlanSpec:
+    """Shape and constraints of a multi-day plan."""
+
+    days: int = 7
+    meal_types: Tuple[str, ...] = ("breakfast", "lunch", "dinner")
+    target: NutritionTarget = field(default_factory=NutritionTarget)  # per day
+    no_repeat_days: int = NO_REPEAT_DAYS
+    reuse_weight: float = REUSE_WEIGHT
+    repeat_weight: float = REPEAT_WEIGHT
+
+
+@dataclass
+class _State:
+    score: float
+    picks: List[int]
+    pantry: Set[int]  # ingredients already on the shopping list
+    last_day: Dict[int, int]  # recipe row -> day it was last planned
+
+
+def _slot_intent(intent: GoalIntent, meal_type: str) -> GoalIntent:
+    prefer, penalize = _MEAL_TYPE_TAGS.get(meal_type, (set(), set()))
+    prefer = (intent.prefer_tags | prefer) - intent.penalize_tags
+    return replace(intent, prefer_tags=prefer, penalize_tags=(intent.penalize_tags | penalize) - prefer)
+
+
+class MealPlanner:
+    """Fills ``days × meal_types`` slots for one goal over one catalog."""
+
+    def __init__(
+        self,
+        catalog: Catalog,
+        beam: int = PLAN_BEAM,
+        branch: int = PLAN_BRANCH,
+        pool: int = PLAN_POOL,
+    ) -> None:
+        self.catalog = catalog
+        self.beam = beam
+        self.branch = branch
+        self.pool = pool
+        self.calories = catalog.nutrition[:, NUTRIENT_INDEX["calories_kcal"]]
+        self.proteins = catalog.nutrition[:, NUTRIENT_INDEX["protein_g"]]
+
+    def _pools(
+        self,
+        intent: GoalIntent,
+        spec: PlanSpec,
+        allowed: Optional[np.ndarray],
+        profile: Optional[UserProfile],
+    ) -> Dict[str, Tuple[List[int], Dict[int, float]]]:
+        ranker = self.catalog.fallback_ranker
+        exclude = profile.exclude_rows(self.catalog).tolist() if profile is not None else ()
+        pools = {}
+        for meal_type in dict.fromkeys(spec.meal_types):
+            rows, scores = ranker.candidates(
+                _slot_intent(intent, meal_type), self.pool, spec.days, exclude_rows=exclude, allowed=allowed
+            )
+            if profile is not None and len(rows):
+                scores = personalize(scores, profile.scores(self.catalog, rows))
+            scores = scores.astype(np.float64)
+            span = float(scores.max() - scores.min()) if len(scores) else 0.0
+            rel = (scores - scores.min()) / span if span > 0 else np.ones_like(scores)
+            pools[meal_type] = (rows.tolist(), dict(zip(rows.tolist(), rel.tolist())))
+        return pools
+
+    def plan(
+        self,
+        intent: GoalIntent,
+        spec: PlanSpec,
+        allowed: Optional[np.ndarray] = None,
+        profile: Optional[UserProfile] = None,
+    ) -> List[List[int]]:
+        """Catalog rows per day, one per meal type in ``spec.meal_types`` order.
+
+        A user ``profile`` adds the user's affinities to slot relevance and
+        keeps their recent or disliked recipes out. Empty when the catalog
+        (or ``allowed``) has no recipes to offer.
+        """
+        if self.catalog.fallback_ranker is None or spec.days <= 0 or not spec.meal_types:
+            return []
+        pools = self._pools(intent, spec, allowed, profile)
+        if not all(rows for rows, _ in pools.values()):
+            return []
+        ings: Dict[int, Set[int]] = {
+            row: set(self.catalog.ingredient_rows(row).tolist())
+            for rows, _ in pools.values() for row in rows
+        }
+        unit = max(float(np.mean([len(s) for s in ings.values()])), 1.0)  # an average recipe's ingredients
+        picks = self._beam_search(pools, ings, unit, spec)
+        self._swap(picks, pools, ings, unit, spec)
+        width = len(spec.meal_types)
+        return [picks[d * width:(d + 1) * width] for d in range(spec.days)]
+
+    # -- objective -----------------------------------------------------------
+    def _day_penalty(self, rows: Sequence[int], spec: PlanSpec) -> float:
+        if spec.target.is_empty():
+            return 0.0
+        kcal = float(sum(self.calories[r] for r in rows))
+        protein = float(sum(self.proteins[r] for r in rows))
+        return target_penalty(kcal, protein, len(rows), spec.target)
+
+    def _blocked(self, row: int, day: int, last_day: Dict[int, int], spec: PlanSpec) -> bool:
+        last = last_day.get(row)
+        return last is not None and day - last < max(spec.no_repeat_days, 1)
+
+    @staticmethod
+    def _repeat_cost(gap: int, spec: PlanSpec) -> float:
+        """Cost of serving a recipe again ``gap`` days after it was last planned."""
+        window = max(spec.no_repeat_days, 1)
+        if gap < window:
+            return _REPEAT_PENALTY
+        return spec.repeat_weight * window / gap
+
+    # -- step 1 --------------------------------------------------------------
+    def _beam_search(self, pools, ings: Dict[int, Set[int]], unit: float, spec: PlanSpec) -> List[int]:
+        width = len(spec.meal_types)
+        states = [_State(0.0, [], set(), {})]
+        for slot in range(spec.days * width):
+            day, pos = divmod(slot, width)
+            rows, rel = pools[spec.meal_types[pos]]
+            day_ends = pos == width - 1
+            options: List[Tuple[float, int, int]] = []
+            for si, state in enumerate(states):
+                free = [r for r in rows if not self._blocked(r, day, state.last_day, spec)]
+                taken = free[:self.branch]
+                if len(taken) < self.branch:
+                    # Too few recipes for the window: reuse the least recently used ones.
+                    used = [r for r in rows if self._blocked(r, day, state.last_day, spec)]
+                    used.sort(key=lambda r: state.last_day[r])
+                    taken += used[:self.branch - len(taken)]
+                for row in taken:
+                    gain = rel[row] - spec.reuse_weight * len(ings[row] - state.pantry) / unit
+                    if row in state.last_day:
+                        gain -= self._repeat_cost(day - state.last_day[row], spec)
+                    if day_ends:
+                        today = state.picks[len(state.picks) - pos:] + [row]
+                        gain -= self._day_penalty(today, spec)
+                    options.append((state.score + gain, si, row))
+            survivors = []
+            for score, si, row in heapq.nlargest(self.beam, options, key=lambda o: o[0]):
+                state = states[si]
+                last_day = dict(state.last_day)
+                last_day[row] = day
+                survivors.append(_State(score, state.picks + [row], state.pantry | ings[row], last_day))
+            states = survivors
+        return states[0].picks
+
+    # -- step 2 --------------------------------------------------------------
+    def _swap(self, picks: List[int], pools, ings: Dict[int, Set[int]], unit: float, spec: PlanSpec) -> None:
+        width = len(spec.meal_types)
+        counts = Counter(i for row in picks for i in ings[row])  # the shopping list
+        for _ in range(PLAN_SWAP_PASSES):
+            changed = False
+            for slot, old in enumerate(picks):
+                day, pos = divmod(slot, width)
+                rows, rel = pools[spec.meal_types[pos]]
+                start = day * width
+                others = picks[start:slot] + picks[slot + 1:start + width]
+                base_penalty = self._day_penalty(picks[start:start + width], spec)
+                # Days on which each recipe is used elsewhere in the plan.
+                used_on: Dict[int, List[int]] = {}
+                for s, row in enumerate(picks):
+                    if s != slot:
+                        used_on.setdefault(row, []).append(s // width)
+                window = max(spec.no_repeat_days, 1)
+                dropped = sum(1 for i in ings[old] if counts[i] == 1)
+                old_repeats = sum(self._repeat_cost(abs(day - d), spec) for d in used_on.get(old, ()))
+                best, best_row = 1e-9, old
+                for row in rows:
+                    if row == old or any(abs(day - d) < window for d in used_on.get(row, ())):
+                        continue
+                    added = sum(1 for i in ings[row] if counts[i] - (i in ings[old]) == 0)
+                    repeats = sum(self._repeat_cost(abs(day - d), spec) for d in used_on.get(row, ()))
+                    delta = (
+                        rel[row] - rel[old]
+                        - spec.reuse_weight * (added - dropped) / unit
+                        - repeats + old_repeats
+                        - self._day_penalty(others + [row], spec) + base_penalty
+                    )
+                    if delta > best:
+                        best, best_row = delta, row
+                if best_row != old:
+                    counts.subtract(ings[old])
+                    counts.update(ings[best_row])
+                    picks[slot] = best_row
+                    changed = True
+            if not changed:
+                break
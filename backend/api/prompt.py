@@ -0,0 +1,116 @@
+"""Compact catalog encoding for the Gemini prompt, and token accounting.
+
+The selected meals are sent as a TSV table with one header line instead of
+repeating ``id:`` / ``name:`` / ``tags:`` / ``ingredients:`` labels on every
+row. Tags are replaced by numbers from a legend printed once. Only the most
+relevant ingredients are kept for each recipe: those matching a goal word
+come first, then the rest by amount (the largest ingredient says most about
+a dish).
+
+``TokenMeter`` records the ``usage_metadata`` that Gemini returns with every
+response, so the effect of prompt-size changes on tokens (and, through the
+hedger's latency window, on latency) can be measured rather than guessed.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from api.catalog import Catalog
+from api.retrieval import tokenize
+
+PROMPT_INGREDIENTS = int(os.getenv("PROMPT_INGREDIENTS", "4"))
+PROMPT_TAGS = 6
+
+
+def _cell(text: str) -> str:
+    return " ".join(str(text).split())  # no tabs or newlines inside a TSV cell
+
+
+def relevant_ingredients(
+    catalog: Catalog, row: int, goal_terms: Iterable[str], limit: int = PROMPT_INGREDIENTS
+) -> List[str]:
+    """Up to ``limit`` of the row's ingredients: goal matches first, then by amount."""
+    lo, hi = int(catalog.ing_offsets[row]), int(catalog.ing_offsets[row + 1])
+    names = [catalog.ingredient_names[i] for i in catalog.ing_indices[lo:hi].tolist()]
+    amounts = np.nan_to_num(np.asarray(catalog.ing_amounts[lo:hi], dtype=np.float64)).tolist()
+    terms = set(goal_terms)
+    order = sorted(
+        range(len(names)),
+        key=lambda j: (not terms.intersection(tokenize(names[j])), -amounts[j], j),
+    )
+    return [names[j] for j in order[:limit]]
+
+
+def catalog_table(
+    goal: str,
+    catalog: Catalog,
+    rows: Sequence[int],
+    max_ingredients: int = PROMPT_INGREDIENTS,
+    max_tags: int = PROMPT_TAGS,
+) -> str:
+    """The rows as a tag legend plus a TSV table (``id name tags ingredients``)."""
+    row_tags = [catalog.tags(row, max_tags) for row in rows]
+    counts = Counter(tag for tags in row_tags for tag in tags)
+    code = {tag: i for i, (tag, _) in enumerate(counts.most_common())}
+    terms = tokenize(goal)
+    lines = ["Tags: " + " ".join(f"{i}={_cell(tag)}" for tag, i in code.items()), "id\tname\ttags\tingredients"]
+    for row, tags in zip(rows, row_tags):
+        ingredients = "; ".join(_cell(name) for name in relevant_ingredients(catalog, row, terms, max_ingredients))
+        lines.append(
+            f"{int(catalog.ids[row])}\t{_cell(catalog.names[row])}\t"
+            f"{','.join(str(code[tag]) for tag in tags)}\t{ingredients}"
+        )
+    return "\n".join(lines)
+
+
+_USAGE_FIELDS = {
+    "prompt": "prompt_token_count",
+    "output": "candidates_token_count",
+    "thoughts": "thoughts_token_count",
+    "cached": "cached_content_token_count",
+    "total": "total_token_count",
+}
+
+
+class TokenMeter:
+    """Running totals of Gemini token usage per call."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.prompt_chars = 0
+        self.totals: Dict[str, int] = dict.fromkeys(_USAGE_FIELDS, 0)
+        self.last: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, usage: Any, prompt_chars: int) -> None:
+        """Add one response's ``usage_metadata``; responses without it are ignored."""
+        if usage is None:
+            return
+        counts = {name: int(getattr(usage, field, None) or 0) for name, field in _USAGE_FIELDS.items()}
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += prompt_chars
+            for name, n in counts.items():
+                self.totals[name] += n
+            self.last = counts
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.calls
+            mean = {name: round(n / calls, 1) for name, n in self.totals.items()} if calls else {}
+            chars_per_token = (
+                round(self.prompt_chars / self.totals["prompt"], 2) if self.totals["prompt"] else None
+            )
+            return {
+                "calls": calls,
+                "totals": dict(self.totals),
+                "mean": mean,
+                "last": dict(self.last),
+                "prompt_chars_per_token": chars_per_token,
+            }
@@ -0,0 +1,255 @@
+"""Deterministic, goal-aware ranking used when Gemini is unavailable.
+
+The goal text is parsed into a ``GoalIntent`` (nutrient directions such as
+"higher protein" or "lower carb", preferred/penalised/excluded tags and an
+optional calorie ceiling). ``FallbackRanker`` precomputes, once per catalog:
+
+* a standardised nutrient feature matrix (macro energy shares, log-scaled
+  calories and micronutrients), stored nutrient-major so a goal only reads
+  the columns it mentions;
+* one packed bitset per tag, so tag preferences are a few ``bitwise_or``
+  calls over ``len(catalog) / 8`` bytes.
+
+Scoring the whole catalog is then a small dense dot product plus bitset
+masks. ``candidates`` returns the top of that ranking; ``api.selection``
+picks a diverse, target-aware set from it.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from api.catalog import Catalog
+from api.nutrition import NUTRIENTS, NUTRIENT_INDEX
+from api.selection import NutritionTarget
+
+# Kcal per gram, used to turn macro grams into energy shares.
+_ENERGY = {"protein_g": 4.0, "carbs_g": 4.0, "sugars_g": 4.0, "agg_fats_g": 9.0}
+
+_TAG_BONUS = 1.0
+_TAG_PENALTY = 0.75
+_MISSING_NUTRITION_PENALTY = 1.0
+_RELAXED_EXCLUSION_PENALTY = 5.0
+_EXCLUDED = 1e6
+
+
+# ---------------------------------------------------------------------------
+# Goal parsing
+# ---------------------------------------------------------------------------
+@dataclass
+class GoalIntent:
+    nutrient_weights: Dict[str, float] = field(default_factory=dict)
+    prefer_tags: Set[str] = field(default_factory=set)
+    penalize_tags: Set[str] = field(default_factory=set)
+    exclude_tags: Set[str] = field(default_factory=set)
+    max_calories: Optional[float] = None
+    daily_calories: Optional[float] = None
+    daily_protein_g: Optional[float] = None
+    labels: List[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        return ", ".join(self.labels)
+
+    def target(self) -> NutritionTarget:
+        return NutritionTarget(calories=self.daily_calories, protein_g=self.daily_protein_g)
+
+
+# (pattern, nutrient weights, label)
+_NUTRIENT_RULES = [
+    (r"high[- ]?protein|\bprotein|muscle|\bbulk|strength|recovery", {"protein_g": 1.0}, "higher protein"),
+    (r"low[- ]?carb|\bketo|cut(?:ting)? carb", {"carbs_g": -1.0}, "lower carb"),
+    (r"high[- ]?carb|endurance|\benergy|marathon|athlet", {"carbs_g": 0.7}, "carb-forward"),
+    (r"\blose|weight loss|fat loss|\bcut\b(?! (?:sugar|carb|salt|sodium))|\blean|\bslim|low[- ]?cal",
+     {"calories_kcal": -1.0}, "lighter"),
+    (r"gain weight|weight gain|high[- ]?cal|calorific", {"calories_kcal": 0.8}, "energy-dense"),
+    (r"low[- ]?fat|heart", {"agg_fats_g": -0.8}, "lower fat"),
+    (r"heart|cholesterol", {"cholesterol_mg": -0.8}, "lower cholesterol"),
+    (r"sugar|diabet", {"sugars_g": -1.0}, "lower sugar"),
+    (r"sodium|\bsalt", {"agg_minerals_mg": -0.6}, "lower sodium"),
+    (r"immun|vitamin c", {"vit_c_mg": 0.8}, "vitamin C rich"),
+    (r"\bbone|vitamin d", {"vit_d_microg": 0.6}, "vitamin D rich"),
+    (r"focus|\bbrain", {"agg_vit_b_mg": 0.6}, "B-vitamin rich"),
+]
+
+_MEAT = {"meat", "seafood", "fish", "shellfish"}
+
+# (pattern, prefer, penalize, exclude, label)
+_TAG_RULES = [
+    (r"\bvegan", {"vegetarian", "pulse"}, set(), _MEAT | {"dairy", "cheasy"}, "vegan"),
+    (r"vegetarian|veggie|plant[- ]based", {"vegetarian", "pulse"}, set(), _MEAT, "vegetarian"),
+    (r"pescatarian", {"seafood", "fish"}, set(), {"meat"}, "pescatarian"),
+    (r"no nuts?|nut[- ]free|nut allerg", set(), set(), {"nutty"}, "nut-free"),
+    (r"dairy[- ]free|lactose", set(), set(), {"dairy", "cheasy"}, "dairy-free"),
+    (r"dessert|sweet tooth", {"desert", "sweet", "cake", "pudding"}, set(), set(), "dessert"),
+    (r"\blose|weight loss|low[- ]?cal|sugar|diabet", set(), {"calorific", "treat", "cake", "desert"}, set(), None),
+]
+
+_CALORIE_CEILING = re.compile(
+    r"(?:under|below|less than|max(?:imum)?|at most|<)\s*(\d{2,4})\s*(?:k?cals?|calories)"
+)
+_DAILY_CALORIES = re.compile(r"(\d{1,2},?\d{3})\s*(?:k?cals?|calories)\s*(?:a|per|/|each)?\s*(?:day|daily)")
+_DAILY_PROTEIN = re.compile(r"(\d{2,3})\s*g(?:rams?)?\s*(?:of\s+)?protein")
+
+
+def parse_goal(goal: str, tag_names: Iterable[str] = ()) -> GoalIntent:
+    """Turn free-text goal into a ``GoalIntent`` with simple keyword rules."""
+    text = goal.lower()
+    intent = GoalIntent()
+    for pattern, weights, label in _NUTRIENT_RULES:
+        if re.search(pattern, text):
+            for name, w in weights.items():
+                intent.nutrient_weights[name] = intent.nutrient_weights.get(name, 0.0) + w
+            intent.labels.append(label)
+    for pattern, prefer, penalize, exclude, label in _TAG_RULES:
+        if re.search(pattern, text):
+            intent.prefer_tags |= prefer
+            intent.penalize_tags |= penalize
+            intent.exclude_tags |= exclude
+            if label:
+                intent.labels.append(label)
+    words = set(re.findall(r"[a-z]+", text))
+    for tag in tag_names:
+        if tag.lower() in words:
+            intent.prefer_tags.add(tag.lower())
+    intent.penalize_tags -= intent.prefer_tags
+    match = _CALORIE_CEILING.search(text)
+    if match:
+        intent.max_calories = float(match.group(1))
+        intent.labels.append(f"under {match.group(1)} kcal")
+    match = _DAILY_CALORIES.search(text)
+    if match:
+        intent.daily_calories = float(match.group(1).replace(",", ""))
+        intent.labels.append(f"about {int(intent.daily_calories)} kcal in total")
+    match = _DAILY_PROTEIN.search(text)
+    if match:
+        intent.daily_protein_g = float(match.group(1))
+        intent.labels.append(f"at least {match.group(1)} g protein in total")
+    return intent
+
+
+# ---------------------------------------------------------------------------
+# Ranker
+# ---------------------------------------------------------------------------
+def _zscore(x: np.ndarray) -> np.ndarray:
+    std = float(x.std())
+    return (x - x.mean()) / std if std > 0 else np.zeros_like(x)
+
+
+def _nutrient_features(nutrition: np.ndarray) -> np.ndarray:
+    """Standardised ``(len(NUTRIENTS), n)`` features; macros as shares of energy."""
+    kcal = nutrition[:, NUTRIENT_INDEX["calories_kcal"]].astype(np.float64)
+    safe_kcal = np.where(kcal > 0, kcal, 1.0)
+    features = np.zeros((len(NUTRIENTS), len(nutrition)), dtype=np.float32)
+    for j, name in enumerate(NUTRIENTS):
+        col = nutrition[:, j].astype(np.float64)
+        if name in _ENERGY:
+            raw = np.where(kcal > 0, col * _ENERGY[name] / safe_kcal, 0.0)
+        else:
+            raw = np.log1p(np.maximum(col, 0.0))
+        features[j] = _zscore(raw)
+    return features
+
+
+def tag_bitsets(catalog: Catalog) -> np.ndarray:
+    """``(n_tags, ceil(n / 8))`` packed membership bits, one row per tag."""
+    n = len(catalog)
+    members = np.zeros((len(catalog.tag_names), n), dtype=bool)
+    edge_rows = np.repeat(np.arange(n), np.diff(catalog.tag_offsets))
+    members[catalog.tag_indices, edge_rows] = True
+    return np.packbits(members, axis=1)
+
+
+class FallbackRanker:
+    """Scores every catalog row against a ``GoalIntent`` without any I/O."""
+
+    def __init__(self, catalog: Catalog) -> None:
+        self.catalog = catalog
+        self.n = len(catalog)
+        self.features = _nutrient_features(catalog.nutrition)
+        self.calories = catalog.nutrition[:, NUTRIENT_INDEX["calories_kcal"]]
+        self.has_nutrition = self.calories > 0
+        self.missing_nutrition = (~self.has_nutrition).view(np.uint8)
+        green = catalog.green_score.astype(np.float64)
+        fill = float(np.nanmean(green)) if np.isfinite(green).any() else 0.0
+        green = np.where(np.isnan(green), fill, green)
+        # A tiny eco prior keeps ties deterministic and nudges towards greener recipes.
+        self.prior = (0.05 * _zscore(green)).astype(np.float32)
+        self.tag_of = {name.lower(): i for i, name in enumerate(catalog.tag_names)}
+        self.tag_bits = tag_bitsets(catalog)
+
+    def tag_mask(self, names: Iterable[str]) -> Optional[np.ndarray]:
+        """0/1 ``uint8`` membership of any tag in ``names`` (``None`` when no tag is known)."""
+        idx = [self.tag_of[n] for n in names if n in self.tag_of]
+        if not idx:
+            return None
+        packed = np.bitwise_or.reduce(self.tag_bits[idx], axis=0)
+        return np.unpackbits(packed, count=self.n)
+
+    def score(self, intent: GoalIntent, boost: Optional[np.ndarray] = None) -> np.ndarray:
+        # Masks are applied as 0/1 multiply-adds: with scattered masks this is
+        # several times faster than boolean indexing or ``where=`` ufuncs.
+        scores = self.prior.copy()
+        for name, w in intent.nutrient_weights.items():
+            scores += np.float32(w) * self.features[NUTRIENT_INDEX[name]]
+        if intent.nutrient_weights:
+            scores -= np.float32(_MISSING_NUTRITION_PENALTY) * self.missing_nutrition
+        prefer = self.tag_mask(intent.prefer_tags)
+        if prefer is not None:
+            scores += np.float32(_TAG_BONUS) * prefer
+        penalize = self.tag_mask(intent.penalize_tags)
+        if penalize is not None:
+            scores -= np.float32(_TAG_PENALTY) * penalize
+        if boost is not None:
+            scores += boost.astype(np.float32, copy=False)
+        return scores
+
+    def blocked(self, intent: GoalIntent) -> Optional[np.ndarray]:
+        """Rows violating a hard constraint as a 0/1 mask, or ``None`` when there are none."""
+        mask = self.tag_mask(intent.exclude_tags)
+        if intent.max_calories is not None:
+            over = (self.missing_nutrition | (self.calories > intent.max_calories)).view(np.uint8)
+            mask = over if mask is None else mask | over
+        return mask
+
+    def candidates(
+        self,
+        intent: GoalIntent,
+        pool: int,
+        k: int,
+        boost: Optional[np.ndarray] = None,
+        exclude_rows: Iterable[int] = (),
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top ``pool`` rows and their scores, best first, with constraints applied for a ``k``-set.
+
+        The goal's exclusions are dropped only if at least ``k`` rows remain.
+        """
+        k = min(k, self.n)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = self.score(intent, boost)
+        available = self.n
+        if allowed is not None:
+            scores -= np.float32(_EXCLUDED) * (allowed ^ 1)
+            available = int(np.count_nonzero(allowed))
+        blocked = self.blocked(intent)
+        if blocked is not None:
+            if allowed is not None:
+                blocked = blocked & allowed
+            if available - int(np.count_nonzero(blocked)) >= k:
+                scores -= np.float32(_EXCLUDED) * blocked
+            else:
+                # Too few recipes satisfy the hard constraints: keep them first, then the rest.
+                scores -= np.float32(_RELAXED_EXCLUSION_PENALTY) * blocked
+        skip = list(exclude_rows)
+        if skip:
+            scores[np.asarray(skip, dtype=np.int64)] = -_EXCLUDED
+        pool = min(self.n, max(pool, k))
+        cand = np.argpartition(scores, self.n - pool)[self.n - pool:] if pool < self.n else np.arange(self.n)
+        cand = cand[scores[cand] > -_EXCLUDED / 2]
+        cand = cand[np.lexsort((cand, -scores[cand]))]
+        return cand, scores[cand]
@@ -3,24 +3,51 @@
 Workflow:
 1) Load recipes (name, tags, ingredients, description) from Supabase.
    If Supabase is unreachable, fall back to bundled CSV snapshots.
-2) Send a short list of available recipes to Gemini 2.5 Flash and ask it
-   to select `num_meals` of them for the user's goal, returning JSON.
-3) If Gemini is unavailable, fall back to a deterministic picker over
-   the Supabase recipe list.
+2) Rank the whole catalog against the goal: a local ranker scores every
+   recipe against intents parsed from the goal (nutrient directions, tags,
+   calorie ceilings) plus BM25 and hashed n-gram vector relevance.
+3) Select the plan's `num_meals` recipes from the top candidates: MMR keeps
+   them distinct, and a knapsack keeps totals near any daily calorie or
+   protein target in the goal.
+4) Ask Gemini 2.5 Flash to write the goal summary and a rationale for each
+   selected meal, returning JSON. If Gemini is unavailable, the same meals
+   are written up locally.
 """
 
 from __future__ import annotations
 
+import asyncio
 import csv
-import json
 import os
-import random
+import threading
 from dataclasses import dataclass, asdict
+from datetime import date, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
+import numpy as np
 from dotenv import load_dotenv
 
+from api.breaker import AimdLimiter, CallGuard, CircuitBreaker
+from api.cache import cache_from_env, cache_key
+from api.catalog import Catalog, CatalogBuilder, _to_float
+from api.clients import ClientRegistry
+from api.embeddings import load_vector_index, patch_vector_index
+from api.fetch import PAGE_SIZE, TableQuery, fetch_tables
+from api.filters import FilterIndex, RecipeFilter
+from api.hedge import Hedger
+from api.personalization import ProfileStore, UserProfile, build_profiles, personalize
+from api.planner import NO_REPEAT_DAYS, MealPlanner, PlanSpec
+from api.prompt import PROMPT_INGREDIENTS, TokenMeter, catalog_table
+from api.ranking import FallbackRanker, parse_goal
+from api.refresh import CatalogRefresher
+from api.retrieval import Bm25Index
+from api.schema import MealReply, PlanReply, coerce_plan, parse_meal, parse_plan, response_schema
+from api.selection import KNAPSACK_POOL, NutritionTarget, select_meals
+from api.similarity import SimilarityIndex
+from api.snapshot import SNAPSHOT_PATH, load_snapshot, source_digest
+from api.streaming import PlanStreamParser
+
 try:  # Gemini SDK
     from google import genai
     try:
@@ -47,15 +74,6 @@ load_dotenv()
 # ---------------------------------------------------------------------------
 # Data structures
 # ---------------------------------------------------------------------------
-@dataclass
-class Recipe:
-    id: int
-    name: str
-    description: str
-    ingredients: List[str]
-    tags: List[str]
-
-
 @dataclass
 class Meal:
     recipe_id: int
@@ -79,133 +97,458 @@ class Meal:
         return base
 
 
+@dataclass
+class PlanRequest:
+    """One goal in a ``create_meal_plans`` batch."""
+
+    goal: str
+    num_meals: int
+    filters: Optional[RecipeFilter] = None
+    user_id: Optional[int] = None
+
+
 # ---------------------------------------------------------------------------
 # Supabase recipe loading (with CSV fallback)
 # ---------------------------------------------------------------------------
-def _get_supabase_client() -> Optional[Client]:
+def _new_supabase_client() -> Optional[Client]:
     if create_client is None:
         return None
     url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
     key = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
     if not url or not key:
         return None
+    return create_client(url, key)
+
+
+# One pooled, keep-alive client of each kind per process (see api.clients).
+_CLIENTS = ClientRegistry()
+_CLIENTS.register("supabase", _new_supabase_client, max_age=3600)
+
+
+def _get_supabase_client() -> Optional[Client]:
+    return _CLIENTS.get("supabase")
+
+
+SUPABASE_PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", str(PAGE_SIZE)))
+
+# Catalog tables in the order they feed the builder; Recipe is synced
+# incrementally by ``updated_at`` and the rest by their append-only ``id``.
+_TABLE_COLUMNS = {
+    "Recipe": "*",
+    "Ingredient": "*",
+    "Recipe-Ingredient_Map": "*",
+    "RecipeTag": "id,name",
+    "Recipe-Tag_Map": "*",
+}
+_RECIPE_ID_WATERMARK = "Recipe.id"
+
+
+def _table_sinks(builder: CatalogBuilder) -> dict:
+    return {
+        "Recipe": builder.add_recipe,
+        "Ingredient": builder.add_ingredient,
+        "Recipe-Ingredient_Map": builder.add_ingredient_edge,
+        "RecipeTag": builder.add_tag,
+        "Recipe-Tag_Map": builder.add_tag_edge,
+    }
+
+
+def _advance_watermarks(watermarks: dict, table: str, rows: List[dict]) -> None:
+    """Raise ``watermarks`` in place to the highest ``updated_at``/``id`` in ``rows``."""
+    key = _RECIPE_ID_WATERMARK if table == "Recipe" else table
+    ids = [int(r["id"]) for r in rows if r.get("id") is not None]
+    if ids:
+        watermarks[key] = max(max(ids), watermarks.get(key, 0))
+    if table == "Recipe":
+        stamps = [r["updated_at"] for r in rows if r.get("updated_at")]
+        if stamps:
+            watermarks["Recipe"] = max(stamps + [watermarks.get("Recipe") or stamps[0]])
+
+
+def _apply_page(
+    sinks: dict, watermarks: dict, table: str, rows: List[dict], changed: Optional[Set[int]] = None
+) -> None:
+    """Feed one page of ``table`` into the builder behind ``sinks``."""
+    add = sinks[table]
+    for row in rows:
+        add(row)
+    _advance_watermarks(watermarks, table, rows)
+    if changed is not None:
+        if table == "Recipe":
+            changed.update(int(r["id"]) for r in rows)
+        elif table in ("Recipe-Ingredient_Map", "Recipe-Tag_Map"):
+            changed.update(int(r["recipe_id"]) for r in rows)
+
+
+def _pending_edges(catalog: Catalog) -> Set[Tuple[str, int, int]]:
+    """``(kind, recipe_id, target_id)`` of edges still waiting for their other end."""
+    pending = catalog.pending_edges
+    if not pending:
+        return set()
+    return {
+        (kind, rid, tid)
+        for kind in ("ing", "tag")
+        for rid, tid in zip(pending[f"{kind}_recipes"].tolist(), pending[f"{kind}_targets"].tolist())
+    }
+
+
+def _load_recipes_from_supabase() -> Optional[Catalog]:
+    client = _get_supabase_client()
+    if client is None:
+        return None
+    builder = CatalogBuilder(spill_descriptions=True)
+    watermarks: dict = {}
+    queries = {name: TableQuery(name, columns) for name, columns in _TABLE_COLUMNS.items()}
+    sinks = _table_sinks(builder)
     try:
-        return create_client(url, key)
-    except Exception:
+        fetch_tables(
+            client,
+            queries,
+            lambda table, rows: _apply_page(sinks, watermarks, table, rows),
+            page_size=SUPABASE_PAGE_SIZE,
+        )
+    except Exception as exc:
+        _CLIENTS.report("supabase", exc)
         return None
+    catalog = builder.build()
+    catalog.source = "supabase"
+    catalog.watermarks = watermarks
+    return catalog
 
 
-def _load_recipes_from_supabase() -> Optional[List[Recipe]]:
+def _sync_recipes_from_supabase(current: Catalog) -> Optional[Tuple[Catalog, Set[int]]]:
+    """Apply rows added or updated since ``current.watermarks`` on top of ``current``.
+
+    Returns ``(catalog, changed_recipe_ids)``; the catalog is ``current``
+    itself when nothing changed, and ``None`` means Supabase was unreachable.
+    Deleted rows are not seen here; the periodic full reload drops them.
+    """
     client = _get_supabase_client()
     if client is None:
         return None
+    wm = current.watermarks
+    queries = {
+        name: TableQuery(name, columns, gt=("id", wm.get(name, 0)))
+        for name, columns in _TABLE_COLUMNS.items()
+    }
+    if wm.get("Recipe"):
+        queries["Recipe"] = TableQuery("Recipe", gt=("updated_at", wm["Recipe"]))
+    else:
+        queries["Recipe"] = TableQuery("Recipe", gt=("id", wm.get(_RECIPE_ID_WATERMARK, 0)))
+
+    # Seeding a builder from the live catalog is not free, so buffer the
+    # (normally tiny) delta and only layer it on when there is one.
+    pages: List[Tuple[str, List[dict]]] = []
     try:
-        recipes = client.table("Recipe").select("*").execute().data
-        ingredients = client.table("Ingredient").select("id,name").execute().data
-        recipe_ing_map = client.table("Recipe-Ingredient_Map").select("*").execute().data
-        tags = client.table("RecipeTag").select("id,name").execute().data
-        recipe_tag_map = client.table("Recipe-Tag_Map").select("*").execute().data
-    except Exception:
+        fetch_tables(client, queries, lambda table, rows: pages.append((table, rows)),
+                     page_size=SUPABASE_PAGE_SIZE)
+    except Exception as exc:
+        _CLIENTS.report("supabase", exc)
         return None
+    if not pages:
+        return current, set()
+    builder = CatalogBuilder.from_catalog(current, spill_descriptions=True)
+    sinks = _table_sinks(builder)
+    watermarks = dict(wm)
+    changed: Set[int] = set()
+    for table, rows in pages:
+        _apply_page(sinks, watermarks, table, rows, changed)
+    catalog = builder.build()
+    # Edges that arrived ahead of their recipe/ingredient/tag in an earlier
+    # sync and link up now change their recipe too.
+    changed.update(rid for _, rid, _ in _pending_edges(current) - _pending_edges(catalog))
+    catalog.source = "supabase"
+    catalog.watermarks = watermarks
+    return catalog, changed
 
-    ing_lookup = {int(i["id"]): i.get("name", "") for i in ingredients}
-    tag_lookup = {int(t["id"]): t.get("name", "") for t in tags}
-
-    ingredients_by_recipe: Dict[int, List[str]] = {}
-    for m in recipe_ing_map:
-        rid = int(m["recipe_id"])
-        iid = int(m["ingredient_id"])
-        ingredients_by_recipe.setdefault(rid, []).append(ing_lookup.get(iid, ""))
-
-    tags_by_recipe: Dict[int, List[str]] = {}
-    for m in recipe_tag_map:
-        rid = int(m["recipe_id"])
-        tid = int(m["tag_id"])
-        tags_by_recipe.setdefault(rid, []).append(tag_lookup.get(tid, ""))
-
-    catalog: List[Recipe] = []
-    for r in recipes:
-        rid = int(r["id"])
-        catalog.append(
-            Recipe(
-                id=rid,
-                name=r.get("name", f"Recipe {rid}"),
-                description=r.get("description", "") or "",
-                ingredients=ingredients_by_recipe.get(rid, []),
-                tags=tags_by_recipe.get(rid, []),
-            )
-        )
-    return catalog
 
+_dataset_dir = _here.parent.parent / "dataset"
+CSV_PATHS = (
+    _dataset_dir / "recipes-supabase.csv",
+    _dataset_dir / "ingredients-supabase.csv",
+    _dataset_dir / "recipe_ingredient_map-supabase.csv",
+    _dataset_dir / "tags-supabase.csv",
+    _dataset_dir / "recipe_tag_map-supabase.csv",
+)
+# Compiled catalog snapshot (see api.snapshot); "off" disables it.
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", str(SNAPSHOT_PATH))
 
-def _load_recipes_from_csv() -> List[Recipe]:
-    """Offline fallback using the dataset snapshots."""
-    dataset_dir = _here.parent.parent / "dataset"
-    recipes_path = dataset_dir / "recipes-supabase.csv"
-    ingredients_path = dataset_dir / "ingredients-supabase.csv"
-    map_path = dataset_dir / "recipe_ingredient_map-supabase.csv"
-    tags_path = dataset_dir / "tags-supabase.csv"
-    tag_map_path = dataset_dir / "recipe_tag_map-supabase.csv"
-
-    with recipes_path.open() as f:
-        recipes_rows = list(csv.DictReader(f))
-    with ingredients_path.open() as f:
-        ingredient_rows = list(csv.DictReader(f))
-    with map_path.open() as f:
-        map_rows = list(csv.DictReader(f))
-    with tags_path.open() as f:
-        tag_rows = list(csv.DictReader(f))
-    with tag_map_path.open() as f:
-        tag_map_rows = list(csv.DictReader(f))
-
-    ing_lookup = {int(r["id"]): r["name"] for r in ingredient_rows}
-    tag_lookup = {int(r["id"]): r["name"] for r in tag_rows}
-
-    ingredients_by_recipe: Dict[int, List[str]] = {}
-    for row in map_rows:
-        rid = int(row["recipe_id"])
-        iid = int(row["ingredient_id"])
-        ingredients_by_recipe.setdefault(rid, []).append(ing_lookup.get(iid, ""))
-
-    tags_by_recipe: Dict[int, List[str]] = {}
-    for row in tag_map_rows:
-        rid = int(row["recipe_id"])
-        tid = int(row["tag_id"])
-        tags_by_recipe.setdefault(rid, []).append(tag_lookup.get(tid, ""))
-
-    catalog: List[Recipe] = []
-    for row in recipes_rows:
-        rid = int(row["id"])
-        catalog.append(
-            Recipe(
-                id=rid,
-                name=row.get("name", f"Recipe {rid}"),
-                description=row.get("description", "") or "",
-                ingredients=ingredients_by_recipe.get(rid, []),
-                tags=tags_by_recipe.get(rid, []),
-            )
-        )
+
+def _csv_records(path: Path) -> Iterator[dict]:
+    with path.open(newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def _csv_columns(path: Path, *columns: Tuple[str, Callable]) -> Iterator[tuple]:
+    """Stream ``path`` as tuples of the named, parsed columns, without per-row dicts."""
+    with path.open(newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        picks = [(header.index(name), parse) for name, parse in columns]
+        for record in reader:
+            yield tuple(parse(record[i]) for i, parse in picks)
+
+
+def _parse_csv_catalog() -> Catalog:
+    """Build the catalog by streaming the bundled CSV snapshots.
+
+    The small lookup tables are read row by row; the edge tables, which
+    dominate row counts, go straight into the builder's flat arrays, and
+    descriptions are spilled to a memory-mapped heap instead of held as
+    ``str`` objects.
+    """
+    recipes_path, ingredients_path, map_path, tags_path, tag_map_path = CSV_PATHS
+    builder = CatalogBuilder(spill_descriptions=True)
+    for path, add in (
+        (recipes_path, builder.add_recipe),
+        (ingredients_path, builder.add_ingredient),
+        (tags_path, builder.add_tag),
+    ):
+        for row in _csv_records(path):
+            add(row)
+    builder.add_ingredient_edges(
+        _csv_columns(map_path, ("recipe_id", int), ("ingredient_id", int), ("relative_unit_100", _to_float))
+    )
+    builder.add_tag_edges(_csv_columns(tag_map_path, ("recipe_id", int), ("tag_id", int)))
+    catalog = builder.build()
+    catalog.source = "csv"
     return catalog
 
 
-_RECIPE_CACHE: Optional[List[Recipe]] = None
+def _load_snapshot() -> Optional[Catalog]:
+    if CATALOG_SNAPSHOT.lower() in ("off", "none", "0", "false", ""):
+        return None
+    return load_snapshot(Path(CATALOG_SNAPSHOT))
+
+
+def _load_recipes_from_csv(snapshot: Optional[Catalog] = None) -> Catalog:
+    """Offline fallback using the dataset snapshots.
+
+    Uses the compiled binary snapshot (``snapshot`` if the caller already
+    loaded it) when it was built from exactly these CSVs, and parses them
+    otherwise.
+    """
+    if snapshot is None:
+        snapshot = _load_snapshot()
+    if snapshot is not None and snapshot.source == "csv" and snapshot.source_digest == source_digest(CSV_PATHS):
+        return snapshot
+    return _parse_csv_catalog()
+
+
+_RECIPE_CACHE: Optional[Catalog] = None
+_CATALOG_LOCK = threading.Lock()
+CATALOG_REFRESH_S = float(os.getenv("CATALOG_REFRESH_S", "900"))
+# "incremental" (default) pulls only rows past the stored watermarks and does a
+# full reload every CATALOG_FULL_RELOAD_EVERY refreshes to pick up deletes.
+CATALOG_SYNC = os.getenv("CATALOG_SYNC", "incremental").strip().lower()
+CATALOG_FULL_RELOAD_EVERY = int(os.getenv("CATALOG_FULL_RELOAD_EVERY", "24"))
+_SYNCS_SINCE_FULL = 0
 
 
-def _get_catalog() -> List[Recipe]:
+def _get_catalog() -> Catalog:
     global _RECIPE_CACHE
-    if _RECIPE_CACHE is not None:
+    catalog = _RECIPE_CACHE
+    if catalog is not None:
+        return catalog
+    # Cold start only: later reloads happen in the background refresher.
+    with _CATALOG_LOCK:
+        if _RECIPE_CACHE is None:
+            # A snapshot compiled from Supabase is served straight away; the
+            # refresher then catches up from its watermarks.
+            snapshot = _load_snapshot()
+            from_snapshot = snapshot is not None and snapshot.source == "supabase"
+            catalog = snapshot if from_snapshot else _load_recipes_from_supabase()
+            if catalog is None:
+                # Read the snapshot once: it is the CSV fallback's first choice too.
+                catalog = _load_recipes_from_csv(snapshot) if snapshot is not None else _parse_csv_catalog()
+            _RECIPE_CACHE = _prepare_catalog(catalog)
+            if from_snapshot:
+                _REFRESHER.trigger()
         return _RECIPE_CACHE
-    catalog = _load_recipes_from_supabase()
-    if catalog is None:
-        catalog = _load_recipes_from_csv()
-    _RECIPE_CACHE = catalog
+
+
+def _prepare_catalog(
+    catalog: Catalog, previous: Optional[Catalog] = None, changed_ids: Iterable[int] = ()
+) -> Catalog:
+    """Build the derived indexes a freshly loaded catalog needs before serving.
+
+    With ``previous``, text, vector and similarity indexes are patched: rows
+    whose recipe id is unchanged reuse their postings/vectors/signatures and
+    only ``changed_ids`` (and recipes new to the catalog) are re-tokenised,
+    re-embedded and re-hashed.
+    """
+    if (
+        previous is not None
+        and previous.text_index is not None
+        and previous.vector_index is not None
+        and previous.similarity_index is not None
+    ):
+        old_rows = previous.rows_for(catalog.ids)
+        changed = np.fromiter(changed_ids, dtype=np.int64)
+        if len(changed):
+            old_rows[np.isin(catalog.ids, changed)] = -1
+        catalog.text_index = Bm25Index.patched(catalog, previous.text_index, old_rows)
+        catalog.vector_index = patch_vector_index(catalog, previous.vector_index, old_rows)
+        catalog.similarity_index = SimilarityIndex.patched(catalog, previous.similarity_index, old_rows)
+    else:
+        catalog.text_index = Bm25Index.build(catalog)
+        catalog.vector_index = load_vector_index(catalog)
+        catalog.similarity_index = SimilarityIndex.build(catalog)
+    catalog.fallback_ranker = FallbackRanker(catalog)
+    catalog.filter_index = FilterIndex(catalog, tag_bits=catalog.fallback_ranker.tag_bits)
+    catalog.fingerprint  # computed here so the request path never pays for it
+    catalog.id_order("tag"), catalog.id_order("ingredient")  # id lookups for user profiles
     return catalog
 
 
+def refresh_catalog() -> bool:
+    """Update from Supabase off the request path and atomically swap it in.
+
+    Returns ``True`` when a changed catalog was published. If Supabase is
+    unreachable the current catalog is kept (never replaced by the CSV
+    snapshot).
+    """
+    global _RECIPE_CACHE, _SYNCS_SINCE_FULL
+    current = _RECIPE_CACHE
+    incremental = (
+        CATALOG_SYNC == "incremental"
+        and current is not None
+        and current.source == "supabase"
+        and bool(current.watermarks)
+        and _SYNCS_SINCE_FULL < CATALOG_FULL_RELOAD_EVERY
+    )
+    if incremental:
+        synced = _sync_recipes_from_supabase(current)
+        if synced is None:
+            return False
+        _SYNCS_SINCE_FULL += 1
+        fresh, changed = synced
+        if fresh is current:
+            return False
+        _prepare_catalog(fresh, previous=current, changed_ids=changed)
+    else:
+        fresh = _load_recipes_from_supabase()
+        if fresh is None:
+            return False
+        _SYNCS_SINCE_FULL = 0
+        if current is not None and current.fingerprint == fresh.fingerprint:
+            current.watermarks = fresh.watermarks
+            return False
+        _prepare_catalog(fresh)
+    # One reference assignment: readers see the old or the new catalog, never a mix.
+    _RECIPE_CACHE = fresh
+    return True
+
+
+_REFRESHER = CatalogRefresher(refresh_catalog, interval=CATALOG_REFRESH_S)
+
+
+def start_background_refresh() -> None:
+    """Warm the catalog and start periodic refreshes without blocking the caller."""
+    if _RECIPE_CACHE is None:
+        threading.Thread(target=_get_catalog, name="catalog-warmup", daemon=True).start()
+    _REFRESHER.start()
+    _PROFILE_REFRESHER.start()
+    _PROFILE_REFRESHER.trigger()
+
+
+def stop_background_refresh() -> None:
+    _REFRESHER.stop()
+    _PROFILE_REFRESHER.stop()
+
+
+def trigger_catalog_refresh() -> None:
+    _REFRESHER.trigger()
+
+
+# ---------------------------------------------------------------------------
+# User profiles (personalization)
+# ---------------------------------------------------------------------------
+PROFILE_REFRESH_S = float(os.getenv("PROFILE_REFRESH_S", "900"))
+_PROFILES = ProfileStore(
+    max_users=int(os.getenv("PROFILE_CACHE_USERS", "10000")),
+    ttl=float(os.getenv("PROFILE_TTL_S", "86400")),
+)
+_ACTIVITY_COLUMNS = {
+    "Favorite": "id,user_id,recipe_id,created_at",
+    "Review": "id,user_id,recipe_id,rating,created_at,updated_at",
+    "Calendar": "id,user_id,recipe_id,date,status,created_at",
+}
+
+
+def refresh_profiles() -> bool:
+    """Rebuild every user's profile from Favorite, Review and Calendar, off the request path.
+
+    Returns ``True`` when a build was published; if Supabase is unreachable
+    the current profiles are kept.
+    """
+    client = _get_supabase_client()
+    if client is None:
+        return False
+    catalog = _get_catalog()
+    rows: dict[str, list] = {name: [] for name in _ACTIVITY_COLUMNS}
+    try:
+        fetch_tables(
+            client,
+            {name: TableQuery(name, columns) for name, columns in _ACTIVITY_COLUMNS.items()},
+            lambda table, page: rows[table].extend(page),
+            page_size=SUPABASE_PAGE_SIZE,
+        )
+    except Exception as exc:
+        _CLIENTS.report("supabase", exc)
+        return False
+    _PROFILES.replace(build_profiles(catalog, rows["Favorite"], rows["Review"], rows["Calendar"]))
+    return True
+
+
+_PROFILE_REFRESHER = CatalogRefresher(refresh_profiles, interval=PROFILE_REFRESH_S)
+
+
+def user_profile(user_id: Optional[int]) -> Optional[UserProfile]:
+    """The cached profile of ``user_id``; ``None`` for anonymous or unknown users."""
+    return _PROFILES.get(int(user_id)) if user_id is not None else None
+
+
+# ---------------------------------------------------------------------------
+# Retrieval
+# ---------------------------------------------------------------------------
+SELECTION_POOL = 40  # ranked candidates the meal-set selection chooses from
+
+
+def _goal_boost(goal: str, catalog: Catalog) -> Optional[np.ndarray]:
+    """Per-row retrieval relevance for the ranker: scaled BM25 plus goal/recipe cosine."""
+    boost = None
+    if catalog.text_index is not None:
+        lexical = catalog.text_index.scores(goal)
+        top = float(lexical.max()) if len(lexical) else 0.0
+        if top > 0:
+            boost = lexical / top
+    if catalog.vector_index is not None:
+        index = catalog.vector_index
+        dense = np.maximum(index.cosine(index.query_vector(goal)), 0.0)
+        boost = dense if boost is None else boost + dense
+    return boost
+
+
+def _similarity(goal: str, catalog: Catalog, rows: List[int]) -> List[float]:
+    """Cosine similarity between the goal and each row's recipe vector."""
+    if catalog.vector_index is None or not rows:
+        return [0.0] * len(rows)
+    index = catalog.vector_index
+    return [round(float(s), 3) for s in index.cosine(index.query_vector(goal), rows)]
+
+
+def _allowed_rows(catalog: Catalog, filters: Optional[RecipeFilter]) -> Optional[np.ndarray]:
+    """0/1 mask of rows passing the request ``filters`` (``None``: no filtering)."""
+    if filters is None or catalog.filter_index is None:
+        return None
+    return catalog.filter_index.mask(filters)
+
+
 # ---------------------------------------------------------------------------
 # Gemini helpers
 # ---------------------------------------------------------------------------
-def _get_gemini_client():
+def _new_gemini_client():
     api_key = (
         os.getenv("GEMINI_KEY")
         or os.getenv("GEMINI_API_KEY")
@@ -213,100 +556,283 @@ def _get_gemini_client():
     )
     if not api_key or genai is None:
         return None
+    # The HTTP timeout is a backstop: the hedger stops waiting at the latency
+    # budget, but a sync call it abandons still holds a worker until it ends.
+    return genai.Client(api_key=api_key, http_options={"timeout": int(GEMINI_TIMEOUT_S * 1000)})
+
+
+_CLIENTS.register("gemini", _new_gemini_client, max_age=3600)
+
+
+def _get_gemini_client():
+    return _CLIENTS.get("gemini")
+
+
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_TIMEOUT_S = float(os.getenv("GEMINI_TIMEOUT_S", "20"))  # latency budget per plan
+GEMINI_HEDGE = os.getenv("GEMINI_HEDGE", "1") != "0"
+# Hedge delay until enough calls have been timed to use their p95.
+GEMINI_HEDGE_DELAY_S = float(os.getenv("GEMINI_HEDGE_DELAY_S", "3"))
+_HEDGER = Hedger(GEMINI_TIMEOUT_S, hedge=GEMINI_HEDGE, default_hedge_delay=GEMINI_HEDGE_DELAY_S)
+GEMINI_MAX_CONCURRENCY = float(os.getenv("GEMINI_MAX_CONCURRENCY", "64"))
+
+
+def _new_gemini_guard() -> CallGuard:
+    # While Gemini keeps failing, skip it for GEMINI_BREAKER_RESET_S and plan
+    # locally; concurrent calls are capped by an AIMD limit that halves on errors.
+    return CallGuard(
+        CircuitBreaker(
+            failure_threshold=int(os.getenv("GEMINI_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("GEMINI_BREAKER_RESET_S", "30")),
+        ),
+        AimdLimiter(initial=GEMINI_MAX_CONCURRENCY / 2, max_limit=GEMINI_MAX_CONCURRENCY),
+    )
+
+
+_GEMINI_GUARD = _new_gemini_guard()
+_TOKENS = TokenMeter()
+
+
+def _build_prompt(goal: str, num_meals: int, catalog: Catalog, rows: Sequence[int]) -> str:
+    # Keep prompt compact: only the selected meals go in, as a TSV table
+    catalog_text = catalog_table(goal, catalog, rows, PROMPT_INGREDIENTS)
+
+    return f"""
+You are a registered dietitian. The {len(rows)} meals below were chosen for the goal; explain each one.
+Goal: "{goal}"
+
+Meals (tab-separated; tags are numbers from the Tags legend):
+{catalog_text}
+
+Return JSON: goal_expanded is one or two sentences on how to eat for the goal. For each meal, summary
+says why the recipe fits, reason is a clear, user-friendly rationale and instructions are 1-2 short prep sentences.
+Rules: include every meal above exactly once, in the order given, with recipe_id from the id column.
+"""
+
+
+def _gemini_config(recipe_ids: Sequence[int] = ()):
+    cfg = {"temperature": 0.45, "response_mime_type": "application/json"}
+    if len(recipe_ids):
+        cfg["response_schema"] = response_schema(recipe_ids)
+    if GenerateContentConfig is not None:
+        cfg = GenerateContentConfig(**cfg)
+    return cfg
+
+
+def _gemini_request(goal: str, catalog: Catalog, rows: Sequence[int]) -> tuple[str, Any]:
+    """Prompt and config for one call; the schema limits recipe_id to the selected ``rows``."""
+    return _build_prompt(goal, len(rows), catalog, rows), _gemini_config(catalog.ids[list(rows)].tolist())
+
+
+def _parse_gemini_response(response) -> Optional[PlanReply]:
+    text = getattr(response, "text", "") or getattr(response, "candidates", None)
+    if not text:
+        return None
+    if isinstance(text, str):
+        raw_json = text
+    else:
+        try:
+            raw_json = text[0].content.parts[0].text  # type: ignore[index]
+        except Exception:
+            return None
+    return parse_plan(raw_json)
+
+
+def _call_gemini(goal: str, catalog: Catalog, rows: Sequence[int]) -> Optional[PlanReply]:
+    """Ask Gemini to write up the selected ``rows`` for the goal and return JSON."""
+    client = _get_gemini_client()
+    if client is None or not len(rows):
+        return None
+    # Built before taking a permit, so a failure here cannot leak it.
+    prompt, config = _gemini_request(goal, catalog, rows)
+    permit = _GEMINI_GUARD.admit()
+    if permit is None:
+        return None
+    ok = None
     try:
-        return genai.Client(api_key=api_key)
-    except Exception:
+        response = client.models.generate_content(model=GEMINI_MODEL, contents=prompt, config=config)
+        ok = True
+        _TOKENS.record(getattr(response, "usage_metadata", None), len(prompt))
+        return _parse_gemini_response(response)
+    except Exception as exc:
+        ok = False
+        _CLIENTS.report("gemini", exc)
         return None
+    finally:
+        _GEMINI_GUARD.done(permit, ok)
+
 
+async def _call_gemini_async(
+    goal: str, catalog: Catalog, rows: Sequence[int], timeout: float = GEMINI_TIMEOUT_S
+) -> Optional[PlanReply]:
+    """Non-blocking ``_call_gemini`` on the SDK's asyncio client, bounded by ``timeout``.
 
-def _call_gemini(goal: str, num_meals: int, catalog: List[Recipe]) -> Optional[dict]:
-    """Ask Gemini to pick recipes from the supplied catalog and return JSON."""
+    A timeout or API error yields ``None`` (the caller falls back locally);
+    cancellation of the surrounding request propagates and aborts the call.
+    """
     client = _get_gemini_client()
-    if client is None:
+    if client is None or not len(rows):
+        return None
+    prompt, config = _gemini_request(goal, catalog, rows)
+    permit = _GEMINI_GUARD.admit()
+    if permit is None:
+        return None
+    ok = None
+    try:
+        response = await asyncio.wait_for(
+            client.aio.models.generate_content(model=GEMINI_MODEL, contents=prompt, config=config),
+            timeout=timeout,
+        )
+        ok = True
+        _TOKENS.record(getattr(response, "usage_metadata", None), len(prompt))
+        return _parse_gemini_response(response)
+    except Exception as exc:
+        ok = False
+        _CLIENTS.report("gemini", exc)
         return None
+    finally:
+        _GEMINI_GUARD.done(permit, ok)
 
-    # Keep prompt compact: sample up to 40 recipes
-    sample_recipes = random.sample(catalog, k=min(len(catalog), 40))
-    lines = []
-    for r in sample_recipes:
-        ing = ", ".join(r.ingredients[:6]) if r.ingredients else "N/A"
-        tags = ", ".join(r.tags[:6]) if r.tags else "N/A"
-        lines.append(f"- id:{r.id} | name:{r.name} | tags:{tags} | ingredients:{ing}")
-    catalog_text = "\n".join(lines)
-
-    prompt = f"""
-You are a registered dietitian. Choose exactly {num_meals} meals from the catalog below that best align with the goal.
-Goal: "{goal}"
 
-Catalog (only choose from these):
-{catalog_text}
+async def _stream_gemini(
+    goal: str,
+    catalog: Catalog,
+    rows: Sequence[int],
+    parser: PlanStreamParser,
+    timeout: float = GEMINI_TIMEOUT_S,
+) -> AsyncIterator[dict]:
+    """Stream Gemini's plan through ``parser``, yielding each meal object as it completes.
 
-Return ONLY valid JSON:
-{{
-  "goal_expanded": "one or two sentences on how to eat for the goal",
-  "meals": [
-    {{
-      "meal_number": 1,
-      "recipe_id": 123,
-      "name": "Use the recipe's name",
-      "summary": "Why this recipe fits",
-      "reason": "Clear, user-friendly rationale",
-      "instructions": "1-2 short prep sentences"
-    }}
-  ]
-}}
-Rules: every recipe_id must come from the catalog; no markdown; include exactly {num_meals} meals.
-"""
+    ``timeout`` bounds the whole stream. A timeout or API error ends the
+    stream early (``parser`` keeps whatever arrived); cancellation propagates.
+    """
+    client = _get_gemini_client()
+    if client is None or not len(rows):
+        return
+    prompt, config = _gemini_request(goal, catalog, rows)
+    permit = _GEMINI_GUARD.admit()
+    if permit is None:
+        return
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    ok = None
+    usage = None  # the final chunk carries the call's totals
     try:
-        cfg = {"temperature": 0.45, "response_mime_type": "application/json"}
-        if GenerateContentConfig is not None:
-            cfg = GenerateContentConfig(**cfg)
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=cfg,
+        stream = await asyncio.wait_for(
+            client.aio.models.generate_content_stream(model=GEMINI_MODEL, contents=prompt, config=config),
+            timeout=timeout,
         )
-        text = getattr(response, "text", "") or getattr(response, "candidates", None)
-        if not text:
-            return None
-        if isinstance(text, str):
-            raw_json = text
-        else:
+        chunks = stream.__aiter__()
+        while True:
             try:
-                raw_json = text[0].content.parts[0].text  # type: ignore[index]
-            except Exception:
-                return None
-        return json.loads(raw_json)
-    except Exception:
-        return None
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline - loop.time(), 0))
+            except StopAsyncIteration:
+                break
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            for meal in parser.feed(getattr(chunk, "text", "") or ""):
+                yield meal
+        ok = True
+        _TOKENS.record(usage, len(prompt))
+    except Exception as exc:
+        ok = False
+        _CLIENTS.report("gemini", exc)
+    finally:
+        _GEMINI_GUARD.done(permit, ok)
+
+
+def _macros(catalog: Catalog, row: int) -> dict:
+    """Meal macro fields read from the catalog's precomputed nutrition matrix."""
+    return {
+        "calories_kcal": int(round(catalog.nutrient(row, "calories_kcal"))),
+        "protein_g": int(round(catalog.nutrient(row, "protein_g"))),
+        "carbs_g": int(round(catalog.nutrient(row, "carbs_g"))),
+        "fats_g": int(round(catalog.nutrient(row, "agg_fats_g"))),
+    }
 
 
 # ---------------------------------------------------------------------------
 # Fallback picker (still uses Supabase/CSV recipes)
 # ---------------------------------------------------------------------------
-def _fallback_plan(goal: str, num_meals: int, catalog: List[Recipe]) -> dict:
-    chosen = catalog[:num_meals] if len(catalog) >= num_meals else catalog
+def _rank_locally(
+    goal: str,
+    num_meals: int,
+    catalog: Catalog,
+    exclude_rows: List[int] = (),
+    allowed: Optional[np.ndarray] = None,
+    profile: Optional[UserProfile] = None,
+) -> List[int]:
+    """Deterministic goal-aware set of ``num_meals`` rows, best first.
+
+    The ranker's top candidates go through ``select_meals``: near-duplicates
+    give way to distinct recipes, and a calorie/protein target in the goal
+    ("2000 calories a day", "150g protein") steers the plan's totals. With
+    a user ``profile`` the candidates are reranked by the user's affinities
+    and their recently planned or disliked recipes are left out.
+    """
+    if catalog.fallback_ranker is None:
+        skip = set(exclude_rows)
+        rows = range(len(catalog)) if allowed is None else np.flatnonzero(allowed).tolist()
+        return [row for row in rows if row not in skip][:num_meals]
+    intent = parse_goal(goal, catalog.tag_names)
+    if profile is not None:
+        exclude_rows = list(exclude_rows) + profile.exclude_rows(catalog).tolist()
+    rows, scores = catalog.fallback_ranker.candidates(
+        intent,
+        max(SELECTION_POOL, KNAPSACK_POOL * num_meals),
+        num_meals,
+        boost=_goal_boost(goal, catalog),
+        exclude_rows=exclude_rows,
+        allowed=allowed,
+    )
+    if profile is not None:
+        scores = personalize(scores, profile.scores(catalog, rows))
+    return select_meals(catalog, rows.tolist(), scores, num_meals, intent.target())
+
+
+PREVIEW_CHARS = 180
+
+
+def _preview(catalog: Catalog, row: int) -> str:
+    """Short instructions for locally chosen meals; reads only the description's head."""
+    head = catalog.description(row, PREVIEW_CHARS)
+    return head + "..." if head else "See recipe card."
+
+
+def _fallback_plan(
+    goal: str,
+    num_meals: int,
+    catalog: Catalog,
+    allowed: Optional[np.ndarray] = None,
+    chosen: Optional[Sequence[int]] = None,
+) -> dict:
+    intent = parse_goal(goal, catalog.tag_names)
+    if chosen is None:
+        chosen = _rank_locally(goal, num_meals, catalog, allowed=allowed)
+    scores = _similarity(goal, catalog, chosen)
     meals: List[Meal] = []
-    for idx, r in enumerate(chosen):
+    for idx, row in enumerate(chosen):
+        name = catalog.names[row]
         meals.append(
             Meal(
-                recipe_id=r.id,
+                recipe_id=int(catalog.ids[row]),
                 meal_number=idx + 1,
-                name=r.name,
-                summary=f"{r.name} supports '{goal}' with balanced nutrients.",
-                calories_kcal=0,
-                protein_g=0,
-                carbs_g=0,
-                fats_g=0,
-                key_ingredients=r.ingredients[:8],
-                tags=r.tags[:6],
-                reason="Selected from existing recipes to match the goal.",
-                instructions=(r.description[:180] + "...") if r.description else "See recipe card.",
-                similarity_score=round(1.0 - (idx * 0.05), 3),
+                name=name,
+                summary=f"{name} supports '{goal}' with balanced nutrients.",
+                **_macros(catalog, row),
+                key_ingredients=catalog.ingredients(row, 8),
+                tags=catalog.tags(row, 6),
+                reason=(
+                    f"Ranked locally for: {intent.describe()}."
+                    if intent.labels
+                    else "Selected from existing recipes to match the goal."
+                ),
+                instructions=_preview(catalog, row),
+                similarity_score=scores[idx],
             )
         )
+    focus = f" Favour {intent.describe()} meals." if intent.labels else ""
     return {
-        "goal_expanded": f"Practical eating pattern to achieve: {goal}.",
+        "goal_expanded": f"Practical eating pattern to achieve: {goal}.{focus}",
         "meals": meals,
     }
 
@@ -314,67 +840,468 @@ def _fallback_plan(goal: str, num_meals: int, catalog: List[Recipe]) -> dict:
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
-def create_meal_plan(goal: str, num_meals: int) -> tuple[list[dict], str]:
-    catalog = _get_catalog()
-    gemini_plan = _call_gemini(goal, num_meals, catalog)
+def _gemini_meal(goal: str, catalog: Catalog, row: int, m: MealReply, idx: int) -> Meal:
+    """API meal for row ``row`` picked by Gemini as the ``idx``-th meal."""
+    return Meal(
+        recipe_id=int(catalog.ids[row]),
+        meal_number=m.meal_number if m.meal_number is not None else idx + 1,
+        name=catalog.names[row],
+        summary=m.summary if m.summary is not None else (catalog.description(row) or goal),
+        **_macros(catalog, row),
+        key_ingredients=catalog.ingredients(row, 8),
+        tags=catalog.tags(row, 6),
+        reason=m.reason if m.reason is not None else "Supports the goal.",
+        instructions=(
+            m.instructions if m.instructions is not None
+            else (catalog.description(row) or "See recipe card.")
+        ),
+        similarity_score=0.0,
+    )
 
-    if gemini_plan and isinstance(gemini_plan.get("meals"), list):
-        catalog_lookup = {r.id: r for r in catalog}
-        meals: List[Meal] = []
-        used_ids = set()
-        for idx, m in enumerate(gemini_plan["meals"]):
-            rid = int(m.get("recipe_id", 0))
-            recipe = catalog_lookup.get(rid)
-            if recipe is None or rid in used_ids:
-                continue
-            used_ids.add(rid)
-            meals.append(
-                Meal(
-                    recipe_id=rid,
-                    meal_number=int(m.get("meal_number", idx + 1)),
-                    name=recipe.name,
-                    summary=str(m.get("summary", recipe.description or goal)),
-                    calories_kcal=int(m.get("calories_kcal", 0)),
-                    protein_g=int(m.get("protein_g", 0)),
-                    carbs_g=int(m.get("carbs_g", 0)),
-                    fats_g=int(m.get("fats_g", 0)),
-                    key_ingredients=recipe.ingredients[:8],
-                    tags=recipe.tags[:6],
-                    reason=str(m.get("reason", "Supports the goal.")),
-                    instructions=str(m.get("instructions", recipe.description or "See recipe card.")),
-                    similarity_score=round(1.0 - (idx * 0.05), 3),
-                )
+
+def _gemini_row(catalog: Catalog, m: MealReply, used_ids: Set[int], chosen: Sequence[int]) -> Optional[int]:
+    """Catalog row of Gemini meal ``m``, or ``None`` if it is unknown, repeated or not in ``chosen``."""
+    row = catalog.row(m.recipe_id)
+    if row is None or m.recipe_id in used_ids or row not in chosen:
+        return None
+    used_ids.add(m.recipe_id)
+    return row
+
+
+def _top_up_meals(goal: str, catalog: Catalog, rows: Sequence[int], start_idx: int) -> List[Meal]:
+    """Local write-ups for selected ``rows`` that Gemini's reply left out."""
+    meals = []
+    for i, row in enumerate(rows):
+        name = catalog.names[row]
+        meals.append(
+            Meal(
+                recipe_id=int(catalog.ids[row]),
+                meal_number=start_idx + i + 1,
+                name=name,
+                summary=f"{name} supports '{goal}'.",
+                **_macros(catalog, row),
+                key_ingredients=catalog.ingredients(row, 8),
+                tags=catalog.tags(row, 6),
+                reason="Filled from existing recipes to hit requested count.",
+                instructions=_preview(catalog, row),
+                similarity_score=0.0,
             )
+        )
+    return meals
+
+
+def _missing_rows(catalog: Catalog, chosen: Sequence[int], used_ids: Set[int]) -> List[int]:
+    return [row for row in chosen if int(catalog.ids[row]) not in used_ids]
+
 
-        # If Gemini returned fewer meals than requested, top up deterministically
-        if len(meals) < num_meals:
-            remaining = [r for r in catalog if r.id not in used_ids][: num_meals - len(meals)]
-            start_idx = len(meals)
-            for i, r in enumerate(remaining):
-                meals.append(
-                    Meal(
-                        recipe_id=r.id,
-                        meal_number=start_idx + i + 1,
-                        name=r.name,
-                        summary=f"{r.name} supports '{goal}'.",
-                        calories_kcal=0,
-                        protein_g=0,
-                        carbs_g=0,
-                        fats_g=0,
-                        key_ingredients=r.ingredients[:8],
-                        tags=r.tags[:6],
-                        reason="Filled from existing recipes to hit requested count.",
-                        instructions=(r.description[:180] + "...") if r.description else "See recipe card.",
-                        similarity_score=round(1.0 - ((start_idx + i) * 0.05), 3),
-                    )
-                )
-
-        goal_expanded = str(gemini_plan.get("goal_expanded", goal)).strip()
+def _assemble_plan(
+    goal: str, catalog: Catalog, chosen: Sequence[int], gemini_plan: Optional[PlanReply]
+) -> tuple[list[dict], str, bool]:
+    """Turn Gemini's write-up of ``chosen`` (or ``None``) into API meals; the flag says whether Gemini wrote it."""
+    gemini_plan = coerce_plan(gemini_plan)
+    if gemini_plan is not None:
+        meals: List[Meal] = []
+        used_ids: Set[int] = set()
+        for idx, m in enumerate(gemini_plan.meals):
+            row = _gemini_row(catalog, m, used_ids, chosen)
+            if row is not None:
+                meals.append(_gemini_meal(goal, catalog, row, m, idx))
+
+        # If Gemini skipped some of the selected meals, write those up locally
+        meals += _top_up_meals(goal, catalog, _missing_rows(catalog, chosen, used_ids), len(meals))
+
+        scores = _similarity(goal, catalog, [catalog.row(m.recipe_id) for m in meals])
+        for meal, score in zip(meals, scores):
+            meal.similarity_score = score
+
+        goal_expanded = (gemini_plan.goal_expanded or goal).strip()
+        from_llm = True
     else:
         # alert if we are using fallback 
-        fallback = _fallback_plan(goal, num_meals, catalog)
+        fallback = _fallback_plan(goal, len(chosen), catalog, chosen=chosen)
         meals = fallback["meals"]
         goal_expanded = fallback["goal_expanded"]
+        from_llm = False
 
     meals_sorted = sorted(meals, key=lambda m: m.similarity_score, reverse=True)
-    return [m.to_api() for m in meals_sorted], goal_expanded
+    return [m.to_api() for m in meals_sorted], goal_expanded, from_llm
+
+
+def _usable(plan: Optional[PlanReply], catalog: Catalog, chosen: Sequence[int]) -> bool:
+    """True if Gemini's reply covers at least one of the selected recipes."""
+    plan = coerce_plan(plan)
+    used: Set[int] = set()
+    return plan is not None and any(_gemini_row(catalog, m, used, chosen) is not None for m in plan.meals)
+
+
+def _llm_plan(goal: str, catalog: Catalog, chosen: Sequence[int]) -> Optional[tuple[list[dict], str, bool]]:
+    plan = _call_gemini(goal, catalog, chosen)
+    return _assemble_plan(goal, catalog, chosen, plan) if _usable(plan, catalog, chosen) else None
+
+
+async def _llm_plan_async(
+    goal: str, catalog: Catalog, chosen: Sequence[int], timeout: float
+) -> Optional[tuple[list[dict], str, bool]]:
+    plan = await _call_gemini_async(goal, catalog, chosen, timeout=timeout)
+    return _assemble_plan(goal, catalog, chosen, plan) if _usable(plan, catalog, chosen) else None
+
+
+def _build_meal_plan(
+    goal: str,
+    num_meals: int,
+    catalog: Catalog,
+    allowed: Optional[np.ndarray] = None,
+    timeout: float = GEMINI_TIMEOUT_S,
+    profile: Optional[UserProfile] = None,
+) -> tuple[list[dict], str, bool]:
+    """Gemini's write-up of the selected meals if it lands within ``timeout``, else the local one."""
+    chosen = _rank_locally(goal, num_meals, catalog, allowed=allowed, profile=profile)
+    plan, _ = _HEDGER.run(
+        lambda: _llm_plan(goal, catalog, chosen),
+        lambda: _assemble_plan(goal, catalog, chosen, None),
+        budget=timeout,
+    )
+    return plan
+
+
+# Only Gemini plans are cached: fallback plans are sub-millisecond to rebuild
+# and caching them would pin the degraded answer after Gemini recovers.
+_PLAN_CACHE = cache_from_env()
+
+
+def _plan_key(
+    goal: str,
+    num_meals: int,
+    catalog: Catalog,
+    filters: Optional[RecipeFilter] = None,
+    profile: Optional[UserProfile] = None,
+) -> str:
+    # The catalog fingerprint retires cached plans when a refresh changes
+    # recipes, and the profile key when a rebuild changes the user's profile.
+    return cache_key(
+        goal,
+        num_meals,
+        catalog=catalog.fingerprint,
+        filters=filters.key() if filters else None,
+        user=profile.key if profile is not None else None,
+    )
+
+
+def create_meal_plan(
+    goal: str,
+    num_meals: int,
+    filters: Optional[RecipeFilter] = None,
+    timeout: float = GEMINI_TIMEOUT_S,
+    user_id: Optional[int] = None,
+) -> tuple[list[dict], str]:
+    catalog = _get_catalog()
+    allowed = _allowed_rows(catalog, filters)
+    profile = user_profile(user_id)
+    if _PLAN_CACHE is None:
+        meals, goal_expanded, _ = _build_meal_plan(goal, num_meals, catalog, allowed, timeout, profile)
+        return meals, goal_expanded
+
+    def compute():
+        meals, goal_expanded, from_llm = _build_meal_plan(goal, num_meals, catalog, allowed, timeout, profile)
+        return [meals, goal_expanded], from_llm
+
+    meals, goal_expanded = _PLAN_CACHE.get_or_compute(
+        _plan_key(goal, num_meals, catalog, filters, profile), compute
+    )
+    return meals, goal_expanded
+
+
+async def create_meal_plan_async(
+    goal: str,
+    num_meals: int,
+    timeout: float = GEMINI_TIMEOUT_S,
+    filters: Optional[RecipeFilter] = None,
+    user_id: Optional[int] = None,
+) -> tuple[list[dict], str]:
+    """``create_meal_plan`` without blocking the event loop.
+
+    The Gemini call is awaited on the async client and hedged within the
+    ``timeout`` budget while the local plan is built in a worker thread; a
+    cold catalog load runs in a worker thread too.
+    """
+    catalog = _RECIPE_CACHE if _RECIPE_CACHE is not None else await asyncio.to_thread(_get_catalog)
+    return await _plan_async(catalog, goal, num_meals, filters, timeout, profile=user_profile(user_id))
+
+
+async def _plan_async(
+    catalog: Catalog,
+    goal: str,
+    num_meals: int,
+    filters: Optional[RecipeFilter],
+    timeout: float,
+    gate: Optional[asyncio.Semaphore] = None,
+    profile: Optional[UserProfile] = None,
+) -> tuple[list[dict], str]:
+    key = _plan_key(goal, num_meals, catalog, filters, profile)
+    if _PLAN_CACHE is not None:
+        cached = _PLAN_CACHE.get(key)
+        if cached is not None:
+            return cached[0], cached[1]
+
+    # Ranking scores the whole catalog; keep it off the event loop.
+    chosen = await asyncio.to_thread(
+        lambda: _rank_locally(goal, num_meals, catalog, allowed=_allowed_rows(catalog, filters), profile=profile)
+    )
+
+    def budgeted():
+        # Batches (``gate`` set) trade tail latency for throughput and don't hedge.
+        return _HEDGER.run_async(
+            lambda: _llm_plan_async(goal, catalog, chosen, timeout),
+            lambda: _assemble_plan(goal, catalog, chosen, None),
+            budget=timeout,
+            hedge=gate is None,
+        )
+
+    if gate is None or not chosen or _get_gemini_client() is None:
+        plan, _ = await budgeted()  # no Gemini call to bound
+    else:
+        async with gate:
+            plan, _ = await budgeted()
+    meals, goal_expanded, from_llm = plan
+    if _PLAN_CACHE is not None and from_llm:
+        _PLAN_CACHE.set(key, [meals, goal_expanded])
+    return meals, goal_expanded
+
+
+async def stream_meal_plan(
+    goal: str,
+    num_meals: int,
+    timeout: float = GEMINI_TIMEOUT_S,
+    filters: Optional[RecipeFilter] = None,
+    user_id: Optional[int] = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """``create_meal_plan_async`` as events: ``("meal", meal)`` per meal, then ``("done", {...})``.
+
+    Gemini's reply is streamed and each meal is yielded as soon as its
+    ``recipe_id`` resolves to an allowed catalog recipe, so the first meal
+    arrives long before the plan is complete. Meals come in Gemini's order,
+    each with its own similarity score. Any shortfall is topped up locally
+    once the stream ends. If Gemini produced nothing, the local fallback plan
+    is yielded instead. The final ``done`` event carries ``goal_expanded``.
+    A cached plan is replayed in the same shape.
+    """
+    catalog = _RECIPE_CACHE if _RECIPE_CACHE is not None else await asyncio.to_thread(_get_catalog)
+    profile = user_profile(user_id)
+    key = _plan_key(goal, num_meals, catalog, filters, profile)
+    cached = _PLAN_CACHE.get(key) if _PLAN_CACHE is not None else None
+    if cached is not None:
+        for meal in cached[0]:
+            yield "meal", meal
+        yield "done", {"goal_expanded": cached[1]}
+        return
+
+    # Ranking scores the whole catalog; keep it off the event loop.
+    chosen = await asyncio.to_thread(
+        lambda: _rank_locally(goal, num_meals, catalog, allowed=_allowed_rows(catalog, filters), profile=profile)
+    )
+    parser = PlanStreamParser()
+    meals: List[Meal] = []
+    used_ids: Set[int] = set()
+    async for raw in _stream_gemini(goal, catalog, chosen, parser, timeout):
+        m = parse_meal(raw)
+        row = _gemini_row(catalog, m, used_ids, chosen) if m is not None else None
+        if row is None:
+            continue
+        meal = _gemini_meal(goal, catalog, row, m, len(meals))
+        meal.similarity_score = _similarity(goal, catalog, [row])[0]
+        meals.append(meal)
+        yield "meal", meal.to_api()
+
+    plan = coerce_plan(parser.result())
+    from_llm = bool(meals) or plan is not None
+    if from_llm:
+        goal_expanded = ((plan.goal_expanded if plan else None) or parser.fields.get("goal_expanded") or goal).strip()
+        extra = _top_up_meals(goal, catalog, _missing_rows(catalog, chosen, used_ids), len(meals))
+        scores = _similarity(goal, catalog, [catalog.row(m.recipe_id) for m in extra])
+        for meal, score in zip(extra, scores):
+            meal.similarity_score = score
+            meals.append(meal)
+            yield "meal", meal.to_api()
+    else:
+        fallback = _fallback_plan(goal, len(chosen), catalog, chosen=chosen)
+        meals = sorted(fallback["meals"], key=lambda m: m.similarity_score, reverse=True)
+        goal_expanded = fallback["goal_expanded"]
+        for meal in meals:
+            yield "meal", meal.to_api()
+
+    if _PLAN_CACHE is not None and from_llm:
+        meals_sorted = sorted(meals, key=lambda m: m.similarity_score, reverse=True)
+        _PLAN_CACHE.set(key, [[m.to_api() for m in meals_sorted], goal_expanded])
+    yield "done", {"goal_expanded": goal_expanded}
+
+
+BATCH_CONCURRENCY = int(os.getenv("RECOMMENDER_BATCH_CONCURRENCY", "8"))
+
+
+async def create_meal_plans(
+    requests: Sequence[PlanRequest],
+    concurrency: int = BATCH_CONCURRENCY,
+    timeout: float = GEMINI_TIMEOUT_S,
+) -> AsyncIterator[tuple[int, list[dict], str]]:
+    """Plan many requests at once, yielding ``(index, meals, goal_expanded)`` as each finishes.
+
+    Every request is planned against the same catalog snapshot, even if a
+    refresh lands mid-batch. Requests with the same normalised goal, size
+    and filters are planned once and fanned out to every index that asked.
+    At most ``concurrency`` Gemini calls are in flight. Cached plans, and
+    every plan while Gemini is not configured, skip the slots; a plan that
+    holds a slot while the breaker is open falls back locally at once.
+    Abandoning the iterator cancels the plans still running.
+    """
+    catalog = _RECIPE_CACHE if _RECIPE_CACHE is not None else await asyncio.to_thread(_get_catalog)
+    groups: dict[str, list[int]] = {}
+    unique: dict[str, tuple[PlanRequest, Optional[UserProfile]]] = {}
+    for i, req in enumerate(requests):
+        profile = user_profile(req.user_id)
+        key = _plan_key(req.goal, req.num_meals, catalog, req.filters, profile)
+        groups.setdefault(key, []).append(i)
+        unique.setdefault(key, (req, profile))
+
+    gate = asyncio.Semaphore(max(1, concurrency))
+
+    async def plan(key: str):
+        req, profile = unique[key]
+        return key, await _plan_async(catalog, req.goal, req.num_meals, req.filters, timeout, gate, profile)
+
+    tasks = [asyncio.ensure_future(plan(key)) for key in unique]
+    try:
+        for done in asyncio.as_completed(tasks):
+            key, (meals, goal_expanded) = await done
+            for i in groups[key]:
+                yield i, meals, goal_expanded
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# ---------------------------------------------------------------------------
+# Multi-day plans
+# ---------------------------------------------------------------------------
+def _planned_meal(
+    goal: str, catalog: Catalog, row: int, number: int, meal_type: str, intent_label: str, score: float
+) -> dict:
+    name = catalog.names[row]
+    meal = Meal(
+        recipe_id=int(catalog.ids[row]),
+        meal_number=number,
+        name=name,
+        summary=f"{name} as {meal_type} for '{goal}'.",
+        **_macros(catalog, row),
+        key_ingredients=catalog.ingredients(row, 8),
+        tags=catalog.tags(row, 6),
+        reason=f"Planned for: {intent_label}." if intent_label else "Planned from existing recipes for the goal.",
+        instructions=_preview(catalog, row),
+        similarity_score=score,
+    )
+    return {**meal.to_api(), "meal_type": meal_type}
+
+
+def create_multi_day_plan(
+    goal: str,
+    days: int,
+    meal_types: Sequence[str] = ("breakfast", "lunch", "dinner"),
+    filters: Optional[RecipeFilter] = None,
+    daily_calories: Optional[float] = None,
+    daily_protein_g: Optional[float] = None,
+    no_repeat_days: int = NO_REPEAT_DAYS,
+    start_date: Optional[date] = None,
+    user_id: Optional[int] = None,
+) -> dict:
+    """A ``days × meal_types`` plan, solved locally by ``MealPlanner`` (no Gemini call).
+
+    Daily targets default to those stated in the goal. Each day lists its
+    meals (with ``meal_type``, as stored in the Calendar table) and their
+    totals; ``shopping_list`` is every ingredient the plan needs. With
+    ``start_date`` each day also carries its ISO ``date``.
+    """
+    catalog = _get_catalog()
+    intent = parse_goal(goal, catalog.tag_names)
+    target = NutritionTarget(
+        calories=daily_calories or intent.daily_calories,
+        protein_g=daily_protein_g or intent.daily_protein_g,
+    )
+    spec = PlanSpec(days, tuple(meal_types), target, no_repeat_days)
+    grid = MealPlanner(catalog).plan(intent, spec, _allowed_rows(catalog, filters), user_profile(user_id))
+    rows = sorted({row for day in grid for row in day})
+    score = dict(zip(rows, _similarity(goal, catalog, rows)))
+    label = intent.describe()
+    plan_days = []
+    for d, day in enumerate(grid):
+        meals = [
+            _planned_meal(goal, catalog, row, i + 1, meal_type, label, score[row])
+            for i, (row, meal_type) in enumerate(zip(day, spec.meal_types))
+        ]
+        entry = {
+            "day": d + 1,
+            "meals": meals,
+            "totals": {
+                key: sum(m[key] for m in meals) for key in ("calories_kcal", "protein_g", "carbs_g", "fats_g")
+            },
+        }
+        if start_date is not None:
+            entry["date"] = (start_date + timedelta(days=d)).isoformat()
+        plan_days.append(entry)
+    shopping = sorted({name for row in rows for name in catalog.ingredients(row)}, key=str.lower)
+    focus = f" Favour {label} meals." if label else ""
+    return {
+        "goal_expanded": f"Practical eating pattern to achieve: {goal}.{focus}",
+        "days": plan_days,
+        "shopping_list": shopping,
+    }
+
+
+def similar_recipes(recipe_id: int, limit: int = 10) -> Optional[List[dict]]:
+    """Recipes most like ``recipe_id``, from the catalog's precomputed neighbour table.
+
+    Each entry carries the blended ``score`` and its parts: estimated
+    ingredient Jaccard (``ingredient_overlap``) and nutrition cosine
+    (``nutrition_similarity``). None when the recipe is not in the catalog.
+    """
+    catalog = _get_catalog()
+    row = catalog.row(recipe_id)
+    if row is None or catalog.similarity_index is None:
+        return None
+    rows, scores = catalog.similarity_index.similar(row, limit)
+    overlap, nutrition = catalog.similarity_index.components(row, rows)
+    return [
+        {
+            "id": int(catalog.ids[r]),
+            "name": catalog.names[r],
+            "score": round(float(score), 4),
+            "ingredient_overlap": round(float(j), 4),
+            "nutrition_similarity": round(float(c), 4),
+            **_macros(catalog, int(r)),
+            "tags": catalog.tags(int(r), 6),
+        }
+        for r, score, j, c in zip(rows.tolist(), scores, overlap, nutrition)
+    ]
+
+
+def cache_stats() -> dict:
+    return _PLAN_CACHE.stats() if _PLAN_CACHE is not None else {"backend": "off"}
+
+
+def catalog_stats() -> dict:
+    catalog = _RECIPE_CACHE
+    loaded = (
+        {"recipes": len(catalog), "source": catalog.source, "fingerprint": catalog.fingerprint}
+        if catalog is not None
+        else {"recipes": 0}
+    )
+    sync = {"mode": CATALOG_SYNC, "syncs_since_full": _SYNCS_SINCE_FULL}
+    return {**loaded, "sync": sync, "refresh": _REFRESHER.stats()}
+
+
+def recommender_metrics() -> dict:
+    return {
+        "catalog": catalog_stats(),
+        "cache": cache_stats(),
+        "clients": _CLIENTS.stats(),
+        "profiles": {**_PROFILES.stats(), "refresh": _PROFILE_REFRESHER.stats()},
+        "llm": {**_HEDGER.stats(), **_GEMINI_GUARD.stats(), "tokens": _TOKENS.stats()},
+    }
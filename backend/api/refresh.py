@@ -0,0 +1,93 @@
+"""Background catalog refresh.
+
+``CatalogRefresher`` runs a daemon thread that calls a ``refresh`` function
+every ``interval`` seconds, or immediately when ``trigger()`` is called (for
+example from a Supabase webhook). The refresh function does all the work –
+loading tables, building the catalog and its derived indexes – and finally
+publishes the result with a single reference assignment, so request handlers
+always see either the complete old catalog or the complete new one and never
+wait on a reload.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class CatalogRefresher:
+    def __init__(self, refresh: Callable[[], bool], interval: float) -> None:
+        self.refresh = refresh
+        self.interval = interval
+        self.refreshes = 0
+        self.swaps = 0
+        self.errors = 0
+        self.last_refresh: Optional[float] = None
+        self.last_duration_s: Optional[float] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._run_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="catalog-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def trigger(self) -> None:
+        """Ask for a refresh as soon as possible without waiting for it."""
+        if self.running:
+            self._wake.set()
+        else:
+            threading.Thread(target=self.run_once, name="catalog-refresh-once", daemon=True).start()
+
+    def run_once(self) -> bool:
+        """Refresh synchronously; concurrent calls collapse into one."""
+        if not self._run_lock.acquire(blocking=False):
+            return False
+        start = time.monotonic()
+        try:
+            swapped = bool(self.refresh())
+            self.swaps += int(swapped)
+            return swapped
+        except Exception:
+            self.errors += 1
+            return False
+        finally:
+            self.refreshes += 1
+            self.last_refresh = time.time()
+            self.last_duration_s = round(time.monotonic() - start, 3)
+            self._run_lock.release()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.run_once()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "interval_s": self.interval,
+            "refreshes": self.refreshes,
+            "swaps": self.swaps,
+            "errors": self.errors,
+            "last_refresh": self.last_refresh,
+            "last_duration_s": self.last_duration_s,
+        }
@@ -0,0 +1,153 @@
+"""Lexical retrieval over the recipe catalog.
+
+A BM25 index is built once per catalog over each recipe's name, tags,
+ingredients and description (name/tags/ingredients are up-weighted by
+repeating their tokens, a cheap BM25F). Postings are stored CSR style by
+term, so a query touches only the postings of its own terms and scoring the
+full catalog is a few vectorised NumPy operations.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+from api.catalog import Catalog
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the to with "
+    "then add about over your you this that each until minute".split()
+)
+
+# Field repetition weights (BM25F-lite).
+_FIELD_WEIGHTS = {"name": 3, "tags": 2, "ingredients": 2, "description": 1}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed and a trailing plural 's' stripped."""
+    tokens = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if tok in _STOPWORDS or len(tok) < 2:
+            continue
+        if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+class Bm25Index:
+    """Okapi BM25 over catalog rows."""
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        n_docs = len(doc_len)
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg = float(doc_len.mean()) if n_docs else 1.0
+        # Per-document length normaliser, precomputed so queries only gather.
+        self.norm = (k1 * (1.0 - b + b * doc_len / max(avg, 1e-6))).astype(np.float32)
+
+    @staticmethod
+    def _tokenize_rows(catalog: Catalog, rows, vocab: Dict[str, int], doc_len: np.ndarray):
+        """(term, doc, tf) postings for ``rows``; extends ``vocab`` and fills ``doc_len`` in place."""
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        for row in rows:
+            counts: Counter = Counter()
+            fields = {
+                "name": catalog.names[row],
+                "tags": " ".join(catalog.tags(row)),
+                "ingredients": " ".join(catalog.ingredients(row)),
+                "description": catalog.descriptions[row],
+            }
+            for field, text in fields.items():
+                weight = _FIELD_WEIGHTS[field]
+                for tok in tokenize(text):
+                    counts[tok] += weight
+            doc_len[row] = sum(counts.values())
+            for tok, tf in counts.items():
+                term_ids.append(vocab.setdefault(tok, len(vocab)))
+                doc_ids.append(row)
+                tfs.append(tf)
+        return (
+            np.asarray(term_ids, dtype=np.int64),
+            np.asarray(doc_ids, dtype=np.int32),
+            np.asarray(tfs, dtype=np.float32),
+        )
+
+    @classmethod
+    def _from_postings(cls, vocab, terms, docs, tfs, doc_len) -> "Bm25Index":
+        order = np.argsort(terms, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocab)), out=offsets[1:])
+        return cls(vocab=vocab, offsets=offsets, docs=docs[order], tfs=tfs[order], doc_len=doc_len)
+
+    @classmethod
+    def build(cls, catalog: Catalog) -> "Bm25Index":
+        vocab: Dict[str, int] = {}
+        doc_len = np.zeros(len(catalog), dtype=np.float32)
+        terms, docs, tfs = cls._tokenize_rows(catalog, range(len(catalog)), vocab, doc_len)
+        return cls._from_postings(vocab, terms, docs, tfs, doc_len)
+
+    @classmethod
+    def patched(cls, catalog: Catalog, previous: "Bm25Index", old_rows: np.ndarray) -> "Bm25Index":
+        """Index for ``catalog`` reusing ``previous`` postings.
+
+        ``old_rows[r]`` is row ``r``'s row in the previous catalog, or -1 for
+        new/changed recipes; only those are re-tokenised.
+        """
+        n = len(catalog)
+        reuse = old_rows >= 0
+        new_row_of_old = np.full(len(previous), -1, dtype=np.int64)
+        new_row_of_old[old_rows[reuse]] = np.flatnonzero(reuse)
+        old_terms = np.repeat(np.arange(len(previous.offsets) - 1), np.diff(previous.offsets))
+        mapped = new_row_of_old[previous.docs]
+        keep = mapped >= 0
+        vocab = dict(previous.vocab)
+        doc_len = np.zeros(n, dtype=np.float32)
+        doc_len[reuse] = previous.doc_len[old_rows[reuse]]
+        terms, docs, tfs = cls._tokenize_rows(catalog, np.flatnonzero(~reuse).tolist(), vocab, doc_len)
+        return cls._from_postings(
+            vocab,
+            np.concatenate([old_terms[keep], terms]),
+            np.concatenate([mapped[keep].astype(np.int32), docs]),
+            np.concatenate([previous.tfs[keep], tfs]),
+            doc_len,
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every catalog row against ``query`` (zeros when nothing matches)."""
+        out = np.zeros(len(self), dtype=np.float32)
+        for tok in set(tokenize(query)):
+            term = self.vocab.get(tok)
+            if term is None:
+                continue
+            lo, hi = self.offsets[term], self.offsets[term + 1]
+            docs = self.docs[lo:hi]
+            tf = self.tfs[lo:hi]
+            # Each doc appears at most once per term's postings, so fancy-index add is safe.
+            out[docs] += self.idf[term] * tf * (self.k1 + 1.0) / (tf + self.norm[docs])
+        return out
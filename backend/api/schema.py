@@ -0,0 +1,133 @@
+"""Gemini reply schema and validated parsing.
+
+``response_schema`` is sent with every Gemini call, so the model is held to
+the plan's shape by constrained decoding rather than by the prompt alone.
+``recipe_id`` is an enum of the selected meals' ids. Gemini only supports
+string enums, so the ids travel as strings and are validated back to ints.
+
+Replies are parsed with validators compiled once at import:
+
+* the fast path validates the raw JSON text straight into ``PlanReply`` in
+  one pass, with no intermediate ``json.loads`` dicts;
+* if that fails, the reply is decoded and each meal is validated on its own:
+  a malformed field is repaired (a number where text belongs becomes text,
+  ``"id: 52815"`` becomes ``52815``) or dropped, and only a meal whose
+  ``recipe_id`` cannot be recovered is dropped. One bad meal no longer
+  sends the whole plan to the fallback.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+
+_TEXT_FIELDS = ("summary", "reason", "instructions")
+_DIGITS = re.compile(r"\d+")
+
+
+class MealReply(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    recipe_id: int
+    meal_number: Optional[int] = None
+    summary: Optional[str] = None
+    reason: Optional[str] = None
+    instructions: Optional[str] = None
+
+
+class PlanReply(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    goal_expanded: Optional[str] = None
+    meals: List[MealReply]
+
+
+_MEAL = TypeAdapter(MealReply)
+_PLAN = TypeAdapter(PlanReply)
+
+
+def response_schema(recipe_ids: Sequence[int]) -> Dict[str, Any]:
+    """The plan's JSON schema, with ``recipe_id`` limited to ``recipe_ids``."""
+    text = {"type": "STRING"}
+    meal = {
+        "type": "OBJECT",
+        "properties": {
+            "meal_number": {"type": "INTEGER"},
+            "recipe_id": {"type": "STRING", "enum": [str(int(rid)) for rid in recipe_ids]},
+            "summary": text,
+            "reason": text,
+            "instructions": text,
+        },
+        "required": ["meal_number", "recipe_id", "summary", "reason", "instructions"],
+        "property_ordering": ["meal_number", "recipe_id", "summary", "reason", "instructions"],
+    }
+    return {
+        "type": "OBJECT",
+        "properties": {"goal_expanded": text, "meals": {"type": "ARRAY", "items": meal}},
+        "required": ["goal_expanded", "meals"],
+        # goal_expanded first, so a streamed reply carries it before the meals
+        "property_ordering": ["goal_expanded", "meals"],
+    }
+
+
+def _repair(raw: Dict[str, Any], error: ValidationError) -> Optional[Dict[str, Any]]:
+    fixed = dict(raw)
+    for err in error.errors():
+        field = err["loc"][0] if err["loc"] else None
+        value = fixed.get(field)
+        if field == "recipe_id":
+            match = _DIGITS.search(str(value)) if isinstance(value, (str, float)) else None
+            if match is None:
+                return None
+            fixed[field] = int(match.group())
+        elif field in _TEXT_FIELDS and isinstance(value, (int, float)):
+            fixed[field] = str(value)
+        elif field in _TEXT_FIELDS and isinstance(value, list):
+            fixed[field] = " ".join(str(v) for v in value)
+        else:
+            fixed.pop(field, None)
+    return fixed
+
+
+def parse_meal(raw: Any) -> Optional[MealReply]:
+    """Validate one meal object, repairing malformed fields; ``None`` if it can't be saved."""
+    if isinstance(raw, MealReply):
+        return raw
+    if not isinstance(raw, dict):
+        return None
+    try:
+        return _MEAL.validate_python(raw)
+    except ValidationError as exc:
+        fixed = _repair(raw, exc)
+    if fixed is None:
+        return None
+    try:
+        return _MEAL.validate_python(fixed)
+    except ValidationError:
+        return None
+
+
+def coerce_plan(raw: Any) -> Optional[PlanReply]:
+    """A plan from decoded JSON, keeping every meal that validates or can be repaired."""
+    if isinstance(raw, PlanReply):
+        return raw
+    if not isinstance(raw, dict) or not isinstance(raw.get("meals"), list):
+        return None
+    goal_expanded = raw.get("goal_expanded")
+    meals = [meal for meal in map(parse_meal, raw["meals"]) if meal is not None]
+    return PlanReply(goal_expanded=goal_expanded if isinstance(goal_expanded, str) else None, meals=meals)
+
+
+def parse_plan(text: str) -> Optional[PlanReply]:
+    """Parse a raw reply: one-pass validation, else per-meal repair."""
+    try:
+        return _PLAN.validate_json(text)
+    except ValidationError:
+        pass
+    try:
+        return coerce_plan(json.loads(text))
+    except ValueError:
+        return None
@@ -0,0 +1,184 @@
+"""Meal-set selection: diversity by MMR, nutrition targets by knapsack.
+
+Ranking scores recipes one at a time; a plan is a set. ``select_meals``
+picks the set in two steps over a ranked candidate pool:
+
+1. Maximal marginal relevance. Each recipe is a binary vector over its
+   ingredients and tags, L2-normalised so a dot product is a cosine. Greedily
+   take the candidate maximising ``λ·relevance − (1−λ)·max similarity to
+   those already taken``, so near-duplicates (three lentil soups) give way to
+   the next best distinct recipe. The value at pick time becomes the
+   recipe's diversity-aware worth.
+
+2. Knapsack. With a daily calorie and/or protein target (``NutritionTarget``),
+   an exact-``k`` 0/1 knapsack over the MMR pool runs on bucketed calories.
+   It yields the most valuable ``k``-set for every reachable calorie total,
+   and the total closest to the target (weighed against value) wins. Protein
+   is a floor, not additive in the DP state, so it enters as a Lagrangian
+   bonus on each recipe's value. A few multipliers are tried, and the set
+   with the best true objective is kept.
+
+Everything is NumPy over a pool of a few dozen recipes, so a selection takes
+a couple of milliseconds.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api.catalog import Catalog
+from api.nutrition import NUTRIENT_INDEX
+
+MMR_LAMBDA = 0.7
+KNAPSACK_POOL = 3  # pool = this many times k, from the top of the MMR order
+_MAX_BUCKETS = 2000
+_PROTEIN_MULTIPLIERS = (0.0, 0.25, 0.5, 1.0, 2.0, 4.0)
+_CALORIE_WEIGHT = 1.0  # per meal, per unit of relative calorie error
+_PROTEIN_WEIGHT = 1.0  # per meal, per unit of relative protein shortfall
+
+
+@dataclass
+class NutritionTarget:
+    """Totals for the whole plan: calories to aim at, protein to reach at least."""
+
+    calories: Optional[float] = None
+    protein_g: Optional[float] = None
+
+    def is_empty(self) -> bool:
+        return not self.calories and not self.protein_g
+
+
+def feature_vectors(catalog: Catalog, rows: Sequence[int]) -> np.ndarray:
+    """L2-normalised ingredient ∪ tag incidence rows for ``rows``."""
+    n_ing = len(catalog.ingredient_names)
+    features = [
+        np.concatenate([catalog.ingredient_rows(row), catalog.tag_rows(row) + n_ing]) for row in rows
+    ]
+    vocab, inverse = np.unique(np.concatenate(features) if features else np.zeros(0, np.int64), return_inverse=True)
+    out = np.zeros((len(rows), len(vocab)), dtype=np.float32)
+    at = 0
+    for i, f in enumerate(features):
+        out[i, inverse[at:at + len(f)]] = 1.0
+        at += len(f)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return out / np.where(norms > 0, norms, 1.0)
+
+
+def mmr(relevance: np.ndarray, similarity: np.ndarray, k: int, lam: float = MMR_LAMBDA) -> Tuple[List[int], List[float]]:
+    """Greedy MMR order of the first ``k`` positions and their values at pick time."""
+    n = len(relevance)
+    taken = np.zeros(n, dtype=bool)
+    closest = np.zeros(n, dtype=np.float64)
+    order: List[int] = []
+    values: List[float] = []
+    for _ in range(min(k, n)):
+        score = lam * relevance - (1.0 - lam) * closest
+        score[taken] = -np.inf
+        i = int(np.argmax(score))
+        order.append(i)
+        values.append(float(score[i]))
+        taken[i] = True
+        np.maximum(closest, similarity[i], out=closest)
+    return order, values
+
+
+def _knapsack(values: np.ndarray, weights: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best value of exactly ``k`` items per total weight, plus the take table to rebuild sets."""
+    n, cap = len(values), int(np.sort(weights)[::-1][:k].sum())
+    dp = np.full((k + 1, cap + 1), -np.inf)
+    dp[0, 0] = 0.0
+    take = np.zeros((n, k + 1, cap + 1), dtype=bool)
+    for i in range(n):
+        w, v = int(weights[i]), values[i]
+        for j in range(min(i, k - 1), -1, -1):
+            cand = dp[j, :cap + 1 - w] + v
+            better = cand > dp[j + 1, w:]
+            dp[j + 1, w:][better] = cand[better]
+            take[i, j + 1, w:] = better
+    return dp[k], take
+
+
+def _rebuild(take: np.ndarray, weights: np.ndarray, k: int, total: int) -> List[int]:
+    chosen, j, b = [], k, total
+    for i in range(len(weights) - 1, -1, -1):
+        if j and take[i, j, b]:
+            chosen.append(i)
+            j -= 1
+            b -= int(weights[i])
+    return chosen[::-1]
+
+
+def target_penalty(calories: float, protein: float, k: int, target: NutritionTarget) -> float:
+    """Penalty of ``k`` meals totalling ``calories``/``protein`` against ``target``, in relevance units."""
+    penalty = 0.0
+    if target.calories:
+        penalty += _CALORIE_WEIGHT * k * abs(calories - target.calories) / target.calories
+    if target.protein_g:
+        penalty += _PROTEIN_WEIGHT * k * max(0.0, target.protein_g - protein) / target.protein_g
+    return penalty
+
+
+def _fit_target(
+    values: np.ndarray, calories: np.ndarray, protein: np.ndarray, k: int, target: NutritionTarget
+) -> List[int]:
+    """Positions of the ``k``-subset with the best value under ``target``'s penalties."""
+    if target.calories:
+        step = max(10.0, math.ceil(np.sort(calories)[::-1][:k].sum() / _MAX_BUCKETS))
+        weights = np.round(calories / step).astype(np.int64)
+    else:
+        step, weights = 1.0, np.zeros(len(values), dtype=np.int64)
+    best: Tuple[float, List[int]] = (-np.inf, list(range(k)))
+    multipliers = _PROTEIN_MULTIPLIERS if target.protein_g else (0.0,)
+    for mu in multipliers:
+        bonus = mu * protein / target.protein_g if target.protein_g else 0.0
+        totals, take = _knapsack(values + bonus, weights, k)
+        reachable = np.flatnonzero(np.isfinite(totals))
+        if not len(reachable):
+            continue
+        # Pick the calorie bucket by (value - calorie penalty), then score the real set.
+        kcal = reachable * step
+        penalty = (
+            _CALORIE_WEIGHT * k * np.abs(kcal - target.calories) / target.calories if target.calories else 0.0
+        )
+        total = int(reachable[np.argmax(totals[reachable] - penalty)])
+        chosen = _rebuild(take, weights, k, total)
+        score = float(values[chosen].sum()) - target_penalty(
+            float(calories[chosen].sum()), float(protein[chosen].sum()), k, target
+        )
+        if score > best[0]:
+            best = (score, chosen)
+    return best[1]
+
+
+def select_meals(
+    catalog: Catalog,
+    rows: Sequence[int],
+    relevance: np.ndarray,
+    k: int,
+    target: Optional[NutritionTarget] = None,
+    lam: float = MMR_LAMBDA,
+) -> List[int]:
+    """The best diverse ``k`` of ``rows`` (relevance-aligned), in MMR order, within ``target``."""
+    rows = list(rows)
+    k = min(k, len(rows))
+    if k <= 0:
+        return []
+    rel = np.asarray(relevance, dtype=np.float64)
+    span = float(rel.max() - rel.min())
+    rel = (rel - rel.min()) / span if span > 0 else np.ones_like(rel)
+    vectors = feature_vectors(catalog, rows)
+    similarity = vectors @ vectors.T
+    if target is None or target.is_empty():
+        order, _ = mmr(rel, similarity, k, lam)
+        return [rows[i] for i in order]
+
+    order, values = mmr(rel, similarity, min(len(rows), KNAPSACK_POOL * k), lam)
+    pool = np.asarray([rows[i] for i in order], dtype=np.int64)
+    calories = np.maximum(catalog.nutrition[pool, NUTRIENT_INDEX["calories_kcal"]].astype(np.float64), 0.0)
+    protein = np.maximum(catalog.nutrition[pool, NUTRIENT_INDEX["protein_g"]].astype(np.float64), 0.0)
+    chosen = _fit_target(np.asarray(values), calories, protein, k, target)
+    return [int(pool[i]) for i in sorted(chosen)]
@@ -0,0 +1,303 @@
+"""Recipe-to-recipe similarity: a precomputed top-K neighbour table.
+
+Two recipes are similar when they share ingredients and have a similar
+nutrient profile:
+
+    score = JACCARD_WEIGHT · Jaccard(ingredients) + (1 − JACCARD_WEIGHT) · cosine(nutrition)
+
+Scoring all pairs is quadratic, so candidates come from locality-sensitive
+hashing instead:
+
+* MinHash. ``NUM_HASHES`` hashes of each recipe's Supabase ingredient ids;
+  the fraction of equal minima estimates Jaccard. The signature is cut into
+  ``MINHASH_BANDS`` bands, and two recipes are candidates when any band
+  matches, which is likely (> 99%) once Jaccard reaches 0.4.
+* SimHash. ``SIMHASH_BITS`` sign bits of random projections of the
+  recipe's nutrition vector (% of daily values, L2-normalised). Each of the
+  ``SIMHASH_TABLES`` tables sorts recipes by a rotation of the sketch, so
+  recipes that agree on the leading ``SIMHASH_PREFIX`` bits share a bucket.
+  This pairs up recipes that are close in nutrition even when they share no
+  ingredients.
+
+Within a bucket, recipes are ordered by their SimHash sketch, and each one is
+paired only with the ``MAX_BUCKET_PAIRS`` recipes on either side of it. So a
+huge bucket, such as every recipe with salt and water, cannot blow up the
+pair count. Building costs sorts and vector compares over
+``O(n · tables)`` keys, so it scales well past 100k recipes. A lookup is a
+row slice of the table.
+
+Every per-recipe input (ingredient ids, nutrition) is independent of the
+rest of the catalog. So ``patched`` reuses the previous signatures and
+neighbour lists, and only scores pairs that touch new or changed recipes.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from api.catalog import Catalog
+from api.nutrition import DAILY_VALUES
+
+NEIGHBORS = 10
+NUM_HASHES = 64
+MINHASH_BANDS = 32  # 2 hashes per band
+SIMHASH_BITS = 64
+SIMHASH_TABLES = 4
+SIMHASH_PREFIX = 16
+MAX_BUCKET_PAIRS = 4
+JACCARD_WEIGHT = 0.7
+_HASH_CHUNK = 8192  # recipes hashed at a time
+_PAIR_CHUNK = 1 << 16  # pairs scored at a time
+_EMPTY = np.uint32(np.iinfo(np.uint32).max)
+
+
+def _hash_params(seed: int = 20240611) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, size=NUM_HASHES, dtype=np.uint64) << np.uint64(1) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=NUM_HASHES, dtype=np.uint64)
+    return a, b
+
+
+_A, _B = _hash_params()
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser: spreads small, consecutive ids over all 64 bits."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def minhash(catalog: Catalog, rows: np.ndarray) -> np.ndarray:
+    """``(len(rows), NUM_HASHES)`` MinHash signatures of the rows' ingredient id sets.
+
+    Each hash is multiply-shift over the mixed id, keeping the top 32 bits.
+    Recipes without ingredients get ``_EMPTY`` throughout.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    out = np.full((len(rows), NUM_HASHES), _EMPTY, dtype=np.uint32)
+    mixed = _mix(np.asarray(catalog.ingredient_ids, dtype=np.uint64))
+    for lo in range(0, len(rows), _HASH_CHUNK):
+        chunk = rows[lo:lo + _HASH_CHUNK]
+        starts = catalog.ing_offsets[chunk].astype(np.int64)
+        lens = catalog.ing_offsets[chunk + 1].astype(np.int64) - starts
+        has = lens > 0
+        if not has.any():
+            continue
+        firsts = np.cumsum(lens) - lens
+        edges = np.arange(int(lens.sum()), dtype=np.int64) + np.repeat(starts - firsts, lens)
+        hashed = (mixed[catalog.ing_indices[edges]][:, None] * _A + _B) >> np.uint64(32)
+        out[lo:lo + _HASH_CHUNK][has] = np.minimum.reduceat(hashed, firsts[has], axis=0).astype(np.uint32)
+    return out
+
+
+def nutrition_vectors(catalog: Catalog, rows: np.ndarray) -> np.ndarray:
+    """L2-normalised nutrition per row as % of daily values (all zeros when a recipe has none).
+
+    Raw amounts would let calories and milligram columns swamp the rest.
+    """
+    vec = np.maximum(np.asarray(catalog.nutrition[rows], dtype=np.float32), 0.0) / DAILY_VALUES
+    norms = np.linalg.norm(vec, axis=1, keepdims=True)
+    return vec / np.where(norms > 0, norms, 1.0)
+
+
+@lru_cache(maxsize=4)
+def _planes(dim: int) -> np.ndarray:
+    return np.random.default_rng(7).standard_normal((dim, SIMHASH_BITS)).astype(np.float32)
+
+
+def simhash(vectors: np.ndarray) -> np.ndarray:
+    """One ``SIMHASH_BITS``-bit sketch per vector: sign bits of random projections."""
+    bits = (vectors @ _planes(vectors.shape[1]) > 0).astype(np.uint64)
+    return (bits << np.arange(SIMHASH_BITS, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)
+
+
+def _rotate(sketches: np.ndarray, by: int) -> np.ndarray:
+    if not by:
+        return sketches
+    return (sketches >> np.uint64(by)) | (sketches << np.uint64(SIMHASH_BITS - by))
+
+
+def _tables(
+    minhashes: np.ndarray, sketches: np.ndarray, vectors: np.ndarray
+) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """``(rows, bucket, order key)`` per LSH table.
+
+    Recipes without ingredients sit out the MinHash tables, and recipes
+    without nutrition sit out the SimHash ones.
+    """
+    tables = []
+    width = NUM_HASHES // MINHASH_BANDS
+    rows = np.flatnonzero(minhashes[:, 0] != _EMPTY)
+    for band in range(MINHASH_BANDS):
+        key = np.zeros(len(rows), dtype=np.uint64)
+        for j in range(band * width, (band + 1) * width):
+            key = _mix(key ^ minhashes[rows, j].astype(np.uint64))
+        tables.append((rows, key, sketches[rows]))
+    rows = np.flatnonzero(vectors.any(axis=1))
+    for table in range(SIMHASH_TABLES):
+        rotated = _rotate(sketches[rows], table * SIMHASH_BITS // SIMHASH_TABLES)
+        tables.append((rows, rotated >> np.uint64(SIMHASH_BITS - SIMHASH_PREFIX), rotated))
+    return tables
+
+
+def _bucket_pairs(
+    tables: List[Tuple[np.ndarray, np.ndarray, np.ndarray]], n: int, dirty: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique ``(a, b)`` row pairs, ``a < b``, that are bucket neighbours in any table.
+
+    With ``dirty``, only pairs touching a dirty row are returned.
+    """
+    found = []
+    for rows, bucket, order_key in tables:
+        order = np.lexsort((order_key, bucket))
+        rows, bucket = rows[order], bucket[order]
+        for d in range(1, MAX_BUCKET_PAIRS + 1):
+            same = np.flatnonzero(bucket[:-d] == bucket[d:])
+            if not len(same):
+                break
+            a, b = rows[same], rows[same + d]
+            if dirty is not None:
+                touch = dirty[a] | dirty[b]
+                a, b = a[touch], b[touch]
+            found.append(np.minimum(a, b).astype(np.int64) * n + np.maximum(a, b))
+    if not found:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    codes = np.unique(np.concatenate(found))
+    return codes // n, codes % n
+
+
+def _score_pairs(minhashes: np.ndarray, vectors: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    out = np.empty(len(a), dtype=np.float32)
+    for lo in range(0, len(a), _PAIR_CHUNK):
+        x, y = a[lo:lo + _PAIR_CHUNK], b[lo:lo + _PAIR_CHUNK]
+        jaccard = (minhashes[x] == minhashes[y]).mean(axis=1, dtype=np.float32)
+        jaccard[minhashes[x, 0] == _EMPTY] = 0.0
+        cosine = np.einsum("ij,ij->i", vectors[x], vectors[y])
+        out[lo:lo + _PAIR_CHUNK] = JACCARD_WEIGHT * jaccard + (1.0 - JACCARD_WEIGHT) * cosine
+    return out
+
+
+def _top_k(
+    n: int, src: np.ndarray, dst: np.ndarray, score: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Best ``k`` ``dst`` per ``src`` as ``(n, k)`` rows (-1 padded) and scores."""
+    neighbors = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if not len(src):
+        return neighbors, scores
+    order = np.lexsort((dst, -score, src))
+    src, dst, score = src[order], dst[order], score[order]
+    rank = np.arange(len(src)) - np.searchsorted(src, src, side="left")
+    keep = rank < k
+    neighbors[src[keep], rank[keep]] = dst[keep]
+    scores[src[keep], rank[keep]] = score[keep]
+    return neighbors, scores
+
+
+class SimilarityIndex:
+    """Top-``k`` similar recipes per catalog row, plus the signatures they came from."""
+
+    def __init__(
+        self,
+        minhashes: np.ndarray,
+        sketches: np.ndarray,
+        vectors: np.ndarray,
+        neighbors: np.ndarray,
+        scores: np.ndarray,
+    ) -> None:
+        self.minhashes = minhashes
+        self.sketches = sketches
+        self.vectors = vectors
+        self.neighbors = neighbors
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.neighbors)
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    @classmethod
+    def build(cls, catalog: Catalog, k: int = NEIGHBORS) -> "SimilarityIndex":
+        rows = np.arange(len(catalog))
+        minhashes = minhash(catalog, rows)
+        vectors = nutrition_vectors(catalog, rows)
+        sketches = simhash(vectors)
+        a, b = _bucket_pairs(_tables(minhashes, sketches, vectors), len(catalog))
+        score = _score_pairs(minhashes, vectors, a, b)
+        neighbors, scores = _top_k(
+            len(catalog), np.concatenate([a, b]), np.concatenate([b, a]), np.concatenate([score, score]), k
+        )
+        return cls(minhashes, sketches, vectors, neighbors, scores)
+
+    @classmethod
+    def patched(cls, catalog: Catalog, previous: "SimilarityIndex", old_rows: np.ndarray) -> "SimilarityIndex":
+        """Index for ``catalog`` reusing ``previous``.
+
+        ``old_rows[r]`` is row ``r``'s row in the previous catalog, or -1 for
+        new/changed recipes. Only those are re-hashed, and only pairs that
+        touch them are scored. Unchanged rows keep their neighbour lists
+        (remapped to new rows) merged with any better new pairs. A row that
+        lost a neighbour to a removed or changed recipe is rescored in full.
+        As with ``build``, candidates depend on bucket order, so a patched
+        list can differ from a rebuilt one where buckets are crowded.
+        """
+        n, k = len(catalog), previous.k
+        reuse = old_rows >= 0
+        fresh = np.flatnonzero(~reuse)
+        minhashes = np.empty((n, NUM_HASHES), dtype=np.uint32)
+        vectors = np.empty((n, previous.vectors.shape[1]), dtype=np.float32)
+        sketches = np.empty(n, dtype=np.uint64)
+        minhashes[reuse] = previous.minhashes[old_rows[reuse]]
+        vectors[reuse] = previous.vectors[old_rows[reuse]]
+        sketches[reuse] = previous.sketches[old_rows[reuse]]
+        minhashes[fresh] = minhash(catalog, fresh)
+        vectors[fresh] = nutrition_vectors(catalog, fresh)
+        sketches[fresh] = simhash(vectors[fresh])
+
+        new_row_of_old = np.full(len(previous), -1, dtype=np.int64)
+        new_row_of_old[old_rows[reuse]] = np.flatnonzero(reuse)
+        old_lists = previous.neighbors[old_rows[reuse]]
+        carried = np.full((n, k), -1, dtype=np.int64)
+        carried[reuse] = np.where(old_lists >= 0, new_row_of_old[old_lists], -1)
+        carried_scores = np.zeros((n, k), dtype=np.float32)
+        carried_scores[reuse] = previous.scores[old_rows[reuse]]
+        lost = np.zeros(n, dtype=bool)
+        lost[reuse] = ((carried[reuse] < 0) & (old_lists >= 0)).any(axis=1)
+        dirty = ~reuse | lost
+
+        a, b = _bucket_pairs(_tables(minhashes, sketches, vectors), n, dirty)
+        score = _score_pairs(minhashes, vectors, a, b)
+        # Clean rows keep carried entries that point at clean rows; pairs with
+        # dirty rows come from the fresh scores. Dirty rows use those only.
+        keep = (carried >= 0) & ~dirty[:, None]
+        keep[keep] = ~dirty[carried[keep]]
+        neighbors, scores = _top_k(
+            n,
+            np.concatenate([np.nonzero(keep)[0], a, b]),
+            np.concatenate([carried[keep], b, a]),
+            np.concatenate([carried_scores[keep], score, score]),
+            k,
+        )
+        return cls(minhashes, sketches, vectors, neighbors, scores)
+
+    def similar(self, row: int, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Neighbour rows of ``row`` and their scores, best first."""
+        neighbors = self.neighbors[row, :limit]
+        found = neighbors >= 0
+        return neighbors[found].astype(np.int64), self.scores[row, :limit][found]
+
+    def components(self, row: int, others: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Estimated ingredient Jaccard and nutrition cosine of ``row`` against ``others``."""
+        others = np.asarray(others, dtype=np.int64)
+        jaccard = (self.minhashes[others] == self.minhashes[row]).mean(axis=1, dtype=np.float32)
+        if self.minhashes[row, 0] == _EMPTY:
+            jaccard[:] = 0.0
+        return jaccard, self.vectors[others] @ self.vectors[row]
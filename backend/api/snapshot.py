@@ -0,0 +1,214 @@
+"""Compiled binary catalog snapshots for fast cold starts.
+
+A snapshot is a directory holding one ``.npy`` file per catalog array, with
+interned string columns stored as a UTF-8 byte heap plus an offsets array,
+and a ``manifest.json``. On load, every array is opened with
+``mmap_mode="r"``, so a cold start costs a few page faults instead of five
+Supabase round trips or five CSV parses. Descriptions stay mapped as a
+``StringHeap`` and are decoded only for the rows that are read. The
+nutrition matrix and fingerprint are stored too, so neither is recomputed.
+
+The manifest guards against using a bad snapshot:
+
+* ``version`` – the on-disk format; any other version is ignored;
+* ``sizes`` – the byte size of every array file, checked on each load
+  (a ``stat`` per file) so a truncated or mixed-up snapshot is rejected
+  without reading the arrays;
+* ``checksum`` – a BLAKE2b digest of every array file, compared only when
+  loading with ``verify=True``, since hashing reads the whole description
+  heap that the mapping otherwise leaves on disk;
+* ``source_digest`` – for snapshots compiled from the bundled CSVs, a digest
+  of those CSVs, so a snapshot older than the CSVs next to it is rejected.
+
+Supabase-built snapshots also keep the sync watermarks and any edges still
+waiting for their recipe or ingredient, so the background refresher can
+continue with an incremental sync from the snapshot.
+
+Build with::
+
+    python -m api.snapshot          # from Supabase, else the bundled CSVs
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from api.catalog import Catalog, StringHeap
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_PATH = Path(__file__).resolve().parent.parent / "dataset" / "catalog-snapshot"
+
+_ARRAYS = (
+    "ids", "min_prep_time", "green_score", "ingredient_ids", "tag_ids", "ingredient_nutrients",
+    "ing_offsets", "ing_indices", "ing_amounts", "tag_offsets", "tag_indices", "nutrition",
+)
+_STRINGS = ("names", "descriptions", "ingredient_names", "tag_names")
+_LAZY_STRINGS = {"descriptions"}
+
+
+def _pack_strings(values) -> StringHeap:
+    if isinstance(values, StringHeap) and np.array_equal(values.starts[1:], values.ends[:-1]):
+        return values  # already contiguous
+    return StringHeap.from_strings(values)
+
+
+def _unpack_strings(heap: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = heap.tobytes()
+    bounds = offsets.tolist()
+    return [raw[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+
+def _files() -> List[str]:
+    return [f"{name}.npy" for name in _ARRAYS] + [
+        f"{name}.{part}.npy" for name in _STRINGS for part in ("heap", "offsets")
+    ]
+
+
+def _checksum(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for name in _files():
+        with (path / name).open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def _sizes(path: Path) -> Dict[str, int]:
+    return {name: (path / name).stat().st_size for name in _files()}
+
+
+def source_digest(paths: Iterable[Path]) -> str:
+    """Digest of the raw bytes of ``paths`` (cheap next to parsing them)."""
+    h = hashlib.blake2b(digest_size=16)
+    for p in paths:
+        h.update(Path(p).name.encode("utf-8"))
+        h.update(Path(p).read_bytes())
+    return h.hexdigest()
+
+
+def write_snapshot(catalog: Catalog, path: Path = SNAPSHOT_PATH, source_digest: str = "") -> Path:
+    """Compile ``catalog`` into ``path``, replacing any previous snapshot.
+
+    The new snapshot is fully written beside ``path`` and swapped in by
+    renames. The old one is only deleted once the new one is in place, so a
+    crash mid-swap leaves one of them on disk, never neither.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=path.name + ".", dir=path.parent))
+    try:
+        for name in _ARRAYS:
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(getattr(catalog, name)))
+        for name in _STRINGS:
+            packed = _pack_strings(getattr(catalog, name))
+            start = int(packed.starts[0]) if len(packed) else 0
+            end = int(packed.ends[-1]) if len(packed) else 0
+            offsets = np.append(np.asarray(packed.starts, dtype=np.int64), end) - start
+            np.save(tmp / f"{name}.heap.npy", np.ascontiguousarray(packed.heap[start:end]))
+            np.save(tmp / f"{name}.offsets.npy", offsets)
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "source": catalog.source,
+            "source_digest": source_digest,
+            "watermarks": catalog.watermarks,
+            "pending_edges": {name: values.tolist() for name, values in catalog.pending_edges.items()},
+            "fingerprint": catalog.fingerprint,
+            "recipes": len(catalog),
+            "built_at": time.time(),
+            "checksum": _checksum(tmp),
+            "sizes": _sizes(tmp),
+        }
+        (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2, sort_keys=True))
+        tmp.chmod(0o755)  # mkdtemp creates it private
+        # Move the old snapshot aside before swapping the new one in, so
+        # there is always a complete snapshot at ``path`` or beside it.
+        old = None
+        if path.exists():
+            old = Path(tempfile.mkdtemp(prefix=path.name + ".old.", dir=path.parent))
+            os.replace(path, old)
+        try:
+            os.replace(tmp, path)
+        except BaseException:
+            if old is not None:
+                os.replace(old, path)
+            raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def read_manifest(path: Path = SNAPSHOT_PATH) -> Optional[Dict]:
+    try:
+        manifest = json.loads((Path(path) / "manifest.json").read_text())
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == SNAPSHOT_VERSION else None
+
+
+def load_snapshot(
+    path: Path = SNAPSHOT_PATH, expect_source_digest: Optional[str] = None, verify: bool = False
+) -> Optional[Catalog]:
+    """Memory-map the snapshot at ``path``; ``None`` if missing, corrupt or stale.
+
+    File sizes and string offsets are always checked; ``verify`` also
+    compares the full checksum, reading every file once.
+    """
+    path = Path(path)
+    manifest = read_manifest(path)
+    if manifest is None:
+        return None
+    if expect_source_digest is not None and manifest.get("source_digest") != expect_source_digest:
+        return None
+    try:
+        if _sizes(path) != manifest.get("sizes"):
+            return None
+        if verify and _checksum(path) != manifest.get("checksum"):
+            return None
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        strings = {}
+        for name in _STRINGS:
+            heap = np.load(path / f"{name}.heap.npy", mmap_mode="r")
+            offsets = np.load(path / f"{name}.offsets.npy", mmap_mode="r")
+            if len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != len(heap):
+                return None
+            # Descriptions stay mapped and decode per row; short columns are decoded now.
+            strings[name] = (
+                StringHeap(heap, offsets[:-1], offsets[1:]) if name in _LAZY_STRINGS
+                else _unpack_strings(heap, offsets)
+            )
+    except (OSError, ValueError, UnicodeDecodeError):
+        return None
+    catalog = Catalog(**arrays, **strings)
+    catalog.source = manifest.get("source", "")
+    catalog.source_digest = manifest.get("source_digest", "")
+    catalog.watermarks = manifest.get("watermarks") or {}
+    catalog.pending_edges = {
+        name: np.asarray(values, dtype=np.float64 if name == "ing_amounts" else np.int64)
+        for name, values in (manifest.get("pending_edges") or {}).items()
+    }
+    catalog._fingerprint = manifest.get("fingerprint")
+    return catalog
+
+
+if __name__ == "__main__":  # pragma: no cover
+    from api.recommender import CSV_PATHS, _load_recipes_from_supabase, _parse_csv_catalog
+
+    catalog = _load_recipes_from_supabase()
+    digest = ""
+    if catalog is None:
+        catalog = _parse_csv_catalog()
+        digest = source_digest(CSV_PATHS)
+    write_snapshot(catalog, SNAPSHOT_PATH, source_digest=digest)
+    print(f"Wrote {len(catalog)} {catalog.source} recipes to {SNAPSHOT_PATH}")
@@ -0,0 +1,118 @@
+"""Incremental parsing of a streamed JSON meal plan.
+
+Gemini's streaming API returns the plan as a series of text chunks that split
+the JSON document at arbitrary points. ``PlanStreamParser`` scans the chunks
+as they arrive and returns each element of the top-level ``"meals"`` array as
+soon as its closing brace has been seen. Meals can then be validated and sent
+to the client while the model is still writing the rest of the plan.
+
+The scanner keeps only the depth, string/escape state and the start offset of
+the object being read, so each character is inspected once however the
+chunks are split. Anything before the first ``{`` (such as a markdown code
+fence) is skipped. ``result()`` parses the complete text once the stream has
+ended. Top-level string fields such as ``goal_expanded`` are also kept in
+``fields`` as they complete, so they survive a stream that breaks later on.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Dict, List, Optional
+
+
+class PlanStreamParser:
+    """Emit the objects of a top-level JSON array from streamed text chunks."""
+
+    def __init__(self, key: str = "meals") -> None:
+        self.key = key
+        self._text: List[str] = []
+        self._pieces: List[str] = []  # chunk slices of the element being read
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string: List[str] = []  # raw characters of the current top-level string
+        self._last_string: Optional[str] = None
+        self.fields: Dict[str, str] = {}  # top-level string fields seen so far
+        self._pending_key: Optional[str] = None
+        self._array_depth: Optional[int] = None  # depth inside the target array
+        self._reading = False
+        self._done = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consume ``chunk`` and return the array elements it completed."""
+        self._text.append(chunk)
+        out: List[dict] = []
+        start = 0  # where the element being read starts in this chunk
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._end_string()
+                    continue
+                if self._depth == 1:
+                    self._string.append(ch)
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string = []
+            elif ch == ":" and self._depth == 1:
+                self._pending_key = self._last_string
+            elif ch == "," and self._depth == 1:
+                self._pending_key = None
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "[" and self._depth == 2 and self._pending_key == self.key and not self._done:
+                    self._array_depth = self._depth
+                elif ch == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._reading = True
+                    start = i
+            elif ch in "}]":
+                self._depth -= 1
+                if self._reading and self._depth == self._array_depth:
+                    self._reading = False
+                    self._pieces.append(chunk[start:i + 1])
+                    element = self._decode("".join(self._pieces))
+                    self._pieces = []
+                    if element is not None:
+                        out.append(element)
+                elif ch == "]" and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._array_depth = None
+                    self._done = True
+        if self._reading:
+            self._pieces.append(chunk[start:])
+        return out
+
+    def _end_string(self) -> None:
+        try:
+            value = json.loads('"' + "".join(self._string) + '"')
+        except ValueError:
+            return
+        if self._pending_key is None:
+            self._last_string = value  # an object key
+        else:
+            self.fields[self._pending_key] = value
+
+    @staticmethod
+    def _decode(text: str) -> Optional[dict]:
+        try:
+            value = json.loads(text)
+        except ValueError:
+            return None
+        return value if isinstance(value, dict) else None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text)
+
+    def result(self) -> Optional[dict]:
+        """The whole document parsed, or ``None`` if it is not a complete JSON object."""
+        text = self.text
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end < start:
+            return None
+        return self._decode(text[start:end + 1])
@@ -14,4 +14,11 @@ import api.recommender
 def client():
     """Provides a FastAPI test client for all tests."""
     with TestClient(app) as c:
-        yield c
\ No newline at end of file
+        yield c
+
+@pytest.fixture(autouse=True)
+def gemini_guard():
+    """A fresh circuit breaker and limiter per test, so failures don't leak across tests."""
+    guard = api.recommender._new_gemini_guard()
+    with patch.object(api.recommender, "_GEMINI_GUARD", guard):
+        yield guard
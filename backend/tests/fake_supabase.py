@@ -0,0 +1,42 @@
+# backend/tests/fake_supabase.py
+"""An in-memory stand-in for the Supabase client, shared by the fetch and refresh tests."""
+import threading
+
+
+class FakeTable:
+    """Just enough of the PostgREST query builder: select / gt / order / range / execute."""
+
+    def __init__(self, client, name, rows):
+        self.client, self.name, self.data = client, name, rows
+
+    def select(self, _cols):
+        return self
+
+    def gt(self, col, value):
+        return FakeTable(self.client, self.name, [r for r in self.data if r.get(col) is not None and r[col] > value])
+
+    def order(self, col):
+        return FakeTable(self.client, self.name, sorted(self.data, key=lambda r: r[col]))
+
+    def range(self, start, end):
+        self.client.requests.append((self.name, start, end))
+        if self.name in self.client.failing:
+            raise ConnectionError("boom")
+        return FakeTable(self.client, self.name, self.data[start:end + 1])
+
+    def execute(self):
+        return self
+
+
+class FakeSupabase:
+    """Serves ``tables`` (name -> rows); tables in ``failing`` raise on every page request."""
+
+    def __init__(self, tables, failing=()):
+        self.tables = tables
+        self.failing = set(failing)
+        self.requests = []
+        self.threads = set()
+
+    def table(self, name):
+        self.threads.add(threading.current_thread().name)
+        return FakeTable(self, name, self.tables.get(name, []))
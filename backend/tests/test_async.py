@@ -0,0 +1,71 @@
+# backend/tests/test_async.py
+import sys, os, asyncio, json, threading, time, pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.recommender import create_meal_plan_async
+
+
+def _fake_client(delay, reply):
+    async def generate_content(**kwargs):
+        await asyncio.sleep(delay)
+        return SimpleNamespace(text=json.dumps(reply))
+
+    return SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+
+
+def test_async_plan_uses_gemini_reply():
+    catalog = api.recommender._get_catalog()
+    rid = int(catalog.ids[api.recommender._rank_locally("gain muscle", 1, catalog)[0]])
+    reply = {"goal_expanded": "Async plan.", "meals": [{"recipe_id": rid, "meal_number": 1}]}
+    with patch.object(api.recommender, "_get_gemini_client", return_value=_fake_client(0, reply)), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        meals, expanded = asyncio.run(create_meal_plan_async("gain muscle", 1))
+    assert expanded == "Async plan."
+    assert meals[0]["id"] == rid
+
+
+def test_async_plan_times_out_to_local_fallback():
+    with patch.object(api.recommender, "_get_gemini_client", return_value=_fake_client(5, {})), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        start = time.perf_counter()
+        meals, expanded = asyncio.run(create_meal_plan_async("high protein", 3, timeout=0.05))
+    assert time.perf_counter() - start < 2
+    assert len(meals) == 3
+    assert expanded.startswith("Practical eating pattern")
+
+
+def test_async_plan_propagates_cancellation():
+    async def run():
+        task = asyncio.create_task(create_meal_plan_async("lose fat", 3, timeout=10))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await task
+
+    with patch.object(api.recommender, "_get_gemini_client", return_value=_fake_client(5, {})), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(run())
+
+
+def test_local_ranking_runs_off_the_event_loop():
+    rank = api.recommender._rank_locally
+    threads = []
+
+    def recording_rank(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return rank(*args, **kwargs)
+
+    async def both():
+        await create_meal_plan_async("high protein", 2)
+        async for _ in api.recommender.stream_meal_plan("vegan lunch", 2):
+            pass
+
+    with patch.object(api.recommender, "_rank_locally", recording_rank), \
+         patch.object(api.recommender, "_get_gemini_client", return_value=None), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        asyncio.run(both())
+    assert len(threads) >= 2 and threading.main_thread() not in threads
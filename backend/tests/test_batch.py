@@ -0,0 +1,95 @@
+# backend/tests/test_batch.py
+import sys, os, asyncio, json, time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.index import app
+from api.recommender import PlanRequest, create_meal_plans
+
+
+def _first_choice(config):
+    schema = config.response_schema if hasattr(config, "response_schema") else config["response_schema"]
+    return int(schema["properties"]["meals"]["items"]["properties"]["recipe_id"]["enum"][0])
+
+
+class _CountingClient:
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = self.in_flight = self.max_in_flight = 0
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self.generate_content))
+
+    async def generate_content(self, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        rid = _first_choice(kwargs["config"])  # the one meal selected for the goal
+        reply = {"goal_expanded": "Batch plan.", "meals": [{"recipe_id": rid, "meal_number": 1}]}
+        return SimpleNamespace(text=json.dumps(reply))
+
+
+async def _collect(requests, **kwargs):
+    return [item async for item in create_meal_plans(requests, **kwargs)]
+
+
+def test_batch_dedupes_goals_and_bounds_concurrency():
+    client = _CountingClient(0.05)
+    goals = ["Lose 5 kg!", "lose 5kg", "gain muscle", "GAIN MUSCLE", "vegan", "gain muscle"]
+    with patch.object(api.recommender, "_get_gemini_client", return_value=client), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        results = asyncio.run(_collect([PlanRequest(g, 1) for g in goals], concurrency=2))
+    assert sorted(i for i, _, _ in results) == list(range(len(goals)))
+    assert client.calls == 3
+    assert client.max_in_flight <= 2
+    assert all(expanded == "Batch plan." for _, _, expanded in results)
+
+
+def test_batch_is_faster_than_sequential_calls():
+    client = _CountingClient(0.1)
+    requests = [PlanRequest(f"goal number {i}", 1) for i in range(20)]
+    with patch.object(api.recommender, "_get_gemini_client", return_value=client), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        start = time.perf_counter()
+        results = asyncio.run(_collect(requests, concurrency=10))
+        elapsed = time.perf_counter() - start
+    assert len(results) == 20 and client.calls == 20
+    assert elapsed < 1.0  # 20 sequential calls would take >= 2 s
+
+
+def test_local_plans_do_not_take_gemini_slots():
+    acquired = []
+
+    class _Gate(asyncio.Semaphore):
+        async def acquire(self):
+            acquired.append(1)
+            return await super().acquire()
+
+    requests = [PlanRequest(f"goal number {i}", 2) for i in range(5)]
+    with patch.object(api.recommender, "_get_gemini_client", return_value=None), \
+         patch.object(api.recommender, "_PLAN_CACHE", None), \
+         patch.object(api.recommender.asyncio, "Semaphore", _Gate):
+        results = asyncio.run(_collect(requests, concurrency=1))
+    assert len(results) == 5 and not acquired
+
+
+def test_batch_endpoint_streams_ndjson():
+    payload = {"requests": [{"goal": "high protein", "numMeals": 2}, {"goal": " ", "numMeals": 1},
+                            {"goal": "vegan dinner", "numMeals": 1, "excludeTags": ["Meat"]}]}
+    with patch.object(api.recommender, "_get_gemini_client", return_value=None):
+        response = TestClient(app).post("/recommender/batch", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    by_index = {line["index"]: line for line in lines}
+    assert set(by_index) == {0, 1, 2}
+    assert by_index[1]["error"]
+    assert len(by_index[0]["recipes"]) == 2 and by_index[0]["goal_expanded"]
+    assert len(by_index[2]["recipes"]) == 1
@@ -0,0 +1,122 @@
+# backend/tests/test_breaker.py
+import sys, os, asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.breaker import CLOSED, HALF_OPEN, OPEN, AimdLimiter, CallGuard, CircuitBreaker
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_probes_and_closes():
+    clock = _Clock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()        # the probe
+    assert not breaker.allow()    # everyone else still short-circuits
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["short_circuits"] == 2 and breaker.stats()["opens"] == 1
+
+
+def test_failed_probe_reopens_and_success_resets_count():
+    clock = _Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=clock)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == CLOSED  # failures must be consecutive
+    breaker.record(False)
+    clock.now += 5
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN and breaker.stats()["opens"] == 2
+
+
+def test_aimd_limit_grows_additively_and_halves_once_per_burst():
+    clock = _Clock()
+    limiter = AimdLimiter(initial=4, min_limit=1, max_limit=8, clock=clock)
+    permits = [limiter.try_acquire() for _ in range(5)]
+    assert permits[-1] is None and limiter.rejected == 1
+    for permit in permits[:4]:
+        clock.now += 1
+        limiter.release(permit, True)
+    assert 4.9 < limiter.limit < 5.0  # +1/limit per success
+
+    permits = [limiter.try_acquire() for _ in range(3)]
+    clock.now += 1
+    for permit in permits:
+        limiter.release(permit, False)
+    assert limiter.decreases == 1 and 2.4 < limiter.limit < 2.5
+    assert limiter.in_flight == 0
+
+
+def test_guard_short_circuits_gemini_after_repeated_failures(gemini_guard):
+    calls = []
+
+    async def generate_content(**kwargs):
+        calls.append(1)
+        raise RuntimeError("503 Service Unavailable")
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    with patch.object(api.recommender, "_get_gemini_client", return_value=client), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        for i in range(8):
+            meals, expanded = asyncio.run(api.recommender.create_meal_plan_async(f"goal {i}", 2))
+            assert len(meals) == 2 and expanded.startswith("Practical eating pattern")
+    threshold = gemini_guard.breaker.failure_threshold
+    assert len(calls) == threshold
+    stats = api.recommender.recommender_metrics()["llm"]
+    assert stats["breaker"]["state"] == OPEN
+    assert stats["breaker"]["short_circuits"] == 8 - threshold
+    assert stats["limiter"]["in_flight"] == 0
+
+
+def test_guard_releases_slot_when_limit_rejects_probe():
+    clock = _Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=1, clock=clock)
+    guard = CallGuard(breaker, AimdLimiter(initial=1, clock=clock))
+    held = guard.admit()
+    breaker.record(False)
+    clock.now += 1
+    assert guard.admit() is None    # breaker lets the probe through, the limit doesn't
+    guard.done(held, None)
+    assert guard.admit() is not None  # the probe slot was not leaked
+
+
+def test_failing_to_build_the_request_does_not_leak_a_permit(gemini_guard):
+    catalog = api.recommender._get_catalog()
+    parser = api.recommender.PlanStreamParser()
+
+    async def stream():
+        return [meal async for meal in api.recommender._stream_gemini("goal", catalog, [0, 1], parser)]
+
+    with patch.object(api.recommender, "_get_gemini_client", return_value=SimpleNamespace()), \
+         patch.object(api.recommender, "_gemini_request", side_effect=ValueError("bad prompt")):
+        for call in (
+            lambda: api.recommender._call_gemini("goal", catalog, [0, 1]),
+            lambda: asyncio.run(api.recommender._call_gemini_async("goal", catalog, [0, 1])),
+            lambda: asyncio.run(stream()),
+        ):
+            with pytest.raises(ValueError):
+                call()
+    assert gemini_guard.stats()["limiter"]["in_flight"] == 0
+    assert gemini_guard.stats()["breaker"]["failures"] == 0
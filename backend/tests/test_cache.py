@@ -0,0 +1,72 @@
+# backend/tests/test_cache.py
+import sys, os, time
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.cache import MemoryCache, ResponseCache, SqliteCache, cache_key, normalize_goal
+
+
+def test_normalize_goal():
+    assert normalize_goal("  Lose 5kg!! ") == normalize_goal("lose 5 KG") == "lose 5 kg"
+    assert cache_key("Lose 5kg", 3) == cache_key("lose 5 kg", 3) != cache_key("lose 5 kg", 4)
+
+
+def test_non_ascii_goals_keep_distinct_keys():
+    assert normalize_goal("高蛋白早餐!") == "高蛋白早餐"
+    assert normalize_goal("Ärger STRASSE") == normalize_goal("ärger straße")
+    assert cache_key("减肥", 3) != cache_key("高蛋白早餐", 3)
+    assert normalize_goal(" 🔥💪 ") == "🔥💪"
+    assert cache_key("🔥💪", 3) != cache_key("🥗", 3)
+
+
+def test_memory_cache_lru_and_byte_budget():
+    cache = MemoryCache(ttl=60, max_entries=2, max_bytes=1000)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "a" becomes most recent
+    cache.set("c", "3")
+    assert cache.get("b") is None and cache.get("a") == "1"
+    cache.set("big", "x" * 999)
+    assert cache.bytes <= 1000
+
+
+def test_memory_cache_ttl():
+    cache = MemoryCache(ttl=0.01)
+    cache.set("k", "v")
+    time.sleep(0.02)
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    writer = ResponseCache(SqliteCache(path, ttl=60, max_entries=2))
+    reader = ResponseCache(SqliteCache(path, ttl=60, max_entries=2))
+    writer.set("k", {"meals": [1, 2]})
+    assert reader.get("k") == {"meals": [1, 2]}
+    for key in ("x", "y", "z"):
+        writer.set(key, 1)
+    assert len(writer.backend) == 2
+    assert reader.stats()["hits"] == 1
+
+
+def test_create_meal_plan_caches_llm_plans_only():
+    cache = ResponseCache(MemoryCache())
+    catalog = api.recommender._get_catalog()
+    rid = int(catalog.ids[api.recommender._rank_locally("lose 5kg", 1, catalog)[0]])
+    fake = {"goal_expanded": "Eat well.", "meals": [{"recipe_id": rid, "meal_number": 1}]}
+    with patch.object(api.recommender, "_PLAN_CACHE", cache), \
+         patch.object(api.recommender, "_call_gemini", return_value=fake) as llm:
+        first = api.recommender.create_meal_plan("Lose 5kg", 1)
+        second = api.recommender.create_meal_plan("lose 5 kg", 1)
+    assert first == second
+    assert llm.call_count == 1
+    assert cache.stats()["hits"] == 1
+
+    with patch.object(api.recommender, "_PLAN_CACHE", cache), \
+         patch.object(api.recommender, "_call_gemini", return_value=None):
+        api.recommender.create_meal_plan("gain muscle", 2)
+        api.recommender.create_meal_plan("gain muscle", 2)
+    assert len(cache.backend) == 1
@@ -0,0 +1,119 @@
+# backend/tests/test_catalog.py
+import csv, sys, os, pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from api.catalog import CatalogBuilder, StringHeap
+from api.recommender import _load_recipes_from_csv, _parse_csv_catalog, create_meal_plan
+
+
+def _small_catalog():
+    b = CatalogBuilder()
+    b.add_recipe({"id": 10, "name": "Soup", "description": "Boil."})
+    b.add_recipe({"id": 20, "name": "Salad", "description": ""})
+    b.add_ingredient({"id": 1, "name": "Carrot"})
+    b.add_ingredient({"id": 2, "name": "Lettuce"})
+    b.add_tag({"id": 7, "name": "Vegan"})
+    # edges arrive out of order and include dangling references
+    b.add_ingredient_edge({"recipe_id": 20, "ingredient_id": 2})
+    b.add_ingredient_edge({"recipe_id": 10, "ingredient_id": 1})
+    b.add_ingredient_edge({"recipe_id": 20, "ingredient_id": 1})
+    b.add_ingredient_edge({"recipe_id": 99, "ingredient_id": 1})
+    b.add_ingredient_edge({"recipe_id": 10, "ingredient_id": 404})
+    b.add_tag_edge({"recipe_id": 20, "tag_id": 7})
+    return b.build()
+
+
+def test_catalog_csr_edges():
+    cat = _small_catalog()
+    assert len(cat) == 2
+    assert cat.ing_offsets.tolist() == [0, 1, 3]
+    assert cat.ingredients(cat.row(10)) == ["Carrot"]
+    assert cat.ingredients(cat.row(20)) == ["Lettuce", "Carrot"]
+    assert cat.tags(cat.row(10)) == []
+    assert cat.tags(cat.row(20)) == ["Vegan"]
+
+
+def test_catalog_lookup_by_id():
+    cat = _small_catalog()
+    recipe = cat.get(20)
+    assert recipe.name == "Salad"
+    assert recipe.ingredients == ["Lettuce", "Carrot"]
+    assert cat.get(12345) is None
+
+
+def test_csv_catalog_loads():
+    cat = _load_recipes_from_csv()
+    assert len(cat) > 0
+    assert len(cat.row_of) == len(cat)
+    assert cat.ing_offsets[-1] == len(cat.ing_indices)
+    assert cat.tag_offsets[-1] == len(cat.tag_indices)
+
+
+def test_nutrition_matrix_matches_ingredient_sum():
+    b = CatalogBuilder()
+    b.add_recipe({"id": 1, "name": "Prawns in oil"})
+    b.add_recipe({"id": 2, "name": "Empty"})
+    b.add_ingredient({"id": 1, "name": "Prawns", "calories_kcal": "99", "protein_g": "24"})
+    b.add_ingredient({"id": 2, "name": "Oil", "calories_kcal": "119", "agg_fats_g": "13.5"})
+    b.add_ingredient_edge({"recipe_id": 1, "ingredient_id": 1, "relative_unit_100": "500"})
+    b.add_ingredient_edge({"recipe_id": 1, "ingredient_id": 2, "relative_unit_100": "300"})
+    cat = b.build()
+    row = cat.row(1)
+    assert cat.nutrient(row, "calories_kcal") == pytest.approx(99 * 5 + 119 * 3)
+    assert cat.nutrient(row, "protein_g") == pytest.approx(120)
+    assert cat.nutrient(row, "agg_fats_g") == pytest.approx(40.5)
+    assert sum(cat.nutrients(cat.row(2)).values()) == 0
+
+
+def test_meal_plan_reports_catalog_macros():
+    meals, _ = create_meal_plan("high protein", 3)
+    cat = _load_recipes_from_csv()
+    for meal in meals:
+        row = cat.row(meal["id"])
+        assert meal["calories_kcal"] == round(cat.nutrient(row, "calories_kcal"))
+        assert meal["protein_g"] == round(cat.nutrient(row, "protein_g"))
+
+
+def test_descriptions_live_in_a_string_heap():
+    b = CatalogBuilder(spill_descriptions=True)
+    b.add_recipe({"id": 1, "name": "Crêpe", "description": "Whisk — then fry."})
+    b.add_recipe({"id": 2, "name": "Toast", "description": "Toast."})
+    b.add_recipe({"id": 1, "name": "Crêpe", "description": "Rest the batter."})  # upsert
+    cat = b.build()
+    assert isinstance(cat.descriptions, StringHeap)
+    assert isinstance(cat.descriptions.heap, np.memmap)
+    assert list(cat.descriptions) == ["Rest the batter.", "Toast."]
+    assert cat.descriptions[-1] == "Toast." and cat.descriptions[:1] == ["Rest the batter."]
+    reseeded = CatalogBuilder.from_catalog(cat).build()
+    assert list(reseeded.descriptions) == list(cat.descriptions)
+    assert reseeded.fingerprint == cat.fingerprint
+
+
+def test_streaming_csv_parse_matches_row_by_row_builder():
+    streamed = _parse_csv_catalog()
+    b = CatalogBuilder()
+    for table in ("recipes", "ingredients", "recipe_ingredient_map", "tags", "recipe_tag_map"):
+        path = os.path.join(os.path.dirname(__file__), "..", "dataset", f"{table}-supabase.csv")
+        add = {
+            "recipes": b.add_recipe, "ingredients": b.add_ingredient,
+            "recipe_ingredient_map": b.add_ingredient_edge, "tags": b.add_tag,
+            "recipe_tag_map": b.add_tag_edge,
+        }[table]
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                add(row)
+    assert streamed.fingerprint == b.build().fingerprint
+
+
+def test_description_prefix_reads_only_the_head():
+    text = "é" * 300 + "tail"
+    heap = StringHeap.from_strings(["", text])
+    assert heap.prefix(0, 10) == ""
+    assert heap.prefix(1, 180) == text[:180]
+    assert heap.prefix(1, 1000) == text
+    cat = _load_recipes_from_csv()
+    for row in range(len(cat)):
+        assert cat.description(row, 180) == cat.descriptions[row][:180]
@@ -0,0 +1,70 @@
+# backend/tests/test_clients.py
+import sys, os, asyncio, pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.clients import ClientRegistry
+
+
+def test_registry_reuses_client_until_invalidated():
+    built = []
+    reg = ClientRegistry()
+    reg.register("svc", lambda: built.append(object()) or built[-1])
+    a, b = reg.get("svc"), reg.get("svc")
+    assert a is b and len(built) == 1
+    reg.report("svc", ValueError("bad request"))  # API error: keep the client
+    assert reg.get("svc") is a
+    reg.report("svc", ConnectionError("reset"))  # transport error: rebuild
+    assert reg.get("svc") is not a
+    assert reg.stats()["svc"] == {"ready": True, "builds": 2, "invalidations": 1}
+
+
+def test_registry_backs_off_after_failed_build():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        raise RuntimeError("no network")
+
+    reg = ClientRegistry()
+    reg.register("svc", factory, retry_after=60)
+    assert reg.get("svc") is None
+    assert reg.get("svc") is None
+    assert len(calls) == 1
+
+
+def test_registry_recycles_old_clients():
+    reg = ClientRegistry()
+    reg.register("svc", object, max_age=0)
+    assert reg.get("svc") is not reg.get("svc")
+
+
+class _Pooled:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_timeouts_keep_the_client_and_evictions_close_it():
+    reg = ClientRegistry()
+    reg.register("svc", _Pooled)
+    client = reg.get("svc")
+
+    async def slow():
+        await asyncio.wait_for(asyncio.sleep(1), timeout=0.01)
+
+    with pytest.raises(TimeoutError) as timeout:
+        asyncio.run(slow())
+    reg.report("svc", timeout.value)  # what _call_gemini_async reports for a slow call
+    assert reg.get("svc") is client and not client.closed
+    reg.report("svc", ConnectionResetError("reset"))
+    assert client.closed and reg.get("svc") is not client
+
+
+def test_recycled_clients_are_closed():
+    reg = ClientRegistry()
+    reg.register("svc", _Pooled, max_age=0)
+    first = reg.get("svc")
+    assert reg.get("svc") is not first and first.closed
@@ -0,0 +1,47 @@
+# backend/tests/test_embeddings.py
+import sys, os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.embeddings import HashingEmbedder, build_vectors, load_vector_index, save_vectors
+from api.recommender import _get_catalog, _load_recipes_from_csv, create_meal_plan
+
+
+def test_embedder_is_deterministic_and_normalised():
+    e = HashingEmbedder()
+    a, b = e.embed("grilled chicken salad"), e.embed("grilled chicken salad")
+    assert np.array_equal(a, b)
+    assert abs(np.linalg.norm(a) - 1.0) < 1e-5
+    assert float(a @ e.embed("chicken salads")) > float(a @ e.embed("chocolate fudge"))
+
+
+def test_vector_index_roundtrips_through_mmap(tmp_path):
+    catalog = _load_recipes_from_csv()
+    vec_path, ids_path = tmp_path / "v.npy", tmp_path / "ids.npy"
+    save_vectors(catalog, build_vectors(catalog), vec_path, ids_path)
+    index = load_vector_index(catalog, vec_path, ids_path)
+    assert isinstance(index.vectors, np.memmap)
+    scores = index.cosine(index.query_vector("beef stew"))
+    assert "Beef" in catalog.names[int(np.argmax(scores))]
+    assert all(-1.0 <= s <= 1.0 for s in scores)
+
+
+def test_stale_vectors_are_rebuilt_in_memory(tmp_path):
+    catalog = _load_recipes_from_csv()
+    vec_path, ids_path = tmp_path / "v.npy", tmp_path / "ids.npy"
+    np.save(vec_path, np.zeros((1, 256), dtype=np.float32))
+    np.save(ids_path, np.array([1]))
+    index = load_vector_index(catalog, vec_path, ids_path)
+    assert not isinstance(index.vectors, np.memmap)
+    assert len(index) == len(catalog)
+
+
+def test_similarity_score_is_goal_cosine():
+    meals, _ = create_meal_plan("beef stew", 3)
+    catalog = _get_catalog()
+    index = catalog.vector_index
+    q = index.query_vector("beef stew")
+    for meal in meals:
+        expected = float(index.cosine(q, [catalog.row(meal["id"])])[0])
+        assert meal["similarity_score"] == round(expected, 3)
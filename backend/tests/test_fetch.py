@@ -0,0 +1,44 @@
+# backend/tests/test_fetch.py
+import sys, os, threading
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.fetch import TableQuery, fetch_tables, iter_pages
+from tests.fake_supabase import FakeSupabase
+
+
+def test_iter_pages_walks_past_the_row_limit():
+    client = FakeSupabase({"Recipe": [{"id": i} for i in range(2500, 0, -1)]})
+    pages = list(iter_pages(client, TableQuery("Recipe"), page_size=1000))
+    assert [len(p) for p in pages] == [1000, 1000, 500]
+    assert [r["id"] for p in pages for r in p] == list(range(1, 2501))
+    assert client.requests == [("Recipe", 0, 999), ("Recipe", 1000, 1999), ("Recipe", 2000, 2999)]
+
+
+def test_iter_pages_applies_lower_bound():
+    client = FakeSupabase({"Recipe": [{"id": i} for i in range(1, 11)]})
+    rows = [r for p in iter_pages(client, TableQuery("Recipe", gt=("id", 7)), page_size=2) for r in p]
+    assert [r["id"] for r in rows] == [8, 9, 10]
+
+
+def test_fetch_tables_streams_every_table_to_the_caller_thread():
+    client = FakeSupabase({"A": [{"id": i} for i in range(5)], "B": [{"id": i} for i in range(3)], "C": []})
+    seen, consumers = [], set()
+
+    def on_page(name, rows):
+        consumers.add(threading.current_thread().name)
+        seen.extend((name, r["id"]) for r in rows)
+
+    counts = fetch_tables(client, {n: TableQuery(n) for n in "ABC"}, on_page, page_size=2)
+    assert counts == {"A": 5, "B": 3, "C": 0}
+    assert sorted(seen) == [("A", i) for i in range(5)] + [("B", i) for i in range(3)]
+    assert consumers == {threading.current_thread().name}
+    assert all(name.startswith("supabase-fetch") for name in client.threads)
+
+
+def test_fetch_tables_reraises_first_error():
+    client = FakeSupabase({"A": [{"id": 1}], "B": [{"id": 1}]}, failing={"B"})
+    with pytest.raises(ConnectionError):
+        fetch_tables(client, {n: TableQuery(n) for n in "AB"}, lambda name, rows: None)
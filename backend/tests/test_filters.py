@@ -0,0 +1,114 @@
+# backend/tests/test_filters.py
+import sys, os
+from unittest.mock import patch
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.catalog import CatalogBuilder
+from api.filters import FilterIndex, RecipeFilter, ingredient_words
+from api.index import app
+from api.recommender import _get_catalog, create_meal_plan
+
+
+def _has(term, ingredient, partial=False):
+    words = ingredient_words(ingredient)
+    return all(any(t in w if partial else t == w for w in words) for t in ingredient_words(term))
+
+
+def _brute_force(catalog, f):
+    keep = []
+    for row in range(len(catalog)):
+        tags = {t.lower() for t in catalog.tags(row)}
+        ings = catalog.ingredients(row)
+        prep, green = catalog.min_prep_time[row], catalog.green_score[row]
+        ok = (
+            all(t in tags for t in f.include_tags)
+            and not any(t in tags for t in f.exclude_tags)
+            and all(any(_has(term, i) for i in ings) for term in f.include_ingredients)
+            and not any(_has(term, i, partial=True) for term in f.exclude_ingredients for i in ings)
+            and (f.max_prep_time is None or prep <= f.max_prep_time)
+            and (f.min_green_score is None or green >= f.min_green_score)
+        )
+        keep.append(int(ok))
+    return np.asarray(keep, dtype=np.uint8)
+
+
+def test_filter_index_matches_a_full_scan():
+    catalog = _get_catalog()
+    index = FilterIndex(catalog)
+    for f in (
+        RecipeFilter(include_tags=["Vegetarian"], exclude_tags=["nutty"], max_prep_time=30),
+        RecipeFilter(exclude_ingredients=["nut", "Milk"]),
+        RecipeFilter(include_ingredients=["egg"], min_green_score=55),
+        RecipeFilter(include_ingredients=["chopped tomatoes"], exclude_ingredients=["olive oil"]),
+        RecipeFilter(max_prep_time=33, min_green_score=70),  # off-bucket thresholds
+        RecipeFilter(include_tags=["no-such-tag"]),
+    ):
+        assert np.array_equal(index.mask(f), _brute_force(catalog, f)), f
+    assert index.mask(RecipeFilter()) is None and index.mask(None) is None
+
+
+def test_ingredient_terms_match_whole_words():
+    b = CatalogBuilder()
+    names = ["Nutmeg", "Chestnut Mushrooms", "Mixed Nuts", "Graham Crackers", "Smoked Ham", "Cherry Tomatoes"]
+    for i, name in enumerate(names):
+        b.add_ingredient({"id": i, "name": name})
+    index = FilterIndex(b.build())
+    found = lambda term: sorted(names[i] for i in index.ingredient_ids(term))
+    assert found("nut") == found("Nuts") == ["Mixed Nuts"]
+    assert found("ham") == ["Smoked Ham"]
+    assert found("tomato") == found("cherry tomatoes") == ["Cherry Tomatoes"]
+    assert found("mushroom") == ["Chestnut Mushrooms"]
+    assert found("smoked nuts") == [] and found("!!") == []
+
+
+def test_excluded_terms_match_inside_words():
+    b = CatalogBuilder()
+    names = ["Hazelnuts", "Peanut Butter", "Walnut Halves", "Pecan Nuts", "Nutmeg", "Coconut Milk", "Butter"]
+    for i, name in enumerate(names):
+        b.add_ingredient({"id": i, "name": name})
+    for row, name in enumerate(names):
+        b.add_recipe({"id": 100 + row, "name": f"With {name}"})
+    b.add_ingredient_edges([(100 + row, row, 1.0) for row in range(len(names))])
+    catalog = b.build()
+    index = FilterIndex(catalog)
+    kept = lambda *terms: sorted(
+        catalog.ingredients(r)[0] for r in np.flatnonzero(index.mask(RecipeFilter(exclude_ingredients=list(terms))))
+    )
+    assert kept("nuts") == kept("nut") == ["Butter"]
+    assert kept("peanut") == sorted(set(names) - {"Peanut Butter"})
+    assert kept("peanut butter") == kept("peanuts")
+    assert kept("walnuts", "hazelnut") == sorted(set(names) - {"Walnut Halves", "Hazelnuts"})
+    # Includes still compare whole words.
+    include = RecipeFilter(include_ingredients=["nut"])
+    assert [catalog.ingredients(r)[0] for r in np.flatnonzero(index.mask(include))] == ["Pecan Nuts"]
+
+
+def test_meal_plans_only_use_allowed_recipes():
+    catalog = _get_catalog()
+    f = RecipeFilter(include_tags=["vegetarian"], exclude_ingredients=["nut"], max_prep_time=45)
+    allowed = {int(catalog.ids[r]) for r in np.flatnonzero(catalog.filter_index.mask(f))}
+    assert allowed
+    with patch.object(api.recommender, "_get_gemini_client", return_value=None):
+        meals, _ = create_meal_plan("high protein dinner", 3, filters=f)
+        assert meals and {m["id"] for m in meals} <= allowed
+        nothing, _ = create_meal_plan("anything", 3, filters=RecipeFilter(include_tags=["no-such-tag"]))
+        assert nothing == []
+
+
+def test_recommender_endpoint_accepts_filters():
+    with patch.object(api.recommender, "_get_gemini_client", return_value=None):
+        response = TestClient(app).post(
+            "/recommender",
+            json={"goal": "quick dinner", "numMeals": 2, "excludeTags": ["Meat", "Seafood"], "maxPrepTime": 40},
+        )
+    assert response.status_code == 200
+    catalog = _get_catalog()
+    for meal in response.json()["recipes"]:
+        row = catalog.row(meal["id"])
+        assert not {"Meat", "Seafood"} & set(catalog.tags(row))
+        assert catalog.min_prep_time[row] <= 40
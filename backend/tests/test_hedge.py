@@ -0,0 +1,101 @@
+# backend/tests/test_hedge.py
+import sys, os, asyncio, itertools, time
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.hedge import Hedger, LatencyWindow
+
+
+def _slow_then_fast(slow, fast, result="llm"):
+    calls = itertools.count()
+
+    def call():
+        time.sleep(slow if next(calls) == 0 else fast)
+        return result
+
+    return call
+
+
+def test_latency_window_quantile_needs_samples():
+    window = LatencyWindow(size=100, min_samples=10)
+    for i in range(9):
+        window.observe(i)
+    assert window.quantile(0.95) is None
+    for i in range(9, 100):
+        window.observe(i)
+    assert window.quantile(0.95) == 94
+    assert window.quantile(0.5) == 49
+
+
+def test_budget_returns_local_result_on_time():
+    hedger = Hedger(budget=0.1, hedge=False)
+    start = time.perf_counter()
+    result, source = hedger.run(lambda: time.sleep(1) or "llm", lambda: "local")
+    assert (result, source) == ("local", "local")
+    assert time.perf_counter() - start < 0.5
+    assert hedger.stats()["budget_exceeded"] == 1
+
+
+def test_failed_call_falls_back_without_waiting():
+    hedger = Hedger(budget=5)
+    start = time.perf_counter()
+    assert hedger.run(lambda: None, lambda: "local") == ("local", "local")
+    assert time.perf_counter() - start < 0.5
+    assert hedger.stats()["budget_exceeded"] == 0
+
+
+def test_hedge_beats_slow_primary():
+    hedger = Hedger(budget=2, default_hedge_delay=0.05)
+    start = time.perf_counter()
+    result, source = hedger.run(_slow_then_fast(1.0, 0.01), lambda: "local")
+    assert (result, source) == ("llm", "hedge")
+    assert time.perf_counter() - start < 0.5
+    assert hedger.stats()["hedges"] == 1
+
+
+def test_hedge_delay_tracks_observed_p95():
+    hedger = Hedger(budget=2, default_hedge_delay=1.0, window=LatencyWindow(min_samples=5))
+    for _ in range(5):
+        hedger.run(lambda: "llm", lambda: "local")
+    assert hedger.hedge_delay() < 0.1
+    assert hedger.stats()["wins"]["primary"] == 5
+
+
+def test_async_hedge_wins_and_cancels_primary():
+    hedger = Hedger(budget=2, default_hedge_delay=0.05)
+    calls, cancelled = itertools.count(), []
+
+    async def call():
+        try:
+            await asyncio.sleep(1.0 if next(calls) == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "llm"
+
+    async def run():
+        result = await hedger.run_async(call, lambda: "local")
+        await asyncio.sleep(0)
+        return result
+
+    start = time.perf_counter()
+    assert asyncio.run(run()) == ("llm", "hedge")
+    assert time.perf_counter() - start < 0.5
+    assert cancelled == [True]
+
+
+def test_create_meal_plan_meets_budget_with_slow_llm():
+    def slow_gemini(*args, **kwargs):
+        time.sleep(1)
+        return None
+
+    with patch.object(api.recommender, "_call_gemini", side_effect=slow_gemini), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        start = time.perf_counter()
+        meals, expanded = api.recommender.create_meal_plan("high protein", 3, timeout=0.1)
+    assert time.perf_counter() - start < 0.5
+    assert len(meals) == 3
+    assert expanded.startswith("Practical eating pattern")
+    assert "wins" in api.recommender.recommender_metrics()["llm"]
@@ -0,0 +1,99 @@
+# backend/tests/test_personalization.py
+import sys, os, gc, time, weakref
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.personalization import ProfileStore, UserProfile, build_profiles
+from api.recommender import _get_catalog, _parse_csv_catalog, _rank_locally
+
+NOW = 1_765_000_000.0  # 2025-12-06
+TODAY = "2025-12-06"
+
+
+def _tart_lover(catalog):
+    tarts = [int(catalog.ids[r]) for r in range(len(catalog)) if "Tart" in catalog.tags(r)]
+    favorites = [{"user_id": 7, "recipe_id": rid, "created_at": "2025-12-01T10:00:00Z"} for rid in tarts[1:]]
+    reviews = [{"user_id": 7, "recipe_id": int(catalog.ids[0]), "rating": 1, "updated_at": "2025-12-02"}]
+    calendar = [
+        {"user_id": 7, "recipe_id": tarts[0], "date": TODAY, "status": True},
+        {"user_id": 8, "recipe_id": int(catalog.ids[1]), "date": "2025-01-01", "status": False},
+    ]
+    return tarts, build_profiles(catalog, favorites, reviews, calendar, now=NOW)
+
+
+def test_profiles_learn_affinities_and_exclusions():
+    catalog = _get_catalog()
+    tarts, profiles = _tart_lover(catalog)
+    profile = profiles[7]
+    tart_id = int(catalog.tag_ids[catalog.tag_names.index("Tart")])
+    assert profile.tag_affinity[tart_id] == max(profile.tag_affinity.values())
+    # Disliked and just-planned recipes are excluded; an old calendar entry is not.
+    assert profile.exclude == {int(catalog.ids[0]), tarts[0]}
+    assert profiles[8].exclude == frozenset()
+    scores = profile.scores(catalog, [catalog.row(tarts[1]), 1, 0])
+    assert scores[0] > scores[1] and scores[2] < 0.5
+
+
+def test_rerank_prefers_the_users_taste_and_skips_exclusions():
+    catalog = _get_catalog()
+    tarts, profiles = _tart_lover(catalog)
+    profile = profiles[7]
+    plain = _rank_locally("quick lunch", 4, catalog)
+    personal = _rank_locally("quick lunch", 4, catalog, profile=profile)
+    assert profile.scores(catalog, personal).mean() > profile.scores(catalog, plain).mean()
+    assert not set(profile.exclude_rows(catalog).tolist()) & set(personal)
+
+
+def test_scoring_candidates_is_fast_once_compiled():
+    catalog = _get_catalog()
+    _, profiles = _tart_lover(catalog)
+    profile, rows = profiles[7], np.arange(min(40, len(catalog)))
+    profile.scores(catalog, rows)
+    start = time.perf_counter()
+    for _ in range(200):
+        profile.scores(catalog, rows)
+    assert (time.perf_counter() - start) / 200 < 0.001
+
+
+def test_store_evicts_least_recent_and_expires():
+    store = ProfileStore(max_users=2, ttl=60)
+    profiles = {
+        u: UserProfile(u, {}, {}, frozenset(), last_active=float(u), built_at=time.time()) for u in (1, 2, 3)
+    }
+    store.replace(profiles)
+    assert store.get(1) is None and store.get(3) is not None
+    store.put(UserProfile(4, {}, {}, frozenset(), built_at=time.time()))
+    assert store.get(2) is None  # least recently used
+    store.put(UserProfile(5, {}, {}, frozenset(), built_at=time.time() - 120))
+    assert store.get(5) is None
+    assert store.stats()["evictions"] == 3
+
+
+def test_user_id_reaches_the_plan_and_its_cache_key():
+    catalog = _get_catalog()
+    _, profiles = _tart_lover(catalog)
+    store = ProfileStore(ttl=float("inf"))  # built at a fixed NOW
+    store.replace(profiles)
+    with patch.object(api.recommender, "_PROFILES", store), \
+         patch.object(api.recommender, "_get_gemini_client", return_value=None), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        meals, _ = api.recommender.create_meal_plan("quick lunch", 4, user_id=7)
+        anonymous, _ = api.recommender.create_meal_plan("quick lunch", 4)
+    assert {m["id"] for m in meals} != {m["id"] for m in anonymous}
+    assert not {m["id"] for m in meals} & profiles[7].exclude
+    key = api.recommender._plan_key("x", 1, catalog, profile=profiles[7])
+    assert key != api.recommender._plan_key("x", 1, catalog)
+
+
+def test_scoring_keeps_no_reference_to_old_catalogs():
+    catalog = _parse_csv_catalog()
+    _, profiles = _tart_lover(catalog)
+    profiles[7].scores(catalog, np.arange(5))
+    ref = weakref.ref(catalog)
+    del catalog
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,90 @@
+# backend/tests/test_planner.py
+import sys, os, time
+from datetime import date
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.index import app
+from api.nutrition import NUTRIENT_INDEX
+from api.planner import MealPlanner, PlanSpec
+from api.ranking import parse_goal
+from api.recommender import _get_catalog, create_multi_day_plan
+from api.selection import NutritionTarget
+
+
+def _plan(goal="high protein", **spec):
+    catalog = _get_catalog()
+    return catalog, MealPlanner(catalog).plan(parse_goal(goal, catalog.tag_names), PlanSpec(**spec))
+
+
+def _distinct_ingredients(catalog, grid):
+    return len({i for day in grid for row in day for i in catalog.ingredient_rows(row).tolist()})
+
+
+def test_week_fills_every_slot_without_repeats_in_the_window():
+    _, grid = _plan(days=7, meal_types=("breakfast", "lunch", "dinner"), no_repeat_days=3)
+    assert len(grid) == 7 and all(len(day) == 3 for day in grid)
+    last_seen = {}
+    for d, day in enumerate(grid):
+        for row in day:
+            assert d - last_seen.get(row, -99) >= 3
+            last_seen[row] = d
+
+
+def test_week_is_not_a_short_cycle():
+    _, grid = _plan(days=7, meal_types=("breakfast", "lunch", "dinner"), no_repeat_days=3)
+    assert len({tuple(day) for day in grid}) == 7  # no day is served twice
+    for period in (3, 4):
+        assert any(grid[d] != grid[d + period] for d in range(7 - period))
+    assert len({row for day in grid for row in day}) > 3 * 3  # more than one window's worth
+
+
+def test_reuse_weight_shrinks_the_shopping_list():
+    catalog, varied = _plan(days=5, reuse_weight=0.0)
+    _, frugal = _plan(days=5, reuse_weight=2.0)
+    assert _distinct_ingredients(catalog, frugal) < _distinct_ingredients(catalog, varied)
+
+
+def test_daily_target_pulls_day_totals_in():
+    catalog, free = _plan(days=4)
+    kcal = catalog.nutrition[:, NUTRIENT_INDEX["calories_kcal"]]
+    target = float(np.median(kcal)) * 3
+    _, fitted = _plan(days=4, target=NutritionTarget(calories=target))
+    error = lambda grid: sum(abs(float(kcal[day].sum()) - target) for day in grid)
+    assert error(fitted) < error(free)
+
+
+def test_small_pools_relax_the_window_instead_of_leaving_gaps():
+    catalog = _get_catalog()
+    allowed = np.zeros(len(catalog), dtype=np.uint8)
+    allowed[:2] = 1
+    grid = MealPlanner(catalog).plan(parse_goal("anything"), PlanSpec(days=3, meal_types=("dinner",)), allowed)
+    assert [len(day) for day in grid] == [1, 1, 1]
+    assert {row for day in grid for row in day} <= {0, 1}
+
+
+def test_week_plans_are_fast():
+    _plan()  # warm up
+    start = time.perf_counter()
+    for _ in range(20):
+        _plan(days=7, meal_types=("breakfast", "lunch", "dinner"))
+    assert (time.perf_counter() - start) / 20 < 0.1
+
+
+def test_multi_day_plan_shape_and_endpoint():
+    plan = create_multi_day_plan("vegetarian", 2, ["lunch", "dinner"], start_date=date(2025, 12, 6))
+    assert [d["date"] for d in plan["days"]] == ["2025-12-06", "2025-12-07"]
+    assert [m["meal_type"] for m in plan["days"][0]["meals"]] == ["lunch", "dinner"]
+    day = plan["days"][0]
+    assert day["totals"]["calories_kcal"] == sum(m["calories_kcal"] for m in day["meals"])
+    assert plan["shopping_list"]
+
+    client = TestClient(app)
+    response = client.post("/planner", json={"goal": "high protein", "days": 3, "mealTypes": ["breakfast", "dinner"]})
+    assert response.status_code == 200
+    assert len(response.json()["days"]) == 3
+    assert client.post("/planner", json={"goal": "x", "mealTypes": ["lunch", "lunch"]}).status_code == 400
+    assert client.post("/planner", json={"goal": "x", "mealTypes": ["brunch"]}).status_code == 422
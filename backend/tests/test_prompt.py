@@ -0,0 +1,67 @@
+# backend/tests/test_prompt.py
+import sys, os, asyncio, json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.catalog import CatalogBuilder
+from api.prompt import TokenMeter, catalog_table, relevant_ingredients
+
+
+def _catalog():
+    b = CatalogBuilder()
+    b.add_recipe({"id": 1, "name": "Lentil\tSoup"})
+    b.add_recipe({"id": 2, "name": "Beef Stew"})
+    for iid, name in [(10, "Water"), (11, "Red lentils"), (12, "Onion"), (13, "Beef"), (14, "Salt")]:
+        b.add_ingredient({"id": iid, "name": name})
+    b.add_ingredient_edges([(1, 10, 500.0), (1, 12, 100.0), (1, 11, 200.0), (1, 14, 5.0), (2, 13, 400.0), (2, 10, 300.0)])
+    b.add_tag({"id": 1, "name": "Vegan"})
+    b.add_tag({"id": 2, "name": "Dinner"})
+    b.add_tag_edges([(1, 1), (1, 2), (2, 2)])
+    return b.build()
+
+
+def test_ingredients_prefer_goal_matches_then_amount():
+    catalog = _catalog()
+    assert relevant_ingredients(catalog, 0, ["lentil"], 3) == ["Red lentils", "Water", "Onion"]
+    assert relevant_ingredients(catalog, 0, [], 2) == ["Water", "Red lentils"]
+
+
+def test_table_uses_shared_tag_codes_and_clean_cells():
+    table = catalog_table("lentil soup", _catalog(), [0, 1], max_ingredients=2)
+    lines = table.splitlines()
+    assert lines[0] == "Tags: 0=Dinner 1=Vegan"  # most frequent tag gets the shortest code
+    assert lines[1] == "id\tname\ttags\tingredients"
+    assert lines[2] == "1\tLentil Soup\t1,0\tRed lentils; Water"
+    assert lines[3] == "2\tBeef Stew\t0\tBeef; Water"
+
+
+def test_token_meter_accumulates_usage():
+    meter = TokenMeter()
+    meter.record(None, 100)
+    meter.record(SimpleNamespace(prompt_token_count=400, candidates_token_count=120, total_token_count=520), 1600)
+    meter.record(SimpleNamespace(prompt_token_count=200, candidates_token_count=80, total_token_count=280), 800)
+    stats = meter.stats()
+    assert stats["calls"] == 2
+    assert stats["totals"]["prompt"] == 600 and stats["totals"]["thoughts"] == 0
+    assert stats["mean"]["output"] == 100
+    assert stats["prompt_chars_per_token"] == 4.0
+
+
+def test_gemini_usage_reaches_metrics():
+    rid = int(api.recommender._get_catalog().ids[0])
+    reply = json.dumps({"goal_expanded": "x", "meals": [{"recipe_id": rid}]})
+    usage = SimpleNamespace(prompt_token_count=900, candidates_token_count=60, total_token_count=960)
+
+    async def generate_content(**kwargs):
+        return SimpleNamespace(text=reply, usage_metadata=usage)
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    with patch.object(api.recommender, "_get_gemini_client", return_value=client), \
+         patch.object(api.recommender, "_PLAN_CACHE", None), \
+         patch.object(api.recommender, "_TOKENS", TokenMeter()):
+        asyncio.run(api.recommender.create_meal_plan_async("lentils", 1))
+        tokens = api.recommender.recommender_metrics()["llm"]["tokens"]
+    assert tokens["calls"] == 1 and tokens["last"]["prompt"] == 900
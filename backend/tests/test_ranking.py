@@ -0,0 +1,42 @@
+# backend/tests/test_ranking.py
+import sys, os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.nutrition import NUTRIENT_INDEX
+from api.ranking import parse_goal
+from api.recommender import _fallback_plan, _get_catalog
+
+
+def test_parse_goal_intents():
+    intent = parse_goal("High protein vegan meals under 600 kcal", ["Vegetarian", "Meat"])
+    assert intent.nutrient_weights["protein_g"] > 0
+    assert "meat" in intent.exclude_tags
+    assert "vegetarian" in intent.prefer_tags
+    assert intent.max_calories == 600
+
+
+def test_parse_goal_cut_sugar_is_not_weight_loss():
+    intent = parse_goal("Cut sugar intake")
+    assert intent.nutrient_weights == {"sugars_g": -1.0}
+
+
+def test_fallback_respects_excluded_tags():
+    catalog = _get_catalog()
+    plan = _fallback_plan("vegetarian dinner", 3, catalog)
+    for meal in plan["meals"]:
+        assert not {"Meat", "Seafood", "Fish", "Shellfish"} & set(catalog.tags(catalog.row(meal.recipe_id)))
+
+
+def test_fallback_depends_on_goal():
+    catalog = _get_catalog()
+    ids = lambda goal: [m.recipe_id for m in _fallback_plan(goal, 5, catalog)["meals"]]
+    assert ids("high protein") != ids("low calorie dessert")
+
+
+def test_fallback_calorie_ceiling():
+    catalog = _get_catalog()
+    plan = _fallback_plan("meals under 800 kcal", 3, catalog)
+    col = NUTRIENT_INDEX["calories_kcal"]
+    for meal in plan["meals"]:
+        assert catalog.nutrition[catalog.row(meal.recipe_id), col] <= 800
@@ -0,0 +1,126 @@
+# backend/tests/test_refresh.py
+import sys, os, threading
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.catalog import CatalogBuilder
+from api.refresh import CatalogRefresher
+from api.retrieval import Bm25Index
+from api.snapshot import load_snapshot, write_snapshot
+from tests.fake_supabase import FakeSupabase
+
+
+def _catalog(*names):
+    b = CatalogBuilder()
+    for i, name in enumerate(names, start=1):
+        b.add_recipe({"id": i, "name": name})
+    return b.build()
+
+
+def test_refresh_swaps_only_changed_catalogs():
+    old = api.recommender._prepare_catalog(_catalog("Soup"))
+    new = _catalog("Soup", "Salad")
+    with patch.object(api.recommender, "_RECIPE_CACHE", old), \
+         patch.object(api.recommender, "_load_recipes_from_supabase", return_value=new):
+        assert api.recommender.refresh_catalog() is True
+        assert api.recommender._get_catalog() is new
+        assert new.text_index is not None and new.fallback_ranker is not None
+    with patch.object(api.recommender, "_RECIPE_CACHE", new), \
+         patch.object(api.recommender, "_load_recipes_from_supabase", return_value=_catalog("Soup", "Salad")):
+        assert api.recommender.refresh_catalog() is False
+        assert api.recommender._get_catalog() is new
+
+
+def test_refresh_keeps_catalog_when_supabase_is_down():
+    current = api.recommender._get_catalog()
+    with patch.object(api.recommender, "_load_recipes_from_supabase", return_value=None):
+        assert api.recommender.refresh_catalog() is False
+    assert api.recommender._get_catalog() is current
+
+
+def test_incremental_sync_fetches_only_new_rows_and_patches_indexes():
+    tables = {
+        "Recipe": [
+            {"id": 1, "name": "Tomato soup", "updated_at": "2026-01-01T00:00:00+00:00"},
+            {"id": 2, "name": "Green salad", "updated_at": "2026-01-01T00:00:00+00:00"},
+        ],
+        "Ingredient": [{"id": 10, "name": "tomato"}],
+        "Recipe-Ingredient_Map": [{"id": 100, "recipe_id": 1, "ingredient_id": 10, "relative_unit_100": 1}],
+        "RecipeTag": [{"id": 5, "name": "soup"}],
+        "Recipe-Tag_Map": [{"id": 50, "recipe_id": 1, "tag_id": 5}],
+    }
+    fake = FakeSupabase(tables)
+    with patch.object(api.recommender, "_get_supabase_client", return_value=fake):
+        base = api.recommender._prepare_catalog(api.recommender._load_recipes_from_supabase())
+        assert base.watermarks["Recipe"] == "2026-01-01T00:00:00+00:00"
+        assert api.recommender._sync_recipes_from_supabase(base) == (base, set())
+
+        tables["Recipe"][1] = {"id": 2, "name": "Lentil salad", "updated_at": "2026-02-01T00:00:00+00:00"}
+        tables["Recipe"].append({"id": 3, "name": "Bean chili", "updated_at": "2026-02-01T00:00:00+00:00"})
+        tables["Recipe-Tag_Map"].append({"id": 51, "recipe_id": 3, "tag_id": 5})
+        with patch.object(api.recommender, "_RECIPE_CACHE", base), \
+             patch.object(api.recommender, "CATALOG_SYNC", "incremental"), \
+             patch.object(api.recommender, "_SYNCS_SINCE_FULL", 0):
+            assert api.recommender.refresh_catalog() is True
+            fresh = api.recommender._get_catalog()
+
+    assert fresh.names == ["Tomato soup", "Lentil salad", "Bean chili"]
+    assert fresh.tags(2) == ["soup"] and fresh.ingredients(0) == ["tomato"]
+    assert fresh.watermarks["Recipe-Tag_Map"] == 51
+    rebuilt = Bm25Index.build(fresh)
+    for query in ("lentil", "soup", "tomato salad"):
+        assert np.allclose(fresh.text_index.scores(query), rebuilt.scores(query))
+    assert np.allclose(fresh.vector_index.vectors[0], base.vector_index.vectors[0])
+
+
+def test_sync_links_edges_that_arrive_before_their_rows(tmp_path):
+    tables = {
+        "Recipe": [{"id": 1, "name": "Tomato soup", "updated_at": "2026-01-01T00:00:00+00:00"}],
+        "Ingredient": [{"id": 10, "name": "tomato"}],
+        "Recipe-Ingredient_Map": [{"id": 100, "recipe_id": 1, "ingredient_id": 10, "relative_unit_100": 1}],
+        "RecipeTag": [],
+        "Recipe-Tag_Map": [],
+    }
+    fake = FakeSupabase(tables)
+    with patch.object(api.recommender, "_get_supabase_client", return_value=fake):
+        base = api.recommender._prepare_catalog(api.recommender._load_recipes_from_supabase())
+        # Map rows committed before the recipe (2) and ingredient (11) they point at.
+        tables["Recipe-Ingredient_Map"] += [
+            {"id": 101, "recipe_id": 2, "ingredient_id": 10, "relative_unit_100": 1},
+            {"id": 102, "recipe_id": 1, "ingredient_id": 11, "relative_unit_100": 1},
+        ]
+        early, _ = api.recommender._sync_recipes_from_supabase(base)
+        assert early.watermarks["Recipe-Ingredient_Map"] == 102
+        assert early.ingredients(0) == ["tomato"]
+        # The pending edges survive a snapshot round trip.
+        early = load_snapshot(write_snapshot(early, tmp_path / "snap"))
+        tables["Recipe"].append({"id": 2, "name": "Tomato salad", "updated_at": "2026-02-01T00:00:00+00:00"})
+        tables["Ingredient"].append({"id": 11, "name": "basil"})
+        fresh, changed = api.recommender._sync_recipes_from_supabase(early)
+
+    assert fresh.ingredients(fresh.row(2)) == ["tomato"]
+    assert sorted(fresh.ingredients(0)) == ["basil", "tomato"]
+    assert changed == {1, 2}
+    assert not fresh.pending_edges
+
+
+def test_refresher_runs_on_trigger():
+    done = threading.Event()
+
+    def refresh():
+        done.set()
+        return True
+
+    refresher = CatalogRefresher(refresh, interval=3600)
+    refresher.start()
+    try:
+        refresher.trigger()
+        assert done.wait(2)
+    finally:
+        refresher.stop()
+    assert refresher.stats()["swaps"] == 1
+    assert not refresher.running
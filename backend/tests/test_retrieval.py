@@ -0,0 +1,28 @@
+# backend/tests/test_retrieval.py
+import sys, os
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.recommender import _get_catalog, _rank_locally
+from api.retrieval import tokenize
+
+
+def test_tokenize_normalises_plurals_and_stopwords():
+    assert tokenize("The Prawns and Noodles") == ["prawn", "noodle"]
+
+
+def test_bm25_ranks_name_matches_first():
+    catalog = _get_catalog()
+    scores = catalog.text_index.scores("chicken")
+    hits = np.argsort(-scores, kind="stable")[:5]
+    assert (scores[hits] > 0).all()
+    assert all("chicken" in " ".join(catalog.ingredients(r) + [catalog.names[r]]).lower() for r in hits)
+
+
+def test_local_selection_is_unique_and_bounded():
+    catalog = _get_catalog()
+    rows = _rank_locally("lose 5 kg", 20, catalog)
+    assert len(rows) == 20
+    assert len(set(rows)) == 20
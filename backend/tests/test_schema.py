@@ -0,0 +1,63 @@
+# backend/tests/test_schema.py
+import sys, os, asyncio, json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.schema import parse_meal, parse_plan, response_schema
+
+
+def _schema_ids(config):
+    schema = config.response_schema if hasattr(config, "response_schema") else config["response_schema"]
+    return schema["properties"]["meals"]["items"]["properties"]["recipe_id"]["enum"]
+
+
+def test_schema_limits_recipe_ids_and_orders_goal_first():
+    schema = response_schema([52815, 52785])
+    assert _schema_ids({"response_schema": schema}) == ["52815", "52785"]
+    assert schema["property_ordering"] == ["goal_expanded", "meals"]
+
+
+def test_valid_reply_takes_the_fast_path():
+    plan = parse_plan(json.dumps({"goal_expanded": "x", "meals": [{"recipe_id": "52815", "meal_number": 1}]}))
+    assert plan.meals[0].recipe_id == 52815 and plan.meals[0].summary is None
+
+
+def test_bad_meals_are_repaired_or_dropped_one_at_a_time():
+    reply = {
+        "goal_expanded": "Eat well.",
+        "meals": [
+            {"recipe_id": 1, "summary": "ok"},
+            {"recipe_id": "id: 2", "summary": 5, "reason": ["high", "protein"], "meal_number": "second"},
+            {"recipe_id": "unknown"},
+            "not a meal",
+        ],
+    }
+    plan = parse_plan(json.dumps(reply))
+    assert [m.recipe_id for m in plan.meals] == [1, 2]
+    repaired = plan.meals[1]
+    assert (repaired.summary, repaired.reason, repaired.meal_number) == ("5", "high protein", None)
+    assert parse_meal({"summary": "no id"}) is None
+    assert parse_plan("not json") is None
+    assert parse_plan(json.dumps({"goal_expanded": "no meals"})) is None
+
+
+def test_one_malformed_meal_no_longer_sinks_the_plan():
+    catalog = api.recommender._get_catalog()
+    good, bad = (int(catalog.ids[row]) for row in api.recommender._rank_locally("high protein", 2, catalog))
+    reply = {"goal_expanded": "Kept.", "meals": [{"recipe_id": good}, {"recipe_id": {"id": bad}}]}
+    seen = {}
+
+    async def generate_content(**kwargs):
+        seen.update(kwargs)
+        return SimpleNamespace(text=json.dumps(reply))
+
+    client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+    with patch.object(api.recommender, "_get_gemini_client", return_value=client), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        meals, expanded = asyncio.run(api.recommender.create_meal_plan_async("high protein", 2))
+    assert expanded == "Kept."
+    assert [m["id"] for m in meals].count(good) == 1 and {m["id"] for m in meals} == {good, bad}
+    assert _schema_ids(seen["config"]) == [str(good), str(bad)]
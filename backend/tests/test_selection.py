@@ -0,0 +1,63 @@
+# backend/tests/test_selection.py
+import sys, os
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.nutrition import NUTRIENT_INDEX
+from api.ranking import parse_goal
+from api.recommender import _get_catalog, _rank_locally
+from api.selection import NutritionTarget, mmr, select_meals
+
+
+def _totals(catalog, rows):
+    return (
+        float(catalog.nutrition[rows, NUTRIENT_INDEX["calories_kcal"]].sum()),
+        float(catalog.nutrition[rows, NUTRIENT_INDEX["protein_g"]].sum()),
+    )
+
+
+def test_mmr_passes_over_near_duplicates():
+    relevance = np.array([1.0, 0.99, 0.6])
+    similarity = np.array([[1.0, 0.95, 0.1], [0.95, 1.0, 0.1], [0.1, 0.1, 1.0]])
+    order, values = mmr(relevance, similarity, 2, lam=0.5)
+    assert order == [0, 2]
+    assert values[0] > values[1]
+    assert mmr(relevance, similarity, 2, lam=1.0)[0] == [0, 1]
+
+
+def test_goal_parses_daily_targets():
+    intent = parse_goal("Cut to 2,000 calories a day with 150g of protein")
+    assert (intent.daily_calories, intent.daily_protein_g) == (2000.0, 150.0)
+    assert intent.target() == NutritionTarget(calories=2000.0, protein_g=150.0)
+    assert parse_goal("high protein dinner").target().is_empty()
+
+
+def test_knapsack_moves_plan_totals_towards_calorie_target():
+    catalog = _get_catalog()
+    rows = list(range(len(catalog)))
+    relevance = np.linspace(1.0, 0.0, len(rows))
+    free = select_meals(catalog, rows, relevance, 3)
+    kcal = catalog.nutrition[:, NUTRIENT_INDEX["calories_kcal"]]
+    target = float(np.sort(kcal)[:3].sum()) * 1.1
+    fitted = select_meals(catalog, rows, relevance, 3, NutritionTarget(calories=target))
+    assert len(set(fitted)) == 3
+    assert abs(_totals(catalog, fitted)[0] - target) < abs(_totals(catalog, free)[0] - target)
+
+
+def test_protein_floor_raises_plan_protein():
+    catalog = _get_catalog()
+    rows = list(range(len(catalog)))
+    relevance = np.linspace(1.0, 0.0, len(rows))
+    free = _totals(catalog, select_meals(catalog, rows, relevance, 3))[1]
+    fitted = select_meals(catalog, rows, relevance, 3, NutritionTarget(protein_g=free * 1.5))
+    assert _totals(catalog, fitted)[1] > free
+
+
+def test_local_plan_respects_filters_and_count():
+    catalog = _get_catalog()
+    allowed = np.zeros(len(catalog), dtype=np.uint8)
+    allowed[::2] = 1
+    rows = _rank_locally("high protein, 2500 kcal per day", 4, catalog, allowed=allowed)
+    assert len(rows) == 4 and len(set(rows)) == 4
+    assert all(allowed[row] for row in rows)
@@ -0,0 +1,101 @@
+# backend/tests/test_similarity.py
+import sys, os, time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.catalog import CatalogBuilder
+from api.index import app
+from api.nutrition import NUTRIENTS
+from api.recommender import _get_catalog
+from api.similarity import SimilarityIndex
+
+FAMILY = 10  # recipes 10f..10f+9 are variations on one base
+
+
+def _catalog(recipe_ids, n_ingredients=500):
+    """Recipes built from 6 of their family's 8 base ingredients plus 2 random ones."""
+    b = CatalogBuilder()
+    for i in range(n_ingredients):
+        nutrients = np.random.default_rng(i).gamma(1.0, 20.0, len(NUTRIENTS))
+        b.add_ingredient({"id": 1000 + i, "name": f"ingredient {i}", **dict(zip(NUTRIENTS, nutrients.tolist()))})
+    edges = []
+    for rid in recipe_ids:
+        rng = np.random.default_rng(rid)
+        base = np.random.default_rng(10**6 + rid // FAMILY).choice(n_ingredients, 8, replace=False)
+        ings = set(base[rng.permutation(8)[:6]].tolist()) | set(rng.choice(n_ingredients, 2).tolist())
+        b.add_recipe({"id": rid, "name": f"Recipe {rid}"})
+        edges += [(rid, 1000 + i, 1.0) for i in ings]
+    b.add_recipe({"id": 10**6, "name": "Water"})  # no ingredients, no nutrition
+    b.add_ingredient_edges(edges)
+    return b.build()
+
+
+def _jaccard(catalog, r, s):
+    a, b = set(catalog.ingredient_rows(r).tolist()), set(catalog.ingredient_rows(s).tolist())
+    return len(a & b) / len(a | b)
+
+
+def test_neighbours_are_the_recipes_family():
+    catalog = _catalog(range(3000))
+    index = SimilarityIndex.build(catalog)
+    family = catalog.ids // FAMILY
+    rows = np.arange(len(catalog) - 1)
+    neighbors = index.neighbors[rows, :FAMILY - 1]
+    same = (neighbors >= 0) & (family[np.maximum(neighbors, 0)] == family[rows, None])
+    assert same.mean() > 0.85
+    assert not (neighbors == rows[:, None]).any()
+    assert (np.diff(index.scores[rows], axis=1) <= 0).all()  # best first
+    assert len(index.similar(catalog.row(10**6))[0]) == 0
+
+
+def test_overlap_estimates_exact_jaccard():
+    catalog = _catalog(range(200))
+    index = SimilarityIndex.build(catalog)
+    for row in range(0, 200, 20):
+        others, _ = index.similar(row)
+        overlap, cosine = index.components(row, others)
+        exact = [_jaccard(catalog, row, s) for s in others.tolist()]
+        assert np.abs(overlap - exact).max() < 0.25
+        assert ((cosine > 0) & (cosine <= 1.0001)).all()
+
+
+def test_patch_matches_a_rebuild():
+    before = _catalog(range(2000))
+    index = SimilarityIndex.build(before)
+    after = _catalog([rid for rid in range(2100) if rid % 97])  # some recipes gone, some new
+    old_rows = before.rows_for(after.ids)
+    old_rows[::50] = -1  # changed
+    patched = SimilarityIndex.patched(after, index, old_rows)
+    rebuilt = SimilarityIndex.build(after)
+    same = (patched.neighbors == rebuilt.neighbors).all(axis=1)
+    assert same.mean() > 0.99
+    assert np.allclose(patched.scores[same], rebuilt.scores[same])
+
+
+def test_build_scales_and_lookups_are_slices():
+    catalog = _catalog(range(20000), n_ingredients=2000)
+    start = time.perf_counter()
+    index = SimilarityIndex.build(catalog)
+    assert time.perf_counter() - start < 10
+    start = time.perf_counter()
+    for row in range(10000):
+        index.similar(row, 5)
+    assert (time.perf_counter() - start) / 10000 < 0.0001
+
+
+def test_similar_endpoint():
+    catalog = _get_catalog()
+    recipe_id = int(catalog.ids[0])
+    client = TestClient(app)
+    response = client.get(f"/recipes/{recipe_id}/similar", params={"limit": 3})
+    assert response.status_code == 200
+    similar = response.json()["similar"]
+    assert 0 < len(similar) <= 3
+    assert recipe_id not in {s["id"] for s in similar}
+    assert [s["score"] for s in similar] == sorted((s["score"] for s in similar), reverse=True)
+    assert {"name", "ingredient_overlap", "nutrition_similarity", "calories_kcal"} <= set(similar[0])
+    assert client.get("/recipes/987654321/similar").status_code == 404
+    assert client.get(f"/recipes/{recipe_id}/similar", params={"limit": 0}).status_code == 422
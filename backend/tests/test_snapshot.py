@@ -0,0 +1,89 @@
+# backend/tests/test_snapshot.py
+import sys, os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.recommender import CSV_PATHS, _load_recipes_from_csv, _parse_csv_catalog
+import api.recommender as recommender
+import api.snapshot
+from api.snapshot import load_snapshot, source_digest, write_snapshot
+
+
+def test_snapshot_round_trip_is_identical_and_memory_mapped(tmp_path):
+    catalog = _parse_csv_catalog()
+    catalog.watermarks = {"Recipe": "2026-01-01T00:00:00+00:00"}
+    write_snapshot(catalog, tmp_path / "snap", source_digest="abc")
+    loaded = load_snapshot(tmp_path / "snap", expect_source_digest="abc")
+    assert loaded is not None
+    assert isinstance(loaded.ids, np.memmap)
+    assert loaded.names == catalog.names and list(loaded.descriptions) == list(catalog.descriptions)
+    assert isinstance(loaded.descriptions.heap, np.memmap)
+    assert loaded.fingerprint == catalog.fingerprint
+    loaded._fingerprint = None  # recompute from the mapped arrays
+    assert loaded.fingerprint == catalog.fingerprint
+    assert loaded.watermarks == catalog.watermarks and loaded.source == "csv"
+    assert loaded.recipe(0) == catalog.recipe(0)
+
+
+def test_snapshot_rejects_stale_or_corrupt_files(tmp_path):
+    catalog = _parse_csv_catalog()
+    path = write_snapshot(catalog, tmp_path / "snap", source_digest="abc")
+    assert load_snapshot(path, expect_source_digest="other") is None
+    heap = path / "descriptions.heap.npy"
+    data = bytearray(heap.read_bytes())
+    data[-1] ^= 0xFF  # same size: only the full checksum notices
+    heap.write_bytes(bytes(data))
+    assert load_snapshot(path) is not None
+    assert load_snapshot(path, verify=True) is None
+    heap.write_bytes(bytes(data[:-1]))  # truncated
+    assert load_snapshot(path) is None
+    path = write_snapshot(catalog, tmp_path / "snap", source_digest="abc")
+    np.save(path / "names.offsets.npy", np.zeros(len(catalog) + 1, dtype=np.int64))
+    assert load_snapshot(path) is None
+    assert load_snapshot(tmp_path / "missing") is None
+
+
+def test_cold_start_reads_the_snapshot_once(tmp_path):
+    write_snapshot(_parse_csv_catalog(), tmp_path / "snap", source_digest=source_digest(CSV_PATHS))
+    calls = []
+
+    def counting_load(*args, **kwargs):
+        calls.append(args)
+        return load_snapshot(*args, **kwargs)
+
+    with patch.object(recommender, "CATALOG_SNAPSHOT", str(tmp_path / "snap")), \
+            patch.object(recommender, "_RECIPE_CACHE", None), \
+            patch.object(recommender, "_load_recipes_from_supabase", lambda: None), \
+            patch.object(recommender, "load_snapshot", counting_load):
+        catalog = recommender._get_catalog()
+    assert len(calls) == 1
+    assert catalog.source == "csv" and isinstance(catalog.ids, np.memmap)
+
+
+def test_rewriting_a_snapshot_never_leaves_the_path_empty(tmp_path):
+    catalog = _parse_csv_catalog()
+    path = write_snapshot(catalog, tmp_path / "snap", source_digest="old")
+    real_replace = os.replace
+
+    def fail_swapping_in(src, dst):
+        if os.path.basename(src).startswith("snap.") and ".old." not in os.path.basename(src):
+            assert not os.path.exists(dst)  # the old snapshot was moved aside, not deleted
+            raise OSError("disk full")
+        real_replace(src, dst)
+
+    with patch.object(api.snapshot.os, "replace", fail_swapping_in), pytest.raises(OSError):
+        write_snapshot(catalog, path, source_digest="new")
+    assert load_snapshot(path, expect_source_digest="old") is not None
+    write_snapshot(catalog, path, source_digest="new")
+    assert load_snapshot(path, expect_source_digest="new") is not None
+    assert sorted(os.listdir(tmp_path)) == ["snap"]  # no temp or old copies left behind
+
+
+def test_shipped_snapshot_matches_bundled_csvs():
+    shipped = load_snapshot(expect_source_digest=source_digest(CSV_PATHS))
+    assert shipped is not None, "run `make snapshot` after changing dataset/*.csv"
+    assert _load_recipes_from_csv().fingerprint == _parse_csv_catalog().fingerprint
@@ -0,0 +1,111 @@
+# backend/tests/test_streaming.py
+import sys, os, asyncio, json, time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import api.recommender
+from api.index import app
+from api.recommender import stream_meal_plan
+from api.streaming import PlanStreamParser
+
+
+def _stream_client(text, chunk_size=16, delay=0.02, fail_after=None):
+    async def chunks():
+        for n, i in enumerate(range(0, len(text), chunk_size)):
+            if fail_after is not None and n == fail_after:
+                raise ConnectionError("stream reset")
+            await asyncio.sleep(delay)
+            yield SimpleNamespace(text=text[i:i + chunk_size])
+
+    async def generate_content_stream(**kwargs):
+        return chunks()
+
+    return SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content_stream=generate_content_stream)))
+
+
+def _chosen(goal, n):
+    catalog = api.recommender._get_catalog()
+    return [int(catalog.ids[row]) for row in api.recommender._rank_locally(goal, n, catalog)]
+
+
+def _reply(rids):
+    meals = [{"recipe_id": rid, "meal_number": i + 1, "reason": "Fits."} for i, rid in enumerate(rids)]
+    return json.dumps({"goal_expanded": "Streamed plan.", "meals": meals})
+
+
+async def _collect(*args, **kwargs):
+    out = []
+    start = time.perf_counter()
+    async for event, data in stream_meal_plan(*args, **kwargs):
+        out.append((event, data, time.perf_counter() - start))
+    return out
+
+
+def test_parser_emits_meals_across_arbitrary_chunk_splits():
+    doc = {
+        "goal_expanded": 'quotes " and { braces [',
+        "meals": [{"recipe_id": 1, "summary": "a}b{\\\"c", "x": [1, {"y": 2}]}, {"recipe_id": 2}],
+        "other": [{"z": 1}],
+    }
+    text = "```json\n" + json.dumps(doc) + "\n```"
+    for size in (1, 3, 7, len(text)):
+        parser = PlanStreamParser()
+        meals = [m for i in range(0, len(text), size) for m in parser.feed(text[i:i + size])]
+        assert meals == doc["meals"]
+        assert parser.result() == doc
+        assert parser.fields == {"goal_expanded": doc["goal_expanded"]}
+
+
+def test_stream_emits_first_meal_before_the_reply_finishes():
+    rids = _chosen("gain muscle", 3)
+    client = _stream_client(_reply(rids))
+    with patch.object(api.recommender, "_get_gemini_client", return_value=client), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        events = asyncio.run(_collect("gain muscle", 3))
+    meals = [data for event, data, _ in events if event == "meal"]
+    assert [m["id"] for m in meals] == rids
+    assert events[-1][:2] == ("done", {"goal_expanded": "Streamed plan."})
+    assert events[0][2] < events[-1][2] - 0.08  # several chunks before the reply ends
+
+
+def test_stream_tops_up_locally_when_the_stream_breaks():
+    rids = _chosen("gain muscle", 3)
+    rid = rids[0]
+    text = _reply(rids[:2])
+    cut = text.index("}") + 1  # the stream dies right after the first meal
+    client = _stream_client(text, chunk_size=cut, fail_after=1)
+    with patch.object(api.recommender, "_get_gemini_client", return_value=client), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        events = asyncio.run(_collect("gain muscle", 3))
+    meals = [data for event, data, _ in events if event == "meal"]
+    assert len(meals) == 3 and meals[0]["id"] == rid
+    assert {m["id"] for m in meals} == set(rids)
+    assert events[-1][:2] == ("done", {"goal_expanded": "Streamed plan."})
+
+
+def test_stream_falls_back_without_gemini():
+    with patch.object(api.recommender, "_get_gemini_client", return_value=None), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        events = asyncio.run(_collect("high protein", 2))
+    assert [event for event, _, _ in events] == ["meal", "meal", "done"]
+    assert events[-1][1]["goal_expanded"].startswith("Practical eating pattern")
+
+
+def test_stream_endpoint_speaks_ndjson_and_sse():
+    rid = _chosen("lose fat", 1)[0]
+    payload = {"goal": "lose fat", "numMeals": 1}
+    with patch.object(api.recommender, "_get_gemini_client", side_effect=lambda: _stream_client(_reply([rid]))), \
+         patch.object(api.recommender, "_PLAN_CACHE", None):
+        ndjson = TestClient(app).post("/recommender/stream", json=payload)
+        sse = TestClient(app).post("/recommender/stream", json=payload, headers={"Accept": "text/event-stream"})
+    lines = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    assert [(l["event"], l["data"].get("id")) for l in lines] == [("meal", rid), ("done", None)]
+    assert sse.headers["content-type"].startswith("text/event-stream")
+    frames = [f for f in sse.text.split("\n\n") if f]
+    assert frames[0].startswith("event: meal\ndata: ")
+    assert frames[-1] == 'event: done\ndata: {"goal_expanded": "Streamed plan."}'